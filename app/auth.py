@@ -2,17 +2,144 @@ from __future__ import annotations
 
 import hashlib
 import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
-from fastapi import Depends, HTTPException, Security, status
+from fastapi import Depends, HTTPException, Request, Security, status
 from fastapi.security import APIKeyHeader
-from sqlalchemy import select
+from sqlalchemy import event, inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as OrmSession, object_session
 
 from app.config import settings
-from app.db import get_db
+from app.db import SAFE_METHODS, AnySession, after_commit, get_db, read_engines, stick_to_writer
+from app.events import EventType, agent_topic, bus, emit
 from app.models import Agent
 
 api_key_header = APIKeyHeader(name=settings.api_key_header, auto_error=False)
+admin_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
+
+
+@dataclass(frozen=True)
+class AgentSnapshot:
+    """鉴权结果：与请求会话解耦的只读 Agent 快照，可安全地跨请求缓存。"""
+    id: str
+    did: str
+    name: str
+    type: str
+    created_at: datetime
+
+    @classmethod
+    def of(cls, agent: Agent) -> "AgentSnapshot":
+        return cls(id=agent.id, did=agent.did, name=agent.name, type=agent.type, created_at=agent.created_at)
+
+
+class AuthCache:
+    """
+    api_key_hash -> AgentSnapshot 的进程内 TTL + LRU 缓存。
+
+    无效 Key 单独放入较小 TTL 的负缓存，避免暴力尝试打到数据库，也不会挤掉有效条目。
+    Agent 的 api_key_hash 变更或 Agent 删除时经 invalidate_* 失效（见文件末尾的 ORM 事件）。
+
+    未命中时先取 generation 再查库，put 时带回：查库期间发生过任何失效（如并发的 Key 轮换已提交），
+    查到的可能是旧行，结果不写入缓存，避免旧 Key 被回填后在 TTL 内继续可用。
+    """
+
+    def __init__(self, size: int, ttl: float, negative_size: int, negative_ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.negative_size = negative_size
+        self.negative_ttl = negative_ttl
+        self._hits: OrderedDict[str, tuple[float, AgentSnapshot]] = OrderedDict()
+        self._misses: OrderedDict[str, float] = OrderedDict()
+        self._by_agent: dict[str, str] = {}
+        # 每次失效加一
+        self.generation = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, key_hash: str) -> tuple[bool, Optional[AgentSnapshot]]:
+        """返回 (是否命中, 快照)；命中负缓存时快照为 None。"""
+        now = time.monotonic()
+        entry = self._hits.get(key_hash)
+        if entry is not None:
+            if entry[0] > now:
+                self._hits.move_to_end(key_hash)
+                self.hits += 1
+                return True, entry[1]
+            self._drop(key_hash)
+        expires = self._misses.get(key_hash)
+        if expires is not None:
+            if expires > now:
+                self.negative_hits += 1
+                return True, None
+            del self._misses[key_hash]
+        self.misses += 1
+        return False, None
+
+    def put(self, key_hash: str, agent: Optional[AgentSnapshot], generation: Optional[int] = None) -> None:
+        """generation 为查库前读取的 self.generation；其后发生过失效时丢弃本次结果。"""
+        if generation is not None and generation != self.generation:
+            return
+        now = time.monotonic()
+        if agent is None:
+            self._misses[key_hash] = now + self.negative_ttl
+            self._misses.move_to_end(key_hash)
+            while len(self._misses) > self.negative_size:
+                self._misses.popitem(last=False)
+            return
+        self._misses.pop(key_hash, None)
+        self._hits[key_hash] = (now + self.ttl, agent)
+        self._hits.move_to_end(key_hash)
+        self._by_agent[agent.id] = key_hash
+        while len(self._hits) > self.size:
+            old_hash, (_, old) = self._hits.popitem(last=False)
+            self._by_agent.pop(old.id, None)
+
+    def _drop(self, key_hash: str) -> None:
+        entry = self._hits.pop(key_hash, None)
+        if entry is not None and self._by_agent.get(entry[1].id) == key_hash:
+            del self._by_agent[entry[1].id]
+
+    def invalidate_key_hash(self, key_hash: str) -> None:
+        self.generation += 1
+        self._drop(key_hash)
+        self._misses.pop(key_hash, None)
+
+    def invalidate_agent(self, agent_id: str) -> None:
+        """Key 轮换或 Agent 删除时调用：移除该 Agent 当前缓存的快照。"""
+        self.generation += 1
+        key_hash = self._by_agent.pop(agent_id, None)
+        if key_hash is not None:
+            self._hits.pop(key_hash, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._hits.clear()
+        self._misses.clear()
+        self._by_agent.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._hits),
+            "negative_size": len(self._misses),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+auth_cache = AuthCache(
+    size=settings.auth_cache_size,
+    ttl=settings.auth_cache_ttl,
+    negative_size=settings.auth_cache_negative_size,
+    negative_ttl=settings.auth_cache_negative_ttl,
+)
 
 
 def hash_api_key(api_key: str) -> str:
@@ -26,18 +153,26 @@ def generate_api_key() -> str:
 async def get_agent_by_api_key(
     db: AsyncSession,
     api_key: str,
-) -> Optional[Agent]:
+) -> Optional[AgentSnapshot]:
     if not api_key:
         return None
     h = hash_api_key(api_key)
+    cached, snapshot = auth_cache.get(h)
+    if cached:
+        return snapshot
+    generation = auth_cache.generation
     r = await db.execute(select(Agent).where(Agent.api_key_hash == h))
-    return r.scalar_one_or_none()
+    agent = r.scalar_one_or_none()
+    snapshot = AgentSnapshot.of(agent) if agent else None
+    auth_cache.put(h, snapshot, generation)
+    return snapshot
 
 
 async def require_agent(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db, scope="function"),
     api_key: str = Security(api_key_header),
-) -> Agent:
+) -> AgentSnapshot:
     if not api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -49,4 +184,90 @@ async def require_agent(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API Key",
         )
+    if read_engines and request.method not in SAFE_METHODS:
+        # 只在本请求真正写库时登记读己之写（见 mark_written）
+        db.info[_WRITER] = (agent.id, hash_api_key(api_key))
     return agent
+
+
+_WRITER = "read_your_writes"
+_WROTE = "read_your_writes_noted"
+
+
+def mark_written(db: AnySession) -> None:
+    """
+    登记本请求有写入：提交后该 Key 的只读请求在 READ_YOUR_WRITES_SECONDS 内走主库；经事件通知所有 worker，回滚则不登记。
+    请求 Session 中的 INSERT / UPDATE / DELETE 由下方的 Session 事件自动登记；
+    不经请求 Session 写库的路径（如交给组提交写入的消息）须在提交请求事务前显式调用。
+    """
+    writer = db.info.get(_WRITER)
+    if writer is None or db.info.get(_WROTE):
+        return
+    db.info[_WROTE] = True
+    agent_id, key_hash = writer
+    emit(db, EventType.AGENT_WROTE, agent_topic(agent_id), {"key_hash": key_hash})
+    after_commit(db, lambda: stick_to_writer(key_hash, time.time()))
+
+
+def _after_flush(session: OrmSession, flush_context) -> None:
+    if _WRITER not in session.info:
+        return
+    # after_flush 中 new / dirty / deleted 仍为 flush 前的状态；dirty 中可能有未实际修改的对象
+    if session.new or session.deleted or any(session.is_modified(o) for o in session.dirty):
+        mark_written(session)
+
+
+def _do_orm_execute(state) -> None:
+    if _WRITER in state.session.info and (state.is_insert or state.is_update or state.is_delete):
+        mark_written(state.session)
+
+
+def require_admin(admin_key: str = Security(admin_key_header)) -> None:
+    """管理接口鉴权：未配置 ADMIN_API_KEY 时视为接口不存在。"""
+    if not settings.admin_api_key:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not admin_key or not secrets.compare_digest(admin_key, settings.admin_api_key):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin key")
+
+
+def _invalidate(agent_id: str, key_hashes) -> None:
+    auth_cache.invalidate_agent(agent_id)
+    for h in key_hashes:
+        auth_cache.invalidate_key_hash(h)
+
+
+# Agent 写入时失效缓存：立即失效一次，提交后再失效一次，防止并发请求在提交前回填旧快照；
+# 同时广播 agent.changed，使其他 worker 的缓存一并失效
+def _invalidate_on_write(mapper, connection, target: Agent) -> None:
+    agent_id = target.id
+    hashes = {target.api_key_hash}
+    hist = inspect(target).attrs.api_key_hash.history
+    hashes.update(h for h in hist.deleted or () if h)
+
+    _invalidate(agent_id, hashes)
+    session = object_session(target)
+    if session is not None:
+        after_commit(session, lambda: _invalidate(agent_id, hashes))
+        emit(session, EventType.AGENT_CHANGED, agent_topic(agent_id), {"id": agent_id, "key_hashes": sorted(hashes)})
+
+
+def _on_agent_changed(event: dict) -> None:
+    data = event["data"]
+    if event.get("partial"):
+        auth_cache.clear()
+        return
+    _invalidate(data["id"], data.get("key_hashes", ()))
+
+
+def _on_agent_wrote(event: dict) -> None:
+    stick_to_writer(event["data"]["key_hash"], event["ts"])
+
+
+for _evt in ("after_insert", "after_update", "after_delete"):
+    event.listen(Agent, _evt, _invalidate_on_write)
+
+event.listen(OrmSession, "after_flush", _after_flush)
+event.listen(OrmSession, "do_orm_execute", _do_orm_execute)
+
+bus.on(EventType.AGENT_CHANGED, _on_agent_changed)
+bus.on(EventType.AGENT_WROTE, _on_agent_wrote)
@@ -0,0 +1,290 @@
+"""
+公开能力目录快照：每条能力预先序列化为 CapabilityPublic 的 JSON 字节，
+并按 (created_at, id) 有序地分桶到“全部 / 按 type / 按 domain / 按 (type, domain)”。
+
+REST GET /v1/capabilities 与 A2A capabilities/list 直接拼接这些字节返回，
+一次翻页为一次二分查找加 limit 次字节拼接，与目录规模无关，不访问数据库。
+启动时全量构建，此后经 capability.changed 事件逐条增量更新（跨 worker 同步见 app/events.py）。
+重建（启动、事件监听重连后）按 (created_at, id) 顺序读取，在新快照中逐桶追加，分段让出事件循环，完成后整体换入；
+重建期间旧快照照常服务，期间收到的增量在换入后按序重放。
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import AsyncSessionLocal
+from app.events import EventType, bus
+from app.models import Capability
+from app.pagination import decode_cursor, encode_cursor
+from app.schemas import CapabilityPublic
+
+logger = logging.getLogger(__name__)
+
+Key = tuple[datetime, str]
+
+# 重建时每处理这么多行让出一次事件循环
+REBUILD_CHUNK = 1000
+
+_COLUMNS = (
+    Capability.id, Capability.created_at, Capability.agent_id, Capability.type,
+    Capability.input_schema, Capability.price, Capability.domains,
+)
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def _desc(keys: list[Key], before: Optional[Key]) -> Iterator[Key]:
+    """按降序产出 keys 中小于 before 的元素（不复制列表）。"""
+    i = bisect_left(keys, before) if before is not None else len(keys)
+    while i > 0:
+        i -= 1
+        yield keys[i]
+
+
+class CatalogSnapshot:
+    def __init__(self) -> None:
+        # cap_id -> (排序键, JSON 字节, type, domains)
+        self._items: dict[str, tuple[Key, bytes, str, frozenset[str]]] = {}
+        self._all: list[Key] = []
+        self._by_type: dict[str, list[Key]] = {}
+        self._by_domain: dict[str, list[Key]] = {}
+        self._by_type_domain: dict[tuple[str, str], list[Key]] = {}
+        self.ready = False
+        # 重建期间记录的增量：(cap_id, upsert 参数或 None 表示删除)，换入新快照后重放
+        self._replay: Optional[list[tuple[str, Optional[tuple]]]] = None
+        self._rebuild_lock = asyncio.Lock()
+
+    def _buckets(self, cap_type: str, domains: Iterable[str]) -> Iterator[tuple[dict, object]]:
+        yield self._by_type, cap_type
+        for d in domains:
+            yield self._by_domain, d
+            yield self._by_type_domain, (cap_type, d)
+
+    def upsert(
+        self,
+        cap_id: str,
+        created_at: datetime,
+        agent_id: str,
+        cap_type: str,
+        input_schema: Optional[dict],
+        price: Optional[dict],
+        domains: Optional[list],
+    ) -> None:
+        args = (cap_id, created_at, agent_id, cap_type, input_schema, price, domains)
+        if self._replay is not None:
+            self._replay.append((cap_id, args))
+        self._remove(cap_id)
+        key, body, cap_type, doms = _entry(*args)
+        self._items[cap_id] = (key, body, cap_type, doms)
+        insort(self._all, key)
+        for buckets, name in self._buckets(cap_type, doms):
+            insort(buckets.setdefault(name, []), key)
+
+    def _append(self, cap_id: str, *fields) -> None:
+        """全量构建用：只追加，构建完成后由 _sort 排序（按顺序追加时各桶已有序）。"""
+        key, body, cap_type, doms = _entry(cap_id, *fields)
+        self._items[cap_id] = (key, body, cap_type, doms)
+        self._all.append(key)
+        for buckets, name in self._buckets(cap_type, doms):
+            buckets.setdefault(name, []).append(key)
+
+    def _sort(self) -> None:
+        # 行已按 (created_at, id) 读出时近乎有序，Timsort 为线性；数据库与 Python 的字符串排序规则不同也能纠正
+        self._all.sort()
+        for buckets in (self._by_type, self._by_domain, self._by_type_domain):
+            for keys in buckets.values():
+                keys.sort()
+
+    def remove(self, cap_id: str) -> None:
+        if self._replay is not None:
+            self._replay.append((cap_id, None))
+        self._remove(cap_id)
+
+    def _remove(self, cap_id: str) -> None:
+        entry = self._items.pop(cap_id, None)
+        if entry is None:
+            return
+        key, _, cap_type, doms = entry
+        self._discard(self._all, key)
+        for buckets, name in self._buckets(cap_type, doms):
+            keys = buckets.get(name)
+            if keys is not None:
+                self._discard(keys, key)
+                if not keys:
+                    del buckets[name]
+
+    @staticmethod
+    def _discard(keys: list[Key], key: Key) -> None:
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def _swap(self, fresh: "CatalogSnapshot") -> None:
+        self._items = fresh._items
+        self._all = fresh._all
+        self._by_type = fresh._by_type
+        self._by_domain = fresh._by_domain
+        self._by_type_domain = fresh._by_type_domain
+        self.ready = True
+
+    def load(self, caps: Iterable) -> None:
+        """以 caps（含 Capability 各字段的对象或行）同步替换全部内容。"""
+        fresh = CatalogSnapshot()
+        for c in caps:
+            fresh._append(c.id, c.created_at, c.agent_id, c.type, c.input_schema, c.price, c.domains)
+        fresh._sort()
+        self._swap(fresh)
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """从数据库重建（见模块说明）；读取与构建期间旧快照照常服务，期间的增量在换入后重放。"""
+        async with self._rebuild_lock:
+            self._replay = []
+            try:
+                r = await db.execute(select(*_COLUMNS).order_by(Capability.created_at, Capability.id))
+                fresh = CatalogSnapshot()
+                for i, c in enumerate(r.all(), 1):
+                    fresh._append(c.id, c.created_at, c.agent_id, c.type, c.input_schema, c.price, c.domains)
+                    if i % REBUILD_CHUNK == 0:
+                        await asyncio.sleep(0)
+                fresh._sort()
+                replay = self._replay
+            finally:
+                self._replay = None
+            self._swap(fresh)
+            for cap_id, args in replay:
+                if args is None:
+                    self._remove(cap_id)
+                else:
+                    self.upsert(*args)
+        logger.info("catalog snapshot built: %d capabilities (%d replayed changes)", len(self._items), len(replay))
+
+    async def reload(self, cap_id: str) -> None:
+        """按数据库当前状态刷新单条能力（事件负载被截断时使用）。"""
+        async with AsyncSessionLocal() as db:
+            c = await db.get(Capability, cap_id)
+        if c is None:
+            self.remove(cap_id)
+        else:
+            self.upsert(c.id, c.created_at, c.agent_id, c.type, c.input_schema, c.price, c.domains)
+
+    def apply(self, data: dict) -> None:
+        """应用一条 capability.changed 事件数据。"""
+        if data.get("deleted"):
+            self.remove(data["id"])
+            return
+        self.upsert(
+            data["id"],
+            datetime.fromisoformat(data["created_at"]),
+            data["agent_id"],
+            data["type"],
+            data.get("input_schema"),
+            data.get("price"),
+            data.get("domains"),
+        )
+
+    def _bucket(self, cap_type: Optional[str], domain: str) -> list[Key]:
+        if cap_type:
+            return self._by_type_domain.get((cap_type, domain), [])
+        return self._by_domain.get(domain, [])
+
+    def _keys(self, cap_type: Optional[str], domains: Sequence[str], match_all: bool, before: Optional[Key]) -> Iterator[Key]:
+        """按降序产出满足过滤条件的键；领域为精确匹配，语义同 SQL 的 domains @> '["d"]'。"""
+        if not domains:
+            return _desc(self._by_type.get(cap_type, []) if cap_type else self._all, before)
+        if match_all:
+            # 从最小的桶出发，逐条检查是否包含其余领域
+            required = frozenset(domains)
+            smallest = min((self._bucket(cap_type, d) for d in required), key=len)
+            return (k for k in _desc(smallest, before) if required <= self._items[k[1]][3])
+        lists = [self._bucket(cap_type, d) for d in dict.fromkeys(domains)]
+        if len(lists) == 1:
+            return _desc(lists[0], before)
+        # 多个领域桶归并，同一能力可能出现在多个桶中
+        return _unique(heapq.merge(*(_desc(k, before) for k in lists), reverse=True))
+
+    def page(
+        self,
+        cap_type: Optional[str],
+        domains: Sequence[str],
+        match_all: bool,
+        cursor: Optional[str],
+        limit: int,
+    ) -> tuple[list[bytes], Optional[str]]:
+        """按 (created_at, id) 降序取一页；domains 为空时不按领域过滤。cursor 非法时抛出 HTTPException(400)。"""
+        before = None
+        if cursor:
+            ts, row_id = decode_cursor(cursor)
+            before = (_utc(ts), row_id)
+        keys = self._keys(cap_type, domains, match_all, before)
+        rows = list(islice(keys, limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(*rows[-1])
+        return [self._items[k[1]][1] for k in rows], next_cursor
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def _entry(
+    cap_id: str,
+    created_at: datetime,
+    agent_id: str,
+    cap_type: str,
+    input_schema: Optional[dict],
+    price: Optional[dict],
+    domains: Optional[list],
+) -> tuple[Key, bytes, str, frozenset[str]]:
+    """(排序键, 预序列化的 CapabilityPublic JSON, type, 参与分桶的 domains)。"""
+    body = CapabilityPublic(
+        agent_id=agent_id, type=cap_type, input_schema=input_schema, price=price, domains=domains,
+    ).model_dump_json().encode()
+    # domains 中可能混入非字符串，仅字符串参与分桶
+    doms = frozenset(d for d in domains or () if isinstance(d, str))
+    return (_utc(created_at), cap_id), body, cap_type, doms
+
+
+def _unique(keys: Iterator[Key]) -> Iterator[Key]:
+    """去掉有序序列中相邻的重复键。"""
+    last = None
+    for k in keys:
+        if k != last:
+            yield k
+        last = k
+
+
+def page_json(items: list[bytes], next_cursor: Optional[str]) -> bytes:
+    """拼接为 {"items": [...], "next_cursor": ...} 的 JSON 字节。"""
+    return b'{"items":[' + b",".join(items) + b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
+
+
+catalog = CatalogSnapshot()
+# 进行中的回库任务：事件循环只持有任务的弱引用，须保留引用以免任务未完成即被回收
+_tasks: set[asyncio.Task] = set()
+
+
+def _on_capability_changed(event: dict) -> None:
+    data = event["data"]
+    if event.get("partial"):
+        # input_schema / price 过大未随事件下发：回库读取该条
+        task = asyncio.get_running_loop().create_task(catalog.reload(data["id"]))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+        return
+    catalog.apply(data)
+
+
+bus.on(EventType.CAPABILITY_CHANGED, _on_capability_changed)
@@ -0,0 +1,236 @@
+"""
+事件总线：写路径登记带类型的事件，提交时经 Postgres NOTIFY 广播到所有 worker，
+各 worker 的 LISTEN 连接收到后扇出给本进程订阅者（SSE 连接、进程内缓存等）。
+
+- emit() 把事件挂在当前数据库会话上；get_db 提交前在同一事务内执行一条 pg_notify，
+  Postgres 仅在事务提交后投递通知，回滚的写入不会产生事件。
+- settings.event_bus = "local" 时不走 NOTIFY，提交后直接在本进程分发（单 worker / 非 Postgres）。
+- 每个订阅者持有有界队列；消费过慢导致队列溢出时放入 None 通知其断开，
+  客户端凭 Last-Event-ID 重连后从数据库补齐，不会丢消息。LISTEN 连接断开重连时同样处理。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timezone
+from enum import Enum
+from typing import Awaitable, Callable, Iterator, Optional, Union
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import AnySession, after_commit, before_commit
+from app.models import Message
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "wymyk_events"
+QUEUE_SIZE = 1000
+# NOTIFY 负载上限 8000 字节，超出时只保留 data 中的标量字段并标记 partial，由订阅方回库读取
+MAX_PAYLOAD = 7900
+
+
+class EventType(str, Enum):
+    MESSAGE_CREATED = "message.created"
+    RFP_CREATED = "rfp.created"
+    RFP_UPDATED = "rfp.updated"
+    CAPABILITY_CHANGED = "capability.changed"
+    PROPOSAL_STATUS_CHANGED = "proposal.status_changed"
+    AGENT_CHANGED = "agent.changed"
+    AGENT_WROTE = "agent.wrote"
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._subs: dict[str, set[asyncio.Queue]] = {}
+        self._handlers: dict[str, list[Callable[[dict], None]]] = {}
+
+    @contextmanager
+    def subscribe(self, topic: str) -> Iterator[asyncio.Queue]:
+        q: asyncio.Queue[Optional[dict]] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subs.setdefault(topic, set()).add(q)
+        try:
+            yield q
+        finally:
+            subs = self._subs.get(topic)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    del self._subs[topic]
+
+    def on(self, event_type: EventType, handler: Callable[[dict], None]) -> None:
+        """注册按事件类型处理的回调（每个 worker 对每条事件各调用一次）。"""
+        self._handlers.setdefault(event_type.value, []).append(handler)
+
+    def publish(self, topic: str, event: dict) -> None:
+        for q in list(self._subs.get(topic, ())):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                # 溢出：清空并放入 None，订阅方据此断开，由客户端续传
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(None)
+
+    def dispatch(self, event: dict) -> None:
+        for handler in self._handlers.get(event["type"], ()):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("event handler failed for %s", event["type"])
+        self.publish(event["topic"], event)
+
+    def disconnect_all(self) -> None:
+        """可能漏收事件时（LISTEN 断线）断开全部订阅者，促使其凭游标重连补齐。"""
+        for subs in self._subs.values():
+            for q in subs:
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(None)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            return len(self._subs.get(topic, ()))
+        return sum(len(s) for s in self._subs.values())
+
+
+bus = EventBus()
+
+
+def _encode(event: dict) -> str:
+    payload = json.dumps(event, ensure_ascii=False, default=str)
+    if len(payload.encode()) > MAX_PAYLOAD:
+        data = {k: v for k, v in event["data"].items() if not isinstance(v, (dict, list))}
+        payload = json.dumps({**event, "data": data, "partial": True}, ensure_ascii=False, default=str)
+    return payload
+
+
+def _resolve(event: dict) -> dict:
+    data = event["data"]
+    return {**event, "data": data() if callable(data) else data, "ts": time.time()}
+
+
+async def _notify_pending(db: AsyncSession) -> None:
+    events = db.info.pop("events", [])
+    if events:
+        await db.execute(
+            text("SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS text[])) AS p"),
+            {"channel": CHANNEL, "payloads": [_encode(_resolve(e)) for e in events]},
+        )
+
+
+def emit(
+    db: AnySession,
+    event_type: EventType,
+    topic: str,
+    data: Union[dict, Callable[[], dict]],
+) -> None:
+    """
+    登记一条事件，随当前事务提交广播；事务回滚则丢弃。
+    data 可为无参函数，在 flush 之后才求值（便于带上数据库默认值，如 created_at）。
+    """
+    event = {"type": event_type.value, "topic": topic, "data": data}
+    if settings.event_bus != "postgres":
+        after_commit(db, lambda: bus.dispatch(_resolve(event)))
+        return
+    pending = db.info.get("events")
+    if pending is None:
+        pending = db.info["events"] = []
+        before_commit(db, _notify_pending)
+    pending.append(event)
+
+
+class EventListener:
+    """每个 worker 一条专用 asyncpg 连接 LISTEN CHANNEL，断线自动重连。"""
+
+    def __init__(self, dsn: str, on_resync: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+        self.dsn = dsn
+        self.on_resync = on_resync
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lost = asyncio.Event()
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("malformed event payload on %s", channel)
+            return
+        bus.dispatch(event)
+
+    def _on_terminate(self, conn) -> None:
+        self._lost.set()
+
+    async def _connect(self) -> None:
+        self._conn = await asyncpg.connect(self.dsn)
+        self._conn.add_termination_listener(self._on_terminate)
+        await self._conn.add_listener(CHANNEL, self._on_notify)
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            await self._lost.wait()
+            self._lost.clear()
+            logger.warning("event listener connection lost, reconnecting")
+            while True:
+                try:
+                    await self._connect()
+                    break
+                except (OSError, asyncpg.PostgresError):
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 10.0)
+            delay = 0.5
+            # 断线期间的事件已丢失：断开订阅者让其续传，并重建进程内缓存
+            bus.disconnect_all()
+            if self.on_resync is not None:
+                try:
+                    await self.on_resync()
+                except Exception:
+                    logger.exception("event listener resync failed")
+
+    async def start(self) -> None:
+        await self._connect()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+
+def session_topic(session_id: str) -> str:
+    return f"session:{session_id}"
+
+
+def rfp_topic(rfp_id: str) -> str:
+    return f"rfp:{rfp_id}"
+
+
+def agent_topic(agent_id: str) -> str:
+    return f"agent:{agent_id}"
+
+
+def message_event(msg: Message) -> dict:
+    created_at = msg.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return {
+        "id": msg.id,
+        "session_id": msg.session_id,
+        "sender": msg.sender,
+        "payload": msg.payload,
+        "created_at": created_at.isoformat(),
+    }
+
+
+def emit_message_created(db: AnySession, msg: Message) -> None:
+    """新消息随事务提交推送给该会话的实时订阅者（所有 worker）。"""
+    emit(db, EventType.MESSAGE_CREATED, session_topic(msg.session_id), lambda: message_event(msg))
@@ -0,0 +1,140 @@
+"""
+消息写入的组提交（group commit），由 MESSAGE_GROUP_COMMIT 开启，默认关闭。
+
+开启后 REST send_message 与 A2A message/send（发往已有会话的消息）不再各自提交事务：消息进入本 worker 的队列，
+由单个后台任务每攒满 MESSAGE_GROUP_COMMIT_MAX_ROWS 条或等待 MESSAGE_GROUP_COMMIT_MAX_DELAY_MS 毫秒后，
+以一条多行 INSERT 写入并在一个事务内提交；调用方等到其所在批次提交成功才返回响应。
+
+持久性语义：
+- 返回 200 即已提交，与逐条提交相同（取决于数据库的 synchronous_commit 设置）；进程在提交前崩溃时，
+  只丢失尚未收到响应的消息，调用方按请求失败处理后重试即可；
+- 一批为一个事务：整批失败（如某条消息的会话刚被删除）时逐条重试，只有出错的调用方收到异常；
+- 调用方在等待期间断开，其消息仍会随批次写入（已持久但未确认）；
+- 消息事件（SSE / NOTIFY）在批次提交时发出；created_at 在入队时赋值，同一 worker 内批次按入队顺序提交，
+  游标顺序与可见顺序一致。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional, Sequence
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.db import AsyncSessionLocal, commit
+from app.events import emit_message_created
+from app.models import Message
+from app.session_participants import record_activity
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    def __init__(self, max_rows: int, max_delay: float) -> None:
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._pending: list[tuple[Message, asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def start(self) -> None:
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止接收新消息，写完队列中已有的消息后退出。"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def write(self, msgs: Sequence[Message]) -> None:
+        """入队并等待这些消息所在的批次提交；任一条写入失败时抛出其异常。"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for msg in msgs:
+            future = loop.create_future()
+            self._pending.append((msg, future))
+            futures.append(future)
+        if len(self._pending) >= self.max_rows:
+            self._full.set()
+        self._wakeup.set()
+        await asyncio.gather(*futures)
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._pending:
+                if self._closing:
+                    return
+                continue
+            # 攒批：最多等待 max_delay，期间攒满 max_rows 则立即写入
+            if self.max_delay > 0 and len(self._pending) < self.max_rows and not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            batch, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+            if self._pending or self._closing:
+                self._wakeup.set()
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[Message, asyncio.Future]]) -> None:
+        try:
+            await _insert([msg for msg, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                _resolve(batch, exc)
+                return
+            logger.warning("group commit of %d messages failed, retrying one by one", len(batch))
+            for item in batch:
+                try:
+                    await _insert([item[0]])
+                except Exception as row_exc:
+                    _resolve([item], row_exc)
+                else:
+                    _resolve([item])
+        else:
+            _resolve(batch)
+
+
+def _resolve(items: list[tuple[Message, asyncio.Future]], exc: Optional[BaseException] = None) -> None:
+    for _, future in items:
+        if future.done():
+            continue
+        if exc is None:
+            future.set_result(None)
+        else:
+            future.set_exception(exc)
+
+
+async def _insert(msgs: list[Message]) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(Message),
+            [
+                {"id": m.id, "session_id": m.session_id, "sender": m.sender, "payload": m.payload, "created_at": m.created_at}
+                for m in msgs
+            ],
+        )
+        await record_activity(db, msgs)
+        for m in msgs:
+            emit_message_created(db, m)
+        await commit(db)
+
+
+message_writer = GroupCommitWriter(
+    settings.message_group_commit_max_rows,
+    settings.message_group_commit_max_delay_ms / 1000,
+)
@@ -0,0 +1,139 @@
+"""
+公开 GET 接口的条件请求：强 ETag + If-None-Match -> 304，并下发 Cache-Control 供 CDN 缓存。
+
+ETag 由接口依赖的各表变更计数（table_versions）与请求的路径、查询参数、Accept 共同哈希得到，
+同一版本下各 worker 生成的 ETag 一致。计数在写入的同一事务内递增：capabilities / posts / agents
+的 ORM 写入经 mapper 事件自动登记，提交前以一条 upsert 批量递增；读取只需一次主键查询。
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Callable, Optional
+
+from fastapi import Depends, Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import object_session
+
+from app.config import settings
+from app.db import AnySession, before_commit, get_read_db
+from app.models import Agent, Capability, Post, TableVersion
+
+# 纳入版本计数的模型
+VERSIONED = (Agent, Capability, Post)
+
+
+class NotModified(Exception):
+    """If-None-Match 命中：由 main.py 注册的异常处理器转成 304 响应。"""
+
+    def __init__(self, headers: dict) -> None:
+        self.headers = headers
+
+
+def not_modified_response(request: Request, exc: NotModified) -> Response:
+    return Response(status_code=304, headers=exc.headers)
+
+
+async def _bump_pending(db: AsyncSession) -> None:
+    names = sorted(db.info.pop("bump_tables", ()))
+    if names:
+        stmt = insert(TableVersion).values([{"name": n, "version": 1} for n in names])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[TableVersion.name],
+            set_={"version": TableVersion.version + 1},
+        ))
+
+
+def bump(db: AnySession, *tables: str) -> None:
+    """登记本事务内发生变更的表，提交前统一递增其版本。"""
+    pending = db.info.get("bump_tables")
+    if pending is None:
+        pending = db.info["bump_tables"] = set()
+        before_commit(db, _bump_pending)
+    pending.update(tables)
+
+
+def _on_write(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        bump(session, mapper.local_table.name)
+
+
+for _model in VERSIONED:
+    for _evt in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _evt, _on_write)
+
+
+async def table_versions(db: AsyncSession, tables: tuple[str, ...]) -> dict[str, int]:
+    r = await db.execute(select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(tables)))
+    found = dict(r.all())
+    return {t: found.get(t, 0) for t in tables}
+
+
+def make_etag(*parts: object) -> str:
+    return '"' + hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀，* 匹配任意。"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cache_headers(etag: str, max_age: int) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age}",
+        "Vary": "Accept",
+    }
+
+
+def check_not_modified(request: Request, response: Response, etag: str, max_age: int) -> dict:
+    """写入缓存头；If-None-Match 命中时抛出 NotModified。返回头部供流式响应复用。"""
+    headers = cache_headers(etag, max_age)
+    if etag_matches(request, etag):
+        raise NotModified(headers)
+    response.headers.update(headers)
+    return headers
+
+
+async def conditional(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    tables: tuple[str, ...],
+    max_age: Optional[int] = None,
+) -> dict:
+    """按 tables 的版本与请求参数计算 ETag，语义同 check_not_modified。"""
+    # 先读版本再查数据：两者之间若有写入提交，只会得到“旧 ETag + 新数据”，下次请求即刷新，不会缓存过期内容
+    versions = await table_versions(db, tables)
+    etag = make_etag(
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        request.headers.get("accept", ""),
+        sorted(versions.items()),
+    )
+    return check_not_modified(request, response, etag, settings.http_cache_max_age if max_age is None else max_age)
+
+
+def cacheable(*tables: str, max_age: Optional[int] = None) -> Callable:
+    """
+    路由依赖：按 tables 的版本与请求参数计算 ETag，命中 If-None-Match 时直接返回 304。
+    依赖返回缓存头 dict；返回 StreamingResponse 等自建响应的分支需自行带上这些头。
+    """
+    async def dependency(
+        request: Request,
+        response: Response,
+        # 与路由共用同一个只读 Session：ETag 与数据须来自同一数据库（副本有复制延迟）
+        db: AsyncSession = Depends(get_read_db, scope="function"),
+    ) -> dict:
+        return await conditional(request, response, db, tables, max_age)
+
+    return dependency
@@ -1,21 +1,73 @@
+import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.db import engine, Base
-from app.routers import agents, capabilities, sessions, a2a, posts, rfps
+from app.auth import auth_cache
+from app.catalog import catalog
+from app.config import settings
+from app.db import engine, read_engines, Base, AsyncSessionLocal, asyncpg_dsn
+from app.events import EventListener
+from app.group_commit import message_writer
+from app.http_cache import NotModified, check_not_modified, make_etag, not_modified_response
+from app.match_index import capability_index
+from app.message_archive import index_cache_stats, manifest
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, exposition, flush_periodically, register_cache
+from app.partitions import ensure_partitions
+from app.query_budget import QueryBudgetMiddleware, mode as query_budget_mode
+from app.rfp_matches import backfill_if_empty
+from app.routers import admin, agents, capabilities, sessions, a2a, posts, rfps, search
+from app.search import backfill_all
+from app.slow_queries import SlowQueryMiddleware
+from app.session_participants import backfill_participants_if_empty
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # messages 按月分区：保证当前月及未来几个月的分区存在（日常由 python -m app.partitions ensure 维护）
+        await ensure_partitions(conn, settings.message_partitions_ahead)
+    listener = None
+    if settings.event_bus == "postgres":
+        # 先 LISTEN 再构建索引，避免两者之间的变更被漏掉
+        listener = EventListener(asyncpg_dsn, on_resync=_resync)
+        await listener.start()
+    async with AsyncSessionLocal() as db:
+        await capability_index.rebuild(db)
+        await catalog.rebuild(db)
+        await backfill_if_empty(db)
+        await backfill_participants_if_empty(db)
+    # 存量帖子 / RFP 的检索向量在后台分批补算，不阻塞启动
+    backfill = asyncio.create_task(backfill_all())
+    if settings.message_group_commit:
+        message_writer.start()
+    metrics_flush = None
+    if settings.metrics_enabled and settings.metrics_dir:
+        metrics_flush = asyncio.create_task(flush_periodically())
     yield
+    # 先写完组提交队列中的消息，再断开事件监听与连接池
+    await message_writer.stop()
+    backfill.cancel()
+    if metrics_flush is not None:
+        metrics_flush.cancel()
+    if listener is not None:
+        await listener.stop()
     await engine.dispose()
+    for e in read_engines:
+        await e.dispose()
+
+
+async def _resync() -> None:
+    """事件监听断线重连后：重建能力索引与目录快照、清空鉴权缓存。"""
+    auth_cache.clear()
+    async with AsyncSessionLocal() as db:
+        await capability_index.rebuild(db)
+        await catalog.rebuild(db)
 
 
 app = FastAPI(
@@ -28,6 +80,8 @@ app = FastAPI(
     openapi_url="/openapi.json",
 )
 
+app.add_exception_handler(NotModified, not_modified_response)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -36,6 +90,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.slow_query_ms > 0:
+    app.add_middleware(SlowQueryMiddleware)
+
+if query_budget_mode() != "off":
+    app.add_middleware(QueryBudgetMiddleware, raise_on_violation=query_budget_mode() == "raise")
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    register_cache("auth", auth_cache.stats)
+    register_cache("message_archive_manifest", manifest.stats)
+    register_cache("message_archive_index", index_cache_stats)
+
 app.include_router(agents.router)
 app.include_router(capabilities.router_private)
 app.include_router(capabilities.router_public)
@@ -43,6 +109,8 @@ app.include_router(sessions.router)
 app.include_router(a2a.router)
 app.include_router(posts.router)
 app.include_router(rfps.router)
+app.include_router(search.router)
+app.include_router(admin.router)
 
 
 # 前端 dist 目录（若存在则挂载，根路径展示 A2A 前端）
@@ -70,10 +138,19 @@ async def platform_doc():
     return FileResponse(path)
 
 
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus 抓取端点（指标说明见 app/metrics.py）。"""
+        return Response(exposition(), media_type=CONTENT_TYPE)
+
+
 @app.get("/.well-known/a2a.json", include_in_schema=False)
-async def well_known_a2a(request: Request):
+async def well_known_a2a(request: Request, response: Response):
     """Agent 发现端点：返回注册、文档、能力目录等 URL，便于自主接入。"""
     base = str(request.base_url).rstrip("/")
+    # 内容只随部署地址与版本变化
+    check_not_modified(request, response, make_etag(base, app.version), max_age=3600)
     return {
         "register_url": f"{base}/v1/agents/register",
         "openapi_url": f"{base}/openapi.json",
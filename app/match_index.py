@@ -0,0 +1,187 @@
+"""
+能力匹配倒排索引：capability_type -> domain -> 供应方 agent_id。
+
+启动时从 capabilities 表全量构建，能力增删改经 capability.changed 事件增量更新
+（跨 worker 同步见 app/events.py），RFP 供应方资格判断因此只需集合查找，无需访问数据库。
+重建时在新索引中构建、分段让出事件循环，完成后整体换入；期间收到的增量在换入后按序重放。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import AsyncSessionLocal
+from app.events import EventType, bus
+from app.models import Capability
+
+logger = logging.getLogger(__name__)
+
+# 重建时每处理这么多行让出一次事件循环
+REBUILD_CHUNK = 5000
+_COLUMNS = (Capability.id, Capability.agent_id, Capability.type, Capability.domains)
+
+
+class CapabilityMatchIndex:
+    """按 (type, domain) 维护 agent_id 引用计数；同一 agent 多条能力命中同一键时计数叠加。"""
+
+    def __init__(self) -> None:
+        # cap_id -> (agent_id, type, domains)
+        self._caps: dict[str, tuple[str, str, frozenset[str]]] = {}
+        # type -> agent_id -> 该类型能力条数
+        self._by_type: dict[str, dict[str, int]] = {}
+        # type -> domain -> agent_id -> 命中条数
+        self._by_domain: dict[str, dict[str, dict[str, int]]] = {}
+        self.ready = False
+        # 重建期间记录的增量：(cap_id, upsert 参数或 None 表示删除)，换入新索引后重放
+        self._replay: Optional[list[tuple[str, Optional[tuple]]]] = None
+        self._rebuild_lock = asyncio.Lock()
+
+    @staticmethod
+    def _incr(bucket: dict[str, int], agent_id: str, delta: int) -> None:
+        n = bucket.get(agent_id, 0) + delta
+        if n > 0:
+            bucket[agent_id] = n
+        else:
+            bucket.pop(agent_id, None)
+
+    def _apply(self, agent_id: str, cap_type: str, domains: frozenset[str], delta: int) -> None:
+        by_agent = self._by_type.setdefault(cap_type, {})
+        self._incr(by_agent, agent_id, delta)
+        if not by_agent:
+            self._by_type.pop(cap_type, None)
+        by_domain = self._by_domain.setdefault(cap_type, {})
+        for d in domains:
+            bucket = by_domain.setdefault(d, {})
+            self._incr(bucket, agent_id, delta)
+            if not bucket:
+                by_domain.pop(d, None)
+        if not by_domain:
+            self._by_domain.pop(cap_type, None)
+
+    def upsert(self, cap_id: str, agent_id: str, cap_type: str, domains: Optional[Iterable[str]]) -> None:
+        if self._replay is not None:
+            self._replay.append((cap_id, (cap_id, agent_id, cap_type, domains)))
+        self._remove(cap_id)
+        entry = (agent_id, cap_type, frozenset(domains or ()))
+        self._caps[cap_id] = entry
+        self._apply(*entry, delta=1)
+
+    def remove(self, cap_id: str) -> None:
+        if self._replay is not None:
+            self._replay.append((cap_id, None))
+        self._remove(cap_id)
+
+    def _remove(self, cap_id: str) -> None:
+        entry = self._caps.pop(cap_id, None)
+        if entry is not None:
+            self._apply(*entry, delta=-1)
+
+    def _swap(self, fresh: "CapabilityMatchIndex") -> None:
+        self._caps = fresh._caps
+        self._by_type = fresh._by_type
+        self._by_domain = fresh._by_domain
+        self.ready = True
+
+    def load(self, caps: Iterable) -> None:
+        """以 caps（含 id / agent_id / type / domains 的对象或行）同步替换全部内容。"""
+        fresh = CapabilityMatchIndex()
+        for c in caps:
+            fresh.upsert(c.id, c.agent_id, c.type, c.domains)
+        self._swap(fresh)
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """从数据库重建（见模块说明）；读取与构建期间旧索引照常服务，期间的增量在换入后重放。"""
+        async with self._rebuild_lock:
+            self._replay = []
+            try:
+                r = await db.execute(select(*_COLUMNS))
+                fresh = CapabilityMatchIndex()
+                for i, c in enumerate(r.all(), 1):
+                    fresh.upsert(c.id, c.agent_id, c.type, c.domains)
+                    if i % REBUILD_CHUNK == 0:
+                        await asyncio.sleep(0)
+                replay = self._replay
+            finally:
+                self._replay = None
+            self._swap(fresh)
+            for cap_id, args in replay:
+                if args is None:
+                    self._remove(cap_id)
+                else:
+                    self.upsert(*args)
+        logger.info("capability match index built: %d capabilities (%d replayed changes)", len(self._caps), len(replay))
+
+    def supplier_ids(self, capability_type: str, domain_filters: Optional[list]) -> set[str]:
+        """可针对该 capability_type / domain_filters 提交提案的 agent_id 集合。"""
+        if not domain_filters:
+            return set(self._by_type.get(capability_type, ()))
+        by_domain = self._by_domain.get(capability_type, {})
+        out: set[str] = set()
+        for d in domain_filters:
+            out.update(by_domain.get(d, ()))
+        return out
+
+    def is_supplier(self, agent_id: str, capability_type: str, domain_filters: Optional[list]) -> bool:
+        if not domain_filters:
+            return agent_id in self._by_type.get(capability_type, ())
+        by_domain = self._by_domain.get(capability_type, {})
+        return any(agent_id in by_domain.get(d, ()) for d in domain_filters)
+
+    def apply(self, data: dict) -> None:
+        """应用一条 capability.changed 事件数据。"""
+        if data.get("deleted"):
+            self.remove(data["id"])
+        else:
+            self.upsert(data["id"], data["agent_id"], data["type"], data.get("domains"))
+
+    def snapshot(self) -> dict[str, tuple[str, str, frozenset[str]]]:
+        return dict(self._caps)
+
+    async def check_consistency(self, db: AsyncSession, repair: bool = False) -> dict:
+        """与 capabilities 表逐条比对；返回缺失/多余/不一致的 cap_id，repair=True 时以数据库为准重建。"""
+        r = await db.execute(select(*_COLUMNS))
+        expected = {c.id: (c.agent_id, c.type, frozenset(c.domains or ())) for c in r.all()}
+        missing = sorted(k for k in expected if k not in self._caps)
+        stale = sorted(k for k in self._caps if k not in expected)
+        mismatched = sorted(k for k, v in expected.items() if k in self._caps and self._caps[k] != v)
+        ok = not (missing or stale or mismatched)
+        if not ok:
+            logger.warning(
+                "capability match index drift: missing=%d stale=%d mismatched=%d",
+                len(missing), len(stale), len(mismatched),
+            )
+            if repair:
+                # 重新读取并重建：比对期间收到的增量不会被较早读出的行覆盖
+                await self.rebuild(db)
+        return {"ok": ok, "missing": missing, "stale": stale, "mismatched": mismatched}
+
+
+capability_index = CapabilityMatchIndex()
+# 进行中的回库任务：事件循环只持有任务的弱引用，须保留引用以免任务未完成即被回收
+_tasks: set[asyncio.Task] = set()
+
+
+def _on_capability_changed(event: dict) -> None:
+    if event.get("partial"):
+        # 负载被截断（domains 未随事件下发）：回库读取该条
+        task = asyncio.get_running_loop().create_task(_reload(event["data"]["id"]))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+        return
+    capability_index.apply(event["data"])
+
+
+async def _reload(cap_id: str) -> None:
+    async with AsyncSessionLocal() as db:
+        c = await db.get(Capability, cap_id)
+    if c is None:
+        capability_index.remove(cap_id)
+    else:
+        capability_index.upsert(c.id, c.agent_id, c.type, c.domains)
+
+
+bus.on(EventType.CAPABILITY_CHANGED, _on_capability_changed)
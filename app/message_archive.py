@@ -0,0 +1,212 @@
+"""
+消息冷数据归档：分区导出文件的格式、按会话读取，以及与在线数据合并分页。
+
+每个归档分区对应两个文件（位于 settings.message_archive_dir，多 worker / 多机部署需为共享存储）：
+- <分区名>.ndjson.gz：按会话分段，每个会话一个独立的 gzip 成员（多成员 gzip，标准工具可整体解压），
+  成员内每行一条消息 JSON（字段同 MessageResponse），按 (created_at, id) 正序；
+- <分区名>.index.json：{"sessions": {session_id: [偏移, 长度, 条数]}}，读取单个会话只需定位并解压对应成员。
+
+归档清单（message_archives）在进程内缓存 message_archive_cache_ttl 秒。归档命令先登记清单、等待缓存过期后
+才摘除分区，期间同一批消息可能同时出现在库内与归档中，合并时按 id 去重，读取方不会漏读。
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Message, MessageArchive
+from app.pagination import decode_cursor
+
+DATA_SUFFIX = ".ndjson.gz"
+INDEX_SUFFIX = ".index.json"
+
+
+def archive_paths(partition: str, directory: Optional[str] = None) -> tuple[Path, Path]:
+    base = Path(directory or settings.message_archive_dir) / partition
+    return base.with_name(partition + DATA_SUFFIX), base.with_name(partition + INDEX_SUFFIX)
+
+
+def _index_path(data_path: str) -> Path:
+    return Path(data_path[: -len(DATA_SUFFIX)] + INDEX_SUFFIX)
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+class ArchiveWriter:
+    """逐会话写入归档文件；先写临时文件，close() 时落盘并原子改名。"""
+
+    def __init__(self, data_path: Path, index_path: Path) -> None:
+        self.data_path = data_path
+        self.index_path = index_path
+        self.sessions: dict[str, list[int]] = {}
+        self.rows = 0
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = data_path.with_name(data_path.name + ".tmp")
+        self._file = open(self._tmp, "wb")
+
+    def add_session(self, session_id: str, lines: list[bytes]) -> None:
+        member = gzip.compress(b"".join(lines))
+        self.sessions[session_id] = [self._file.tell(), len(member), len(lines)]
+        self._file.write(member)
+        self.rows += len(lines)
+
+    def close(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.data_path)
+        tmp_index = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_index, "w") as f:
+            json.dump({"rows": self.rows, "sessions": self.sessions}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_index, self.index_path)
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=64)
+def _load_index(index_path: Path) -> dict:
+    # 归档文件写成后不再修改，索引可长期缓存
+    with open(index_path) as f:
+        return json.load(f)["sessions"]
+
+
+def _read_session(data_path: str, session_id: str) -> list[Message]:
+    entry = _load_index(_index_path(data_path)).get(session_id)
+    if entry is None:
+        return []
+    offset, length, _ = entry
+    with open(data_path, "rb") as f:
+        f.seek(offset)
+        raw = gzip.decompress(f.read(length))
+    return [
+        Message(
+            id=d["id"],
+            session_id=d["session_id"],
+            sender=d["sender"],
+            payload=d["payload"],
+            created_at=datetime.fromisoformat(d["created_at"]),
+        )
+        for d in map(json.loads, raw.splitlines())
+    ]
+
+
+@dataclass(frozen=True)
+class _Archived:
+    partition: str
+    range_start: datetime
+    range_end: datetime
+    path: str
+
+
+class _Manifest:
+    """归档清单的进程内缓存（按 range_start 升序）。"""
+
+    def __init__(self) -> None:
+        self.items: list[_Archived] = []
+        self.loaded_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession) -> list[_Archived]:
+        if time.monotonic() - self.loaded_at < settings.message_archive_cache_ttl:
+            self.hits += 1
+            return self.items
+        async with self._lock:
+            if time.monotonic() - self.loaded_at >= settings.message_archive_cache_ttl:
+                self.misses += 1
+                r = await db.execute(
+                    select(MessageArchive.partition, MessageArchive.range_start, MessageArchive.range_end, MessageArchive.path)
+                    .order_by(MessageArchive.range_start)
+                )
+                self.items = [_Archived(*row) for row in r.all()]
+                self.loaded_at = time.monotonic()
+        return self.items
+
+    def invalidate(self) -> None:
+        self.loaded_at = float("-inf")
+
+    def stats(self) -> dict:
+        return {"size": len(self.items), "hits": self.hits, "misses": self.misses}
+
+
+manifest = _Manifest()
+
+
+def index_cache_stats() -> dict:
+    info = _load_index.cache_info()
+    return {"size": info.currsize, "hits": info.hits, "misses": info.misses}
+
+
+def _key(m: Message) -> tuple[datetime, str]:
+    return _utc(m.created_at), m.id
+
+
+async def fetch_messages(
+    db: AsyncSession,
+    session_id: str,
+    after: Optional[str],
+    before: Optional[str],
+    limit: int,
+    descending: bool = False,
+) -> list[Message]:
+    """
+    取会话中位于 (after, before) 之间的消息，按 (created_at, id) 排序（descending 时倒序），最多 limit + 1 条，
+    供 split_page 判断是否还有下一页。在线分区经 (session_id, created_at, id) 索引查询；
+    窗口覆盖已归档月份时，再从归档文件读取该会话的消息合并。
+    """
+    lower = decode_cursor(after) if after else None
+    upper = decode_cursor(before) if before else None
+    key = tuple_(Message.created_at, Message.id)
+    q = select(Message).where(Message.session_id == session_id)
+    # 行值比较之外再加单列 created_at 范围：分区裁剪只识别后者
+    if lower:
+        q = q.where(Message.created_at >= lower[0], key > tuple_(*lower))
+    if upper:
+        q = q.where(Message.created_at <= upper[0], key < tuple_(*upper))
+    if descending:
+        q = q.order_by(Message.created_at.desc(), Message.id.desc())
+    else:
+        q = q.order_by(Message.created_at, Message.id)
+    rows = list((await db.execute(q.limit(limit + 1))).scalars().all())
+
+    archived = await manifest.get(db)
+    lo = (_utc(lower[0]), lower[1]) if lower else None
+    hi = (_utc(upper[0]), upper[1]) if upper else None
+    parts = [
+        a for a in archived
+        if (lo is None or _utc(a.range_end) > lo[0]) and (hi is None or _utc(a.range_start) <= hi[0])
+    ]
+    if not parts:
+        return rows
+    extra: list[Message] = []
+    for a in (reversed(parts) if descending else parts):
+        msgs = await asyncio.to_thread(_read_session, a.path, session_id)
+        extra.extend(m for m in msgs if (lo is None or _key(m) > lo) and (hi is None or _key(m) < hi))
+        if len(extra) > limit:
+            break
+    return _merge(rows, extra, limit, descending)
+
+
+def _merge(rows: Iterable[Message], extra: Iterable[Message], limit: int, descending: bool) -> list[Message]:
+    by_id = {m.id: m for m in extra}
+    by_id.update((m.id, m) for m in rows)
+    return sorted(by_id.values(), key=_key, reverse=descending)[: limit + 1]
@@ -0,0 +1,417 @@
+"""
+Prometheus 指标：GET /metrics 以文本格式（0.0.4）输出，由 METRICS_ENABLED 控制，默认开启。
+
+- 路由：按方法与路由模板（如 /v1/rfps/{rfp_id}）统计请求数、延迟（到响应头发出为止，SSE 等长连接不计推送时长）、
+  每个请求执行的 SQL 条数与耗时；未匹配到路由的请求统一记为 route="unmatched"，避免标签基数膨胀；
+- SQL：经 SQLAlchemy 引擎的 before/after_cursor_execute 事件计时，按语句类型（select / insert / ...）分桶；
+- 连接池：取连接耗时（含新建连接与 pre-ping）、正在等待取连接的数量、已借出 / 空闲连接数与上限；
+- 缓存：各进程内缓存的命中 / 未命中计数与条目数（登记见 register_cache）。
+
+热路径上只有计时与字典累加，取值与格式化都在抓取时进行。指标默认按 worker 独立统计；
+多 worker 部署时设置 METRICS_DIR（同机各 worker 可写的目录），各 worker 每 METRICS_FLUSH_INTERVAL 秒把快照写入该目录，
+/metrics 汇总目录内仍在更新的快照（计数、直方图与瞬时值均求和）。worker 退出后其计数从总和中消失，表现为一次计数器重置。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+OPERATIONS = frozenset({"select", "insert", "update", "delete", "with", "begin", "commit", "rollback"})
+
+Labels = tuple[str, ...]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> list:
+        return [[list(k), v] for k, v in self.values.items()]
+
+
+class Histogram:
+    """每组标签一个列表：各桶（不累计）计数 + 超出最后一个桶的计数 + 总和。"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Labels = (), buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        v = self.values.get(labels)
+        if v is None:
+            v = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        v[bisect_left(self.buckets, value)] += 1
+        v[-1] += value
+
+    def samples(self) -> list:
+        return [[list(k), list(v)] for k, v in self.values.items()]
+
+
+class Collected:
+    """抓取时由回调取值的计数或瞬时值（如缓存命中数、连接池状态）。"""
+
+    def __init__(self, name: str, help: str, labels: Labels, kind: str) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.kind = kind
+        self.callbacks: list[Callable[[], Iterable[tuple[Labels, float]]]] = []
+
+    def samples(self) -> list:
+        out = []
+        for fn in self.callbacks:
+            try:
+                out.extend([list(k), v] for k, v in fn())
+            except Exception:
+                logger.exception("metrics collector %s failed", self.name)
+        return out
+
+
+Family = Union[Counter, Histogram, Collected]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.families: dict[str, Family] = {}
+
+    def add(self, family: Family) -> Family:
+        self.families[family.name] = family
+        return family
+
+    def snapshot(self) -> dict:
+        return {
+            f.name: {
+                "kind": f.kind,
+                "help": f.help,
+                "labels": list(f.labels),
+                "buckets": list(getattr(f, "buckets", ())),
+                "samples": f.samples(),
+            }
+            for f in self.families.values()
+        }
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.add(Counter("http_requests_total", "HTTP requests.", ("method", "route", "status")))
+HTTP_DURATION = registry.add(Histogram(
+    "http_request_duration_seconds", "Time until response headers are sent.", ("method", "route"),
+))
+HTTP_IN_FLIGHT = registry.add(Collected("http_requests_in_flight", "Requests being handled.", (), "gauge"))
+HTTP_DB_STATEMENTS = registry.add(Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ("method", "route"), STATEMENT_COUNT_BUCKETS,
+))
+HTTP_DB_SECONDS = registry.add(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request.", ("method", "route"),
+))
+DB_STATEMENT_SECONDS = registry.add(Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time.", ("operation",),
+))
+DB_POOL_CHECKOUT = registry.add(Histogram(
+    "db_pool_checkout_seconds", "Time to obtain a pooled connection, including connect and pre-ping.", ("pool",),
+))
+DB_POOL_FAILURES = registry.add(Counter(
+    "db_pool_checkout_failures_total", "Connection checkouts that raised (pool timeout or connect error).", ("pool",),
+))
+DB_POOL_WAITING = registry.add(Collected("db_pool_checkout_waiting", "Checkouts in progress.", ("pool",), "gauge"))
+DB_POOL_CONNECTIONS = registry.add(Collected(
+    "db_pool_connections", "Pooled connections by state.", ("pool", "state"), "gauge",
+))
+DB_POOL_MAX = registry.add(Collected(
+    "db_pool_max_connections", "pool_size + max_overflow.", ("pool",), "gauge",
+))
+CACHE_REQUESTS = registry.add(Collected(
+    "cache_requests_total", "In-process cache lookups.", ("cache", "result"), "counter",
+))
+CACHE_ENTRIES = registry.add(Collected("cache_entries", "In-process cache size.", ("cache",), "gauge"))
+
+
+# ---------------------------------------------------------------- 请求
+
+class _RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+_request: ContextVar[Optional[_RequestStats]] = ContextVar("metrics_request", default=None)
+_in_flight = 0
+HTTP_IN_FLIGHT.callbacks.append(lambda: [((), _in_flight)])
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：记录路由延迟与状态码，并为请求内执行的 SQL 计数。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        global _in_flight
+        stats = _RequestStats()
+        token = _request.set(stats)
+        start = time.perf_counter()
+        status = 500
+        headers_at: Optional[float] = None
+
+        async def send_wrapper(message) -> None:
+            nonlocal status, headers_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers_at = time.perf_counter()
+            await send(message)
+
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _in_flight -= 1
+            _request.reset(token)
+            route = scope.get("route")
+            labels = (
+                scope["method"] if scope["method"] in METHODS else "OTHER",
+                getattr(route, "path", None) or "unmatched",
+            )
+            HTTP_REQUESTS.inc((*labels, str(status)))
+            HTTP_DURATION.observe(labels, (headers_at or time.perf_counter()) - start)
+            HTTP_DB_STATEMENTS.observe(labels, stats.statements)
+            HTTP_DB_SECONDS.observe(labels, stats.db_seconds)
+
+
+# ---------------------------------------------------------------- SQL 与连接池
+
+def _operation(statement: str) -> str:
+    head = statement[:16].split(None, 1)
+    op = head[0].lower() if head else ""
+    return op if op in OPERATIONS else "other"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    DB_STATEMENT_SECONDS.observe((_operation(statement),), elapsed)
+    stats = _request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(context) -> None:
+    conn = context.connection
+    if conn is not None and conn.info.get("metrics_started"):
+        conn.info["metrics_started"].pop()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """记录取连接耗时与等待数；以 pool_logging_name（默认 "default"）作为 pool 标签。"""
+
+    _waiting: dict[str, int] = {}
+
+    def connect(self):
+        name = self._orig_logging_name or "default"
+        waiting = InstrumentedQueuePool._waiting
+        waiting[name] = waiting.get(name, 0) + 1
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except Exception:
+            DB_POOL_FAILURES.inc((name,))
+            raise
+        finally:
+            waiting[name] -= 1
+            DB_POOL_CHECKOUT.observe((name,), time.perf_counter() - start)
+
+
+DB_POOL_WAITING.callbacks.append(lambda: [((name,), n) for name, n in InstrumentedQueuePool._waiting.items()])
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """为引擎挂上 SQL 计时事件，并在抓取时读取其连接池状态（连接池需为 InstrumentedQueuePool）。"""
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+    def pool_state():
+        # dispose() 会替换连接池，每次抓取都取当前的
+        pool = sync_engine.pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            return []
+        name = pool._orig_logging_name or "default"
+        checked_out = pool.checkedout()
+        return [
+            ((name, "checked_out"), checked_out),
+            ((name, "idle"), pool.checkedin()),
+        ]
+
+    def pool_max():
+        pool = sync_engine.pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            return []
+        return [((pool._orig_logging_name or "default",), pool.size() + max(pool._max_overflow, 0))]
+
+    DB_POOL_CONNECTIONS.callbacks.append(pool_state)
+    DB_POOL_MAX.callbacks.append(pool_max)
+
+
+# ---------------------------------------------------------------- 缓存
+
+def register_cache(name: str, stats: Callable[[], dict]) -> None:
+    """
+    登记进程内缓存；stats() 返回 hits / misses（可选 negative_hits）与 size，
+    输出为 cache_requests_total{cache, result} 与 cache_entries{cache}，命中率由查询侧计算。
+    """
+    def requests():
+        s = stats()
+        out = [((name, "hit"), s["hits"]), ((name, "miss"), s["misses"])]
+        if "negative_hits" in s:
+            out.append(((name, "negative_hit"), s["negative_hits"]))
+        return out
+
+    CACHE_REQUESTS.callbacks.append(requests)
+    CACHE_ENTRIES.callbacks.append(lambda: [((name,), stats()["size"])])
+
+
+# ---------------------------------------------------------------- 输出与多 worker 汇总
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: list[str], values: list[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def render(snapshot: dict) -> str:
+    lines = []
+    for name, f in snapshot.items():
+        lines.append(f"# HELP {name} {f['help']}")
+        lines.append(f"# TYPE {name} {f['kind']}")
+        names = f["labels"]
+        for labels, value in sorted(f["samples"], key=lambda s: s[0]):
+            if f["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, n in zip(f["buckets"], value):
+                cumulative += n
+                le = _labels(names, labels, 'le="%s"' % _number(bound))
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            cumulative += value[-2]
+            le = _labels(names, labels, 'le="+Inf"')
+            lines.append(f"{name}_bucket{le} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def merge(snapshots: list[dict]) -> dict:
+    """按指标名与标签求和；直方图逐桶相加。"""
+    out: dict = {}
+    for snap in snapshots:
+        for name, f in snap.items():
+            target = out.setdefault(name, {**f, "samples": {}})
+            for labels, value in f["samples"]:
+                key = tuple(labels)
+                if key not in target["samples"]:
+                    target["samples"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(target["samples"][key], value)]
+                else:
+                    target["samples"][key] += value
+    for f in out.values():
+        f["samples"] = [[list(k), v] for k, v in f["samples"].items()]
+    return out
+
+
+def _snapshot_path() -> Path:
+    return Path(settings.metrics_dir) / f"{os.getpid()}.json"
+
+
+def _write(data: str) -> None:
+    path = _snapshot_path()
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(data)
+    os.replace(tmp, path)
+
+
+def write_snapshot() -> None:
+    _write(json.dumps(registry.snapshot(), ensure_ascii=False))
+
+
+def exposition() -> str:
+    """本 worker 的指标；设置了 METRICS_DIR 时汇总目录内所有仍在更新的 worker 快照。"""
+    if not settings.metrics_dir:
+        return render(registry.snapshot())
+    write_snapshot()
+    stale_before = time.time() - 3 * settings.metrics_flush_interval
+    snapshots = []
+    for path in Path(settings.metrics_dir).glob("*.json"):
+        try:
+            if path.stat().st_mtime < stale_before:
+                # 已退出的 worker
+                path.unlink(missing_ok=True)
+                continue
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return render(merge(snapshots))
+
+
+async def flush_periodically() -> None:
+    Path(settings.metrics_dir).mkdir(parents=True, exist_ok=True)
+    try:
+        while True:
+            try:
+                # 取快照须在事件循环线程内（与请求的累加互斥），只把写文件放到线程
+                await asyncio.to_thread(_write, json.dumps(registry.snapshot(), ensure_ascii=False))
+            except OSError:
+                logger.exception("metrics snapshot write failed")
+            await asyncio.sleep(settings.metrics_flush_interval)
+    finally:
+        _snapshot_path().unlink(missing_ok=True)
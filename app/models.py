@@ -3,14 +3,15 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, DateTime, ForeignKey, Numeric
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import BigInteger, DDL, String, DateTime, ForeignKey, Numeric, Index, event
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db import Base
 
 
 class Agent(Base):
     __tablename__ = "agents"
+    __table_args__ = (Index("idx_agents_api_key_hash", "api_key_hash"),)
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     did: Mapped[str] = mapped_column(String(128), unique=True, nullable=False)
@@ -22,6 +23,15 @@ class Agent(Base):
 
 class Capability(Base):
     __tablename__ = "capabilities"
+    __table_args__ = (
+        Index("idx_capabilities_created_at_id", "created_at", "id"),
+        Index("idx_capabilities_type_created_at_id", "type", "created_at", "id"),
+        # 领域过滤 domains @> '["d"]'
+        Index(
+            "idx_capabilities_domains", "domains",
+            postgresql_using="gin", postgresql_ops={"domains": "jsonb_path_ops"},
+        ),
+    )
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     agent_id: Mapped[str] = mapped_column(String(64), ForeignKey("agents.id", ondelete="CASCADE"), nullable=False)
@@ -32,8 +42,17 @@ class Capability(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
 
+# 同 sql/001_schema.sql：提高 domains 的统计精度，计划器据此判断领域过滤是否走 GIN 索引
+event.listen(
+    Capability.__table__,
+    "after_create",
+    DDL("ALTER TABLE capabilities ALTER COLUMN domains SET STATISTICS 1000").execute_if(dialect="postgresql"),
+)
+
+
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (Index("idx_sessions_created_at_id", "created_at", "id"),)
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     parties: Mapped[dict] = mapped_column(JSONB, nullable=False)
@@ -41,14 +60,52 @@ class Session(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
 
+class SessionParticipant(Base):
+    """会话参与方（由 sessions.parties 展开），供成员校验与收件箱按 agent_id 走索引查询"""
+    __tablename__ = "session_participants"
+    # 收件箱：agent_id 等值 + (created_at, session_id) 或 (last_activity_at, session_id) 倒序，索引范围扫描即得分页结果
+    __table_args__ = (
+        Index("idx_session_participants_agent_created_at", "agent_id", "created_at", "session_id"),
+        Index("idx_session_participants_agent_activity", "agent_id", "last_activity_at", "session_id"),
+    )
+
+    session_id: Mapped[str] = mapped_column(String(64), ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    agent_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # 冗余会话的 created_at，与 sessions 上的游标一致
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # 已读位置：该参与方读到的最后一条消息 (created_at, id)，为空表示尚未读过
+    last_read_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_read_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # 最后活动：会话最新一条消息的 (created_at, id)，随消息写入推进；无消息时为会话创建时间且 last_message_id 为空
+    last_activity_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_message_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
+
 class Message(Base):
+    """会话消息：按 created_at 按月分区（分区维护与冷数据归档见 app/partitions.py），主键需包含分区键"""
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("idx_messages_session_created_at_id", "session_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     session_id: Mapped[str] = mapped_column(String(64), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
     sender: Mapped[str] = mapped_column(String(64), nullable=False)
     payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, default=datetime.utcnow)
+
+
+class MessageArchive(Base):
+    """已导出为压缩文件的消息分区（冷数据）；读取接口据此回退到归档文件"""
+    __tablename__ = "message_archives"
+
+    partition: Mapped[str] = mapped_column(String(64), primary_key=True)
+    range_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    range_end: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    path: Mapped[str] = mapped_column(String(512), nullable=False)
+    row_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
 
 class Deal(Base):
@@ -65,6 +122,11 @@ class Deal(Base):
 class Post(Base):
     """社区发帖 / 询价（人类或 Agent 可见）"""
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("idx_posts_created_at_id", "created_at", "id"),
+        Index("idx_posts_kind_created_at_id", "kind", "created_at", "id"),
+        Index("idx_posts_search", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     author_agent_id: Mapped[str] = mapped_column(String(64), ForeignKey("agents.id", ondelete="CASCADE"), nullable=False)
@@ -72,11 +134,18 @@ class Post(Base):
     content: Mapped[str] = mapped_column(String(10000), nullable=False)
     kind: Mapped[str] = mapped_column(String(32), nullable=False, default="discussion")  # discussion | inquiry
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    # 全文检索向量，由 app/search.py 在写入时维护
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
 
 class Rfp(Base):
     """需求单：买方 Agent 创建，用于能力匹配与提案收集"""
     __tablename__ = "rfps"
+    __table_args__ = (
+        Index("idx_rfps_created_at_id", "created_at", "id"),
+        Index("idx_rfps_creator", "creator_agent_id"),
+        Index("idx_rfps_search", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     creator_agent_id: Mapped[str] = mapped_column(String(64), ForeignKey("agents.id", ondelete="CASCADE"), nullable=False)
@@ -88,11 +157,14 @@ class Rfp(Base):
     deadline_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="open")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    # 全文检索向量，由 app/search.py 在写入时维护
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
 
 class Proposal(Base):
     """提案：供应方针对某 RFP 提交"""
     __tablename__ = "proposals"
+    __table_args__ = (Index("idx_proposals_rfp_created_at_id", "rfp_id", "created_at", "id"),)
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     rfp_id: Mapped[str] = mapped_column(String(64), ForeignKey("rfps.id", ondelete="CASCADE"), nullable=False)
@@ -102,3 +174,21 @@ class Proposal(Base):
     delivery_at: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
     content: Mapped[Optional[str]] = mapped_column(String(5000), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class RfpMatch(Base):
+    """RFP 与匹配到的供应方 Agent（写时扇出的物化关系，供「匹配到我的 RFP」走索引查询）"""
+    __tablename__ = "rfp_matches"
+    __table_args__ = (Index("idx_rfp_matches_agent", "agent_id", "rfp_id"),)
+
+    rfp_id: Mapped[str] = mapped_column(String(64), ForeignKey("rfps.id", ondelete="CASCADE"), primary_key=True)
+    agent_id: Mapped[str] = mapped_column(String(64), ForeignKey("agents.id", ondelete="CASCADE"), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class TableVersion(Base):
+    """表级变更计数：公开接口据此生成 ETag（见 app/http_cache.py）"""
+    __tablename__ = "table_versions"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
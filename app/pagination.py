@@ -0,0 +1,73 @@
+"""
+基于 (created_at, id) 的游标分页（keyset pagination）。
+
+游标为不透明字符串（base64url 编码的 [created_at, id]），客户端只需原样回传 next_cursor。
+排序与比较均使用行值 (created_at, id)，可由对应复合索引直接服务，且时间戳相同时顺序稳定。
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException, Query
+from sqlalchemy import Select, tuple_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, row_id = json.loads(raw)
+        return datetime.fromisoformat(ts), str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def cursor_param():
+    return Query(None, description="上一页响应中的 next_cursor，不传则从第一页开始")
+
+
+def limit_param():
+    return Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT, description=f"每页条数，最大 {MAX_LIMIT}")
+
+
+def keyset(
+    q: Select,
+    model: Any,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = True,
+    columns: Optional[tuple[Any, Any]] = None,
+) -> Select:
+    """
+    为查询追加游标条件、(created_at, id) 排序，并多取一条用于判断是否还有下一页。
+    columns 可指定另一对取值相同的 (created_at, id) 列（如关联表上的冗余列），以便走该表的索引。
+    """
+    created_at, row_id_col = columns or (model.created_at, model.id)
+    key = tuple_(created_at, row_id_col)
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        q = q.where(key < tuple_(ts, row_id) if descending else key > tuple_(ts, row_id))
+    if descending:
+        q = q.order_by(created_at.desc(), row_id_col.desc())
+    else:
+        q = q.order_by(created_at, row_id_col)
+    return q.limit(limit + 1)
+
+
+def split_page(rows: Sequence[Any], limit: int) -> tuple[Sequence[Any], Optional[str]]:
+    """截取本页数据并计算 next_cursor（无更多数据时为 None）。"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
@@ -0,0 +1,241 @@
+"""
+messages 按月分区的维护命令（仅 PostgreSQL）。
+
+    python -m app.partitions ensure [--ahead 3]      # 创建当前月起未来若干个月的分区（幂等），建议 cron 每天执行
+    python -m app.partitions list                    # 列出在线分区与已归档分区
+    python -m app.partitions archive [--older-than 12] [--dir data/message_archive] [--force] [--keep-table] [--dry-run]
+
+分区按 UTC 自然月划分，命名为 messages_pYYYYMM，范围 [当月 1 日, 次月 1 日)。服务启动时也会执行一次 ensure。
+
+归档：结束于 N 个月前（当月 1 日往前数）之前的分区，若其中消息所属的会话都已关闭（status 不为 active，
+或截止点之后再无新消息），则导出为压缩文件（格式见 app/message_archive.py）并登记到 message_archives，
+等待各 worker 的归档清单缓存过期后 DETACH 并删除该分区；--force 跳过会话关闭检查。
+登记之后的步骤失败可直接重跑：已登记的分区跳过导出，只做摘除。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.db import engine
+from app.message_archive import ArchiveWriter, archive_paths
+from app.models import MessageArchive
+
+logger = logging.getLogger(__name__)
+
+PARENT = "messages"
+_NAME_RE = re.compile(r"^messages_p(\d{4})(\d{2})$")
+# 等待清单缓存过期时额外留出的余量（秒）
+GRACE_MARGIN = 5.0
+EXPORT_BATCH = 2000
+
+
+def month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    y, m = divmod(month.year * 12 + month.month - 1 + n, 12)
+    return datetime(y, m + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    m = _NAME_RE.match(name)
+    return datetime(int(m[1]), int(m[2]), 1, tzinfo=timezone.utc) if m else None
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    r = await conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"
+    ), {"t": PARENT})
+    return bool(r.scalar())
+
+
+async def online_partitions(conn: AsyncConnection) -> dict[str, datetime]:
+    """在线（已挂载）且符合命名规则的分区：名称 -> 月份。"""
+    r = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = to_regclass(:t)"
+    ), {"t": PARENT})
+    found = {name: partition_month(name) for (name,) in r.all()}
+    return {name: month for name, month in found.items() if month is not None}
+
+
+async def ensure_partitions(conn: AsyncConnection, ahead: int, now: Optional[datetime] = None) -> list[str]:
+    """创建当前月至未来 ahead 个月的分区（已存在则跳过），返回新建的分区名。"""
+    if not await is_partitioned(conn):
+        logger.warning("messages is not partitioned; run sql/009_messages_partitioning.sql")
+        return []
+    existing = await online_partitions(conn)
+    current = month_start(now or datetime.now(timezone.utc))
+    created = []
+    for i in range(ahead + 1):
+        month = add_months(current, i)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        await conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT}'
+            f" FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        created.append(name)
+    return created
+
+
+async def _archivable(conn: AsyncConnection, name: str, cutoff: datetime) -> bool:
+    """分区内消息所属的会话是否都已关闭：status 不为 active，或截止点之后没有新消息。"""
+    r = await conn.execute(text(f"""
+        SELECT NOT EXISTS (
+            SELECT 1
+            FROM (SELECT DISTINCT session_id FROM "{name}") p
+            JOIN sessions s ON s.id = p.session_id
+            WHERE s.status = 'active'
+              AND EXISTS (SELECT 1 FROM {PARENT} m WHERE m.session_id = p.session_id AND m.created_at >= :cutoff)
+        )
+    """), {"cutoff": cutoff})
+    return bool(r.scalar())
+
+
+def _line(row) -> bytes:
+    # payload 以 ::text 原样取出拼入，省去一次 JSON 解析与序列化
+    head = json.dumps(
+        {"id": row.id, "session_id": row.session_id, "sender": row.sender}, ensure_ascii=False, separators=(",", ":"),
+    )
+    created_at = json.dumps(row.created_at.astimezone(timezone.utc).isoformat())
+    return f'{head[:-1]},"payload":{row.payload},"created_at":{created_at}}}\n'.encode()
+
+
+async def export_partition(name: str, directory: str) -> tuple[str, int]:
+    """按 (session_id, created_at, id) 顺序导出分区，每个会话一个 gzip 成员；返回数据文件路径与行数。"""
+    data_path, index_path = archive_paths(name, directory)
+    writer = ArchiveWriter(data_path, index_path)
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+            result = await conn.stream(text(
+                f'SELECT id, session_id, sender, payload::text AS payload, created_at FROM "{name}"'
+                " ORDER BY session_id, created_at, id"
+            ).execution_options(yield_per=EXPORT_BATCH))
+            current, lines = None, []
+            async for row in result:
+                if row.session_id != current:
+                    if lines:
+                        writer.add_session(current, lines)
+                    current, lines = row.session_id, []
+                lines.append(_line(row))
+            if lines:
+                writer.add_session(current, lines)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return str(data_path.resolve()), writer.rows
+
+
+async def archive(older_than: int, directory: str, force: bool, keep_table: bool, dry_run: bool, grace: float) -> None:
+    now = datetime.now(timezone.utc)
+    cutoff = add_months(month_start(now), -older_than)
+    async with engine.connect() as conn:
+        if not await is_partitioned(conn):
+            print("messages is not partitioned; run sql/009_messages_partitioning.sql first", file=sys.stderr)
+            return
+        online = await online_partitions(conn)
+        registered = {
+            row.partition: row for row in (await conn.execute(select(MessageArchive))).all()
+        }
+        candidates = sorted(name for name, month in online.items() if add_months(month, 1) <= cutoff)
+        plan = []
+        for name in candidates:
+            if name in registered or force or await _archivable(conn, name, cutoff):
+                plan.append(name)
+            else:
+                print(f"skip {name}: has sessions still active after {cutoff:%Y-%m-%d}")
+    if dry_run:
+        for name in plan:
+            print(f"would archive {name}")
+        return
+
+    for name in plan:
+        month = online[name]
+        if name not in registered:
+            path, rows = await export_partition(name, directory)
+            async with engine.begin() as conn:
+                await conn.execute(MessageArchive.__table__.insert().values(
+                    partition=name, range_start=month, range_end=add_months(month, 1),
+                    path=path, row_count=rows, archived_at=datetime.now(timezone.utc),
+                ))
+            print(f"exported {name}: {rows} rows -> {path}")
+            registered_at = datetime.now(timezone.utc)
+        else:
+            registered_at = registered[name].archived_at
+        # 等各 worker 的归档清单缓存刷新（开始从文件读取）后再摘除分区
+        wait = (registered_at + timedelta(seconds=grace) - datetime.now(timezone.utc)).total_seconds()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        async with engine.begin() as conn:
+            await conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            await conn.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION "{name}"'))
+            if not keep_table:
+                await conn.execute(text(f'DROP TABLE "{name}"'))
+        print(f"detached {name}" + ("" if keep_table else " and dropped"))
+
+
+async def list_partitions() -> None:
+    async with engine.connect() as conn:
+        online = await online_partitions(conn)
+        for name in sorted(online):
+            rows = (await conn.execute(text(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = :n"
+            ), {"n": name})).scalar()
+            print(f"online    {name}  ~{max(rows, 0)} rows")
+        for a in (await conn.execute(select(MessageArchive).order_by(MessageArchive.range_start))).all():
+            print(f"archived  {a.partition}  {a.row_count} rows  {a.path}")
+
+
+async def main(argv: Optional[list[str]] = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.partitions", description="messages 分区维护")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ensure", help="预先创建未来月份的分区")
+    p.add_argument("--ahead", type=int, default=settings.message_partitions_ahead)
+    sub.add_parser("list", help="列出在线与已归档分区")
+    p = sub.add_parser("archive", help="导出并摘除旧分区")
+    p.add_argument("--older-than", type=int, default=settings.message_archive_after_months, help="月数")
+    p.add_argument("--dir", default=settings.message_archive_dir)
+    p.add_argument("--force", action="store_true", help="不检查会话是否已关闭")
+    p.add_argument("--keep-table", action="store_true", help="摘除后保留分区表，不删除")
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument(
+        "--grace", type=float, default=settings.message_archive_cache_ttl + GRACE_MARGIN,
+        help="登记归档后等待多少秒再摘除分区（不小于各 worker 的清单缓存时长）",
+    )
+    args = ap.parse_args(argv)
+    try:
+        if args.command == "ensure":
+            async with engine.begin() as conn:
+                for name in await ensure_partitions(conn, args.ahead):
+                    print(f"created {name}")
+        elif args.command == "list":
+            await list_partitions()
+        else:
+            await archive(args.older_than, args.dir, args.force, args.keep_table, args.dry_run, args.grace)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
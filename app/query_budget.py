@@ -0,0 +1,177 @@
+"""
+SQL 查询预算与 N+1 检测。
+
+- 路由在代码中声明预算：@budget(statements=N, repeats=K) 标注在路由函数上（位于 @router.get 等之下）。
+  statements 为一个请求（含鉴权、提交等依赖）最多执行的 SQL 条数，应与返回条数无关；
+  repeats 为同一条语句（只有参数不同，见 fingerprint）在一个请求内最多执行的次数，超过即视为循环内查询（N+1）；
+- QUERY_BUDGET=warn | raise 时由 QueryBudgetMiddleware 逐请求检查，并在响应头 X-Query-Count 中返回本请求的 SQL 条数：
+  warn 记录日志；raise 把超出预算的请求改为 500（开发与回归检查用，须在响应头发出前判定，流式响应只计已执行的部分）。
+  未设置时开发环境（ENV=development）为 warn，其他环境关闭；未声明预算的路由只做 N+1 检查；
+- 脚本或调试代码中可用上下文管理器：with query_budget(statements=3): ...，超出时抛出 QueryBudgetExceeded。
+
+tests/test_query_budget.py 逐个调用全部路由，校验每个路由都声明了预算且未超出。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 同一语句默认允许的执行次数；1 即任何重复都视为循环内查询
+DEFAULT_REPEATS = 1
+
+_WS = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+# 类型转换可为多词类型（TIMESTAMP WITH TIME ZONE、DOUBLE PRECISION 等）并带长度或数组后缀
+_CAST = r"::\w+(?:\s+(?:with|without)\s+time\s+zone|\s+varying|\s+precision)?(?:\(\d+(?:,\s*\d+)?\))?(?:\[\])?"
+_PARAM = rf"(?:\$\d+|%\(\w+\)s|\?)(?:{_CAST})?"
+_PARAMS = re.compile(rf"{_PARAM}(?:\s*,\s*{_PARAM})*", re.I)
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+
+
+def fingerprint(statement: str) -> str:
+    """归一化语句：字面量与参数占位（含类型转换与 IN 展开的参数列表）替换为 ?，合并空白；只有参数不同的语句指纹相同。"""
+    s = _STRING.sub("?", statement)
+    s = _PARAMS.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    return _WS.sub(" ", s).strip()
+
+
+@dataclass(frozen=True)
+class Budget:
+    statements: Optional[int] = None
+    repeats: int = DEFAULT_REPEATS
+
+
+@dataclass
+class QueryLog:
+    statements: int = 0
+    by_fingerprint: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str) -> None:
+        self.statements += 1
+        self.by_fingerprint[fingerprint(statement)] += 1
+
+    def violations(self, budget: Budget) -> list[str]:
+        out = []
+        if budget.statements is not None and self.statements > budget.statements:
+            out.append(f"{self.statements} statements > budget {budget.statements}")
+        for fp, n in self.by_fingerprint.items():
+            if n > budget.repeats:
+                out.append(f"repeated {n}x (> {budget.repeats}): {fp[:300]}")
+        return out
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, label: str, violations: list[str]) -> None:
+        super().__init__(f"query budget exceeded in {label}: " + "; ".join(violations))
+        self.label = label
+        self.violations = violations
+
+
+_current: ContextVar[Optional[QueryLog]] = ContextVar("query_budget_log", default=None)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    log = _current.get()
+    if log is not None:
+        log.record(statement)
+
+
+def track_queries(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def query_budget(statements: Optional[int] = None, repeats: int = DEFAULT_REPEATS, label: str = "block") -> Iterator[QueryLog]:
+    """记录块内执行的 SQL（同一任务内，含被 await 的协程）；超出预算时在退出时抛出 QueryBudgetExceeded。"""
+    log = QueryLog()
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+    problems = log.violations(Budget(statements, repeats))
+    if problems:
+        raise QueryBudgetExceeded(label, problems)
+
+
+def budget(statements: int, repeats: int = DEFAULT_REPEATS) -> Callable:
+    """声明路由预算（只做标注，不包装函数）。"""
+    def mark(fn: Callable) -> Callable:
+        fn.__query_budget__ = Budget(statements, repeats)
+        return fn
+
+    return mark
+
+
+def mode() -> str:
+    if settings.query_budget:
+        return settings.query_budget
+    return "warn" if settings.env == "development" else "off"
+
+
+class QueryBudgetMiddleware:
+    """按路由声明的预算检查每个请求（见模块说明）。"""
+
+    def __init__(self, app, raise_on_violation: bool = False) -> None:
+        self.app = app
+        self.raise_on_violation = raise_on_violation
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog()
+        token = _current.set(log)
+        failed = False
+
+        async def send_wrapper(message) -> None:
+            nonlocal failed
+            if failed:
+                return
+            if message["type"] == "http.response.start":
+                problems = self._check(scope, log)
+                if problems and self.raise_on_violation:
+                    failed = True
+                    await _send_error(send, problems)
+                    return
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-query-count", str(log.statements).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def _check(scope, log: QueryLog) -> list[str]:
+        route = scope.get("route")
+        declared = getattr(getattr(route, "endpoint", None), "__query_budget__", None) or Budget()
+        problems = log.violations(declared)
+        if problems:
+            label = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+            logger.warning("query budget exceeded in %s: %s", label, "; ".join(problems))
+        return problems
+
+
+async def _send_error(send, problems: list[str]) -> None:
+    body = json.dumps({"detail": "Query budget exceeded", "violations": problems}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 500,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
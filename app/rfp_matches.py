@@ -0,0 +1,51 @@
+"""
+RFP ↔ 供应方匹配关系（rfp_matches）的写时扇出。
+
+匹配规则与提案资格一致：能力 type = RFP.capability_type，且 RFP 无 domain_filters
+或该条能力的 domains 与 domain_filters 有交集；RFP 创建方自身不计入。
+每次维护均为一条 INSERT ... SELECT，在当前请求事务内完成。
+"""
+from __future__ import annotations
+
+from sqlalchemy import delete, exists, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import RfpMatch
+
+_MATCH_SELECT = """
+    SELECT DISTINCT r.id, c.agent_id, now()
+    FROM rfps r
+    JOIN capabilities c ON c.type = r.capability_type
+    WHERE c.agent_id <> r.creator_agent_id
+      AND CASE
+          WHEN jsonb_typeof(r.domain_filters) = 'array' AND jsonb_array_length(r.domain_filters) > 0
+          THEN c.domains ?| ARRAY(SELECT jsonb_array_elements_text(r.domain_filters))
+          ELSE true
+      END
+"""
+
+_INSERT = "INSERT INTO rfp_matches (rfp_id, agent_id, created_at)" + _MATCH_SELECT
+
+_FOR_RFP = text(_INSERT + " AND r.id = :rfp_id ON CONFLICT DO NOTHING")
+_FOR_AGENT = text(_INSERT + " AND c.agent_id = :agent_id ON CONFLICT DO NOTHING")
+_FOR_ALL = text(_INSERT + " ON CONFLICT DO NOTHING")
+
+
+async def refresh_rfp_matches(db: AsyncSession, rfp_id: str) -> None:
+    """RFP 创建或匹配条件变化后，重算该 RFP 的全部匹配供应方。"""
+    await db.execute(delete(RfpMatch).where(RfpMatch.rfp_id == rfp_id))
+    await db.execute(_FOR_RFP, {"rfp_id": rfp_id})
+
+
+async def refresh_agent_matches(db: AsyncSession, agent_id: str) -> None:
+    """某 Agent 能力增删改后，重算其匹配到的全部 RFP。"""
+    await db.execute(delete(RfpMatch).where(RfpMatch.agent_id == agent_id))
+    await db.execute(_FOR_AGENT, {"agent_id": agent_id})
+
+
+async def backfill_if_empty(db: AsyncSession) -> None:
+    """新建 rfp_matches 表后首次启动时，按现有 rfps/capabilities 全量回填。"""
+    has_matches = (await db.execute(select(exists().select_from(RfpMatch)))).scalar()
+    if not has_matches:
+        await db.execute(_FOR_ALL)
+        await db.commit()
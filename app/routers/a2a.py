@@ -1,83 +1,413 @@
 """
 A2A 协议兼容端点：接收 JSON-RPC 2.0 风格请求，转成内部会话/消息逻辑后以 A2A 格式回包。
 参考: https://github.com/google/A2A
+
+支持 JSON-RPC 批量请求（请求体为数组）：整批只鉴权一次、共用一个数据库事务，
+各条目独立校验、独立返回 result / error；批内 session/create、message/send 的写入在批末合并执行
+（消息为一条多行 INSERT），整体放在一个 SAVEPOINT 内；失败时回滚并逐条目各在自己的 SAVEPOINT 内重写，
+写入失败的条目改为返回错误，其余条目照常提交。批内条目的数据库读取同样各在 SAVEPOINT 内执行。
+
+message/stream、tasks/resubscribe 为流式方法：以 SSE 返回，每个事件的 data 为一条 JSON-RPC 响应，
+持续推送会话中对方发来的消息；流式方法不能放在批量请求中。
 """
 from __future__ import annotations
 
+import json
+import logging
 import secrets
-from typing import Optional
-from fastapi import APIRouter, Depends
-from sqlalchemy import select
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional, Union
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.models import Agent, Session, Message, Capability
-from app.auth import require_agent
+from app.db import get_db, commit
+from app.query_budget import budget
+from app.models import SessionParticipant, Message, Capability
+from app.auth import AgentSnapshot, mark_written, require_agent
+from app.catalog import catalog, page_json
+from app.events import emit_message_created
+from app.group_commit import message_writer
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, keyset, split_page, decode_cursor, encode_cursor
+from app.routers.capabilities import domain_condition, normalize_domains
+from app.routers.sessions import session_message_events
+from app.session_participants import add_session, new_session_id, record_activity
+from app.streaming import SSE, SSE_HEADERS, SSE_PING, sse_event
 
 router = APIRouter(prefix="/a2a", tags=["a2a"])
 
+logger = logging.getLogger(__name__)
+
+# 单个批量请求的最大条目数
+MAX_BATCH = 100
+
+
+def _jsonrpc_error(code: int, message: str, data: Optional[dict] = None, req_id: Any = None):
+    return {"jsonrpc": "2.0", "error": {"code": code, "message": message, "data": data}, "id": req_id}
+
+
+def _invalid_params(message: str, req_id: Any):
+    return _jsonrpc_error(-32602, message, {"id": req_id}, req_id)
+
+
+class RawJSON(bytes):
+    """已序列化好的 JSON-RPC 响应，原样写入回包。"""
+
+
+def _encode(response: Union[dict, RawJSON]) -> bytes:
+    if isinstance(response, RawJSON):
+        return response
+    return json.dumps(response, ensure_ascii=False, default=str).encode()
+
+
+@dataclass
+class _Writes:
+    """一个条目待写入的数据：新建的会话（id 与参与方）与消息；写入失败时把 response 改为错误。"""
+
+    req_id: Any = None
+    response: Optional[dict] = None
+    sessions: list[tuple[str, list[str]]] = field(default_factory=list)
+    messages: list[Message] = field(default_factory=list)
+
+    def fail(self) -> None:
+        if self.response is not None:
+            self.response.clear()
+            self.response.update(_jsonrpc_error(-32603, "Internal error", {"id": self.req_id}, self.req_id))
+
+
+class _Batch:
+    """一次 HTTP 请求内（单条或批量）共享的状态：会话成员资格缓存与各条目待写入的数据。"""
+
+    def __init__(self, db: AsyncSession, agent: AgentSnapshot, last_event_id: Optional[str] = None) -> None:
+        self.db = db
+        self.agent = agent
+        self.last_event_id = last_event_id
+        # session_id -> 当前 agent 是否为参与方（会话不存在同样为 False）
+        self.sessions: dict[str, bool] = {}
+        self.created: set[str] = set()
+        self.writes: list[_Writes] = []
+        # 批量请求中为 True：条目内的读取在 SAVEPOINT 内执行，失败只影响本条目
+        self.isolate = False
+
+    async def execute(self, statement):
+        if not self.isolate:
+            return await self.db.execute(statement)
+        async with self.db.begin_nested():
+            return await self.db.execute(statement)
+
+    async def preload_sessions(self, session_ids: set[str]) -> None:
+        """一次索引查询（session_participants 主键）判定批内 message/send 引用的全部会话的成员资格。"""
+        ids = session_ids - self.sessions.keys()
+        if not ids:
+            return
+        r = await self.execute(
+            select(SessionParticipant.session_id)
+            .where(SessionParticipant.session_id.in_(ids), SessionParticipant.agent_id == self.agent.id)
+        )
+        found = set(r.scalars().all())
+        for sid in ids:
+            self.sessions[sid] = sid in found
+
+    async def is_party(self, session_id: str) -> bool:
+        if session_id not in self.sessions:
+            await self.preload_sessions({session_id})
+        return self.sessions[session_id]
+
+    def begin_item(self, req_id: Any) -> _Writes:
+        writes = _Writes(req_id)
+        self.writes.append(writes)
+        return writes
+
+    def add_session(self, parties: list[str]) -> str:
+        session_id = new_session_id()
+        self.writes[-1].sessions.append((session_id, parties))
+        self.sessions[session_id] = True
+        self.created.add(session_id)
+        return session_id
+
+    def add_message(self, session_id: str, payload: dict) -> Message:
+        # created_at 在应用侧赋值（与模型默认值一致），以便批量插入后直接用于事件推送
+        msg = Message(
+            id=f"msg_{secrets.token_hex(12)}",
+            session_id=session_id,
+            sender=self.agent.id,
+            payload=payload,
+            created_at=datetime.utcnow(),
+        )
+        self.writes[-1].messages.append(msg)
+        return msg
+
+    async def _write(self, writes: list[_Writes]) -> None:
+        for w in writes:
+            for session_id, parties in w.sessions:
+                add_session(self.db, parties, session_id)
+        await self.db.flush()
+        rows = [
+            {"id": m.id, "session_id": m.session_id, "sender": m.sender, "payload": m.payload, "created_at": m.created_at}
+            for w in writes for m in w.messages
+        ]
+        if rows:
+            await self.db.execute(insert(Message), rows)
+            await record_activity(self.db, [m for w in writes for m in w.messages])
+
+    async def flush(self) -> None:
+        """写入批内新建的会话，再以单条多行 INSERT 写入全部消息；失败时逐条目重写（见模块说明）。"""
+        writes, self.writes = self.writes, []
+        queued: list[Message] = []
+        if message_writer.running:
+            # 组提交：发往已有会话的消息交给写入队列；批内新建会话的消息须与会话在同一事务写入
+            for w in writes:
+                queued += [m for m in w.messages if m.session_id not in self.created]
+                w.messages = [m for m in w.messages if m.session_id in self.created]
+        written = writes = [w for w in writes if w.sessions or w.messages]
+        if writes and not self.isolate:
+            await self._write(writes)
+        elif writes:
+            try:
+                async with self.db.begin_nested():
+                    await self._write(writes)
+            except DBAPIError:
+                logger.warning("a2a batch write failed, retrying %d items one by one", len(writes), exc_info=True)
+                written = []
+                for w in writes:
+                    try:
+                        async with self.db.begin_nested():
+                            await self._write([w])
+                    except DBAPIError:
+                        logger.exception("a2a batch item %r write failed", w.req_id)
+                        w.fail()
+                    else:
+                        written.append(w)
+        for w in written:
+            for m in w.messages:
+                emit_message_created(self.db, m)
+        if queued:
+            # 先提交请求事务、归还连接，再等待消息所在批次提交
+            mark_written(self.db)
+            await commit(self.db)
+            await message_writer.write(queued)
 
-def _jsonrpc_error(code: int, message: str, data: Optional[dict] = None):
-    return {"jsonrpc": "2.0", "error": {"code": code, "message": message, "data": data}, "id": None}
+
+async def _capabilities_list(batch: _Batch, params: dict, req_id: Any):
+    # 公开能力列表，无需鉴权逻辑；params 可带 type / domain（字符串或列表）/ domain_match 过滤与 limit / cursor 翻页
+    limit = params.get("limit", DEFAULT_LIMIT)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_LIMIT:
+        return _invalid_params(f"limit must be an integer in [1, {MAX_LIMIT}]", req_id)
+    cursor = params.get("cursor")
+    cap_type = params.get("type")
+    domain = params.get("domain")
+    if not all(v is None or isinstance(v, str) for v in (cursor, cap_type)):
+        return _invalid_params("type and cursor must be strings", req_id)
+    if isinstance(domain, str):
+        domain = [domain]
+    if domain is not None and not (isinstance(domain, list) and all(isinstance(d, str) for d in domain)):
+        return _invalid_params("domain must be a string or a list of strings", req_id)
+    domain_match = params.get("domain_match", "any")
+    if domain_match not in ("any", "all"):
+        return _invalid_params("domain_match must be 'any' or 'all'", req_id)
+    try:
+        domains = normalize_domains(domain)
+    except ValueError as e:
+        return _invalid_params(str(e), req_id)
+    match_all = domain_match == "all"
+    if catalog.ready:
+        # 目录快照中的预序列化字节直接拼接成回包
+        try:
+            page = page_json(*catalog.page(cap_type, domains, match_all, cursor, limit))
+        except HTTPException:
+            return _invalid_params("Invalid cursor", req_id)
+        return RawJSON(b'{"jsonrpc":"2.0","result":' + page + b',"id":' + json.dumps(req_id).encode() + b"}")
+    q = select(Capability)
+    if cap_type:
+        q = q.where(Capability.type == cap_type)
+    if domains:
+        q = q.where(domain_condition(domains, match_all))
+    try:
+        q = keyset(q, Capability, cursor, limit)
+    except HTTPException:
+        return _invalid_params("Invalid cursor", req_id)
+    r = await batch.execute(q)
+    caps, next_cursor = split_page(r.scalars().all(), limit)
+    result = {
+        "items": [
+            {"agent_id": c.agent_id, "type": c.type, "input_schema": c.input_schema, "price": c.price, "domains": c.domains}
+            for c in caps
+        ],
+        "next_cursor": next_cursor,
+    }
+    return {"jsonrpc": "2.0", "result": result, "id": req_id}
+
+
+async def _session_create(batch: _Batch, params: dict, req_id: Any):
+    agent = batch.agent
+    party_ids = params.get("party_ids") or [agent.id]
+    if not isinstance(party_ids, list) or not all(isinstance(p, str) for p in party_ids):
+        return _invalid_params("party_ids must be a list of strings", req_id)
+    initial = params.get("initial_message")
+    if initial is not None and not isinstance(initial, dict):
+        return _invalid_params("initial_message must be an object", req_id)
+    if agent.id not in party_ids:
+        party_ids = [agent.id] + list(party_ids)
+    session_id = batch.add_session(party_ids)
+    if initial:
+        batch.add_message(session_id, initial)
+    return {"jsonrpc": "2.0", "result": {"session_id": session_id, "parties": party_ids, "status": "active"}, "id": req_id}
+
+
+async def _message_send(batch: _Batch, params: dict, req_id: Any):
+    session_id = params.get("session_id")
+    payload = params.get("payload") or {}
+    if not session_id:
+        return _invalid_params("Missing session_id", req_id)
+    if not isinstance(session_id, str):
+        return _invalid_params("session_id must be a string", req_id)
+    if not isinstance(payload, dict):
+        return _invalid_params("payload must be an object", req_id)
+    if not await batch.is_party(session_id):
+        return _jsonrpc_error(-32001, "Session not found or access denied", {"id": req_id}, req_id)
+    msg = batch.add_message(session_id, payload)
+    return {"jsonrpc": "2.0", "result": {"message_id": msg.id, "session_id": session_id}, "id": req_id}
+
+
+def _rpc_sse(req_id: Any, result: dict, event_id: Optional[str] = None) -> bytes:
+    return sse_event(json.dumps({"jsonrpc": "2.0", "result": result, "id": req_id}, ensure_ascii=False), event_id=event_id)
+
+
+def _stream(batch: _Batch, req_id: Any, session_id: str, cursor: Optional[str], first: Optional[dict] = None) -> StreamingResponse:
+    """SSE 推送会话中他方发来的消息；事件 id 为消息游标，可作为 tasks/resubscribe 的续传点。"""
+    agent_id = batch.agent.id
+
+    async def events():
+        if first is not None:
+            yield _rpc_sse(req_id, first)
+        async for data in session_message_events(session_id, cursor):
+            if data is None:
+                yield SSE_PING
+            elif data["sender"] != agent_id:
+                event_id = encode_cursor(datetime.fromisoformat(data["created_at"]), data["id"])
+                yield _rpc_sse(req_id, {"kind": "message", **data}, event_id)
+
+    return StreamingResponse(events(), media_type=SSE, headers=SSE_HEADERS)
+
+
+async def _message_stream(batch: _Batch, params: dict, req_id: Any):
+    """发送一条消息，随后在同一连接上流式返回对方的回复。"""
+    response = await _message_send(batch, params, req_id)
+    if "error" in response:
+        return response
+    msg = batch.writes[-1].messages[-1]
+    first = {"kind": "sent", **response["result"]}
+    return _stream(batch, req_id, msg.session_id, encode_cursor(msg.created_at, msg.id), first)
+
+
+async def _tasks_resubscribe(batch: _Batch, params: dict, req_id: Any):
+    """重新订阅会话（session 即 A2A task）：从 cursor / Last-Event-ID 之后补发并继续推送对方消息。"""
+    session_id = params.get("session_id") or params.get("id")
+    if not session_id:
+        return _invalid_params("Missing session_id", req_id)
+    cursor = params.get("cursor") or batch.last_event_id
+    if not isinstance(session_id, str) or not isinstance(cursor, (str, type(None))):
+        return _invalid_params("session_id and cursor must be strings", req_id)
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except HTTPException:
+            return _invalid_params("Invalid cursor", req_id)
+    if not await batch.is_party(session_id):
+        return _jsonrpc_error(-32001, "Session not found or access denied", {"id": req_id}, req_id)
+    return _stream(batch, req_id, session_id, cursor)
+
+
+_Handler = Callable[[_Batch, dict, Any], Awaitable[Union[dict, RawJSON, StreamingResponse]]]
+
+_METHODS: dict[str, _Handler] = {
+    "capabilities/list": _capabilities_list,
+    "session/create": _session_create,
+    "message/send": _message_send,
+    "message/stream": _message_stream,
+    "tasks/resubscribe": _tasks_resubscribe,
+}
+
+_STREAM_METHODS = {"message/stream", "tasks/resubscribe"}
+
+
+async def _call(batch: _Batch, item: Any, allow_stream: bool = True) -> Union[dict, RawJSON, StreamingResponse]:
+    """处理一个 JSON-RPC 请求对象；任何失败只影响本条目。"""
+    if not isinstance(item, dict):
+        return _jsonrpc_error(-32600, "Invalid Request")
+    req_id = item.get("id")
+    method = item.get("method", "")
+    if not isinstance(method, str):
+        return _jsonrpc_error(-32600, "Invalid Request: method must be a string", {"id": req_id}, req_id)
+    params = item.get("params") or {}
+    if not isinstance(params, dict):
+        return _invalid_params("params must be an object", req_id)
+    handler = _METHODS.get(method)
+    if handler is None:
+        return _jsonrpc_error(-32601, f"Method not found: {method}", {"id": req_id}, req_id)
+    if method in _STREAM_METHODS and not allow_stream:
+        return _jsonrpc_error(-32600, f"Streaming method not allowed in batch: {method}", {"id": req_id}, req_id)
+    writes = batch.begin_item(req_id)
+    try:
+        response = await handler(batch, params, req_id)
+    except Exception:
+        logger.exception("a2a method %s failed", method)
+        writes.sessions.clear()
+        writes.messages.clear()
+        return _jsonrpc_error(-32603, "Internal error", {"id": req_id}, req_id)
+    if isinstance(response, dict):
+        if "error" in response:
+            writes.sessions.clear()
+            writes.messages.clear()
+        writes.response = response
+    return response
 
 
 @router.post("/v1")
+@budget(9)
 async def a2a_endpoint(
-    body: dict,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    body: Union[dict, list] = Body(...),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     """
-    A2A 兼容入口：POST 体为 JSON-RPC 2.0 格式。
-    method 支持: capabilities/list, session/create, message/send
+    A2A 兼容入口：POST 体为 JSON-RPC 2.0 格式，或由多个请求对象组成的批量数组。
+    method 支持: capabilities/list, session/create, message/send,
+    以及流式的 message/stream, tasks/resubscribe（返回 text/event-stream）
     """
-    req_id = body.get("id")
-    method = body.get("method", "")
-    params = body.get("params") or {}
-
-    if method == "capabilities/list":
-        from app.routers.capabilities import list_capabilities_public
-        # 公开能力列表，无需鉴权逻辑，直接查库
-        r = await db.execute(select(Capability))
-        caps = r.scalars().all()
-        result = [
-            {"agent_id": c.agent_id, "type": c.type, "input_schema": c.input_schema, "price": c.price, "domains": c.domains}
-            for c in caps
-        ]
-        return {"jsonrpc": "2.0", "result": result, "id": req_id}
-
-    if method == "session/create":
-        party_ids = params.get("party_ids") or [agent.id]
-        if agent.id not in party_ids:
-            party_ids = [agent.id] + list(party_ids)
-        session_id = f"sess_{secrets.token_hex(12)}"
-        sess = Session(id=session_id, parties=party_ids, status="active")
-        db.add(sess)
-        initial = params.get("initial_message")
-        if initial:
-            msg = Message(
-                id=f"msg_{secrets.token_hex(12)}",
-                session_id=session_id,
-                sender=agent.id,
-                payload=initial,
-            )
-            db.add(msg)
-        await db.flush()
-        return {"jsonrpc": "2.0", "result": {"session_id": session_id, "parties": party_ids, "status": "active"}, "id": req_id}
-
-    if method == "message/send":
-        session_id = params.get("session_id")
-        payload = params.get("payload") or {}
-        if not session_id:
-            return _jsonrpc_error(-32602, "Missing session_id", {"id": req_id})
-        r = await db.execute(select(Session).where(Session.id == session_id))
-        sess = r.scalar_one_or_none()
-        if not sess or agent.id not in sess.parties:
-            return _jsonrpc_error(-32001, "Session not found or access denied", {"id": req_id})
-        msg_id = f"msg_{secrets.token_hex(12)}"
-        msg = Message(id=msg_id, session_id=session_id, sender=agent.id, payload=payload)
-        db.add(msg)
-        await db.flush()
-        return {"jsonrpc": "2.0", "result": {"message_id": msg_id, "session_id": session_id}, "id": req_id}
-
-    return _jsonrpc_error(-32601, f"Method not found: {method}", {"id": req_id})
+    batch = _Batch(db, agent, last_event_id)
+    if isinstance(body, dict):
+        response = await _call(batch, body)
+        await batch.flush()
+        if isinstance(response, StreamingResponse):
+            # 提前提交（发出消息事件）并归还连接，长连接期间不占用连接池
+            await commit(db)
+        elif isinstance(response, RawJSON):
+            return Response(response, media_type="application/json")
+        return response
+
+    if not body:
+        return _jsonrpc_error(-32600, "Invalid Request: empty batch")
+    if len(body) > MAX_BATCH:
+        return _jsonrpc_error(-32600, f"Invalid Request: batch exceeds {MAX_BATCH} items")
+    await batch.preload_sessions({
+        item["params"]["session_id"]
+        for item in body
+        if isinstance(item, dict) and item.get("method") == "message/send"
+        and isinstance(item.get("params"), dict) and isinstance(item["params"].get("session_id"), str)
+    })
+    batch.isolate = True
+    responses = []
+    for item in body:
+        response = await _call(batch, item, allow_stream=False)
+        # 无 id 的通知不回包；无效请求对象（非 dict）仍需返回错误
+        if not isinstance(item, dict) or "id" in item:
+            responses.append(response)
+    await batch.flush()
+    if not responses:
+        return Response(status_code=204)
+    return Response(b"[" + b",".join(_encode(r) for r in responses) + b"]", media_type="application/json")
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import require_admin
+from app.db import get_db
+from app.match_index import capability_index
+from app.query_budget import budget
+from app.schemas import MatchIndexCheck, SlowQueryPlan, SlowQueryStats
+from app.slow_queries import top
+
+# 管理接口：需 X-Admin-Key（ADMIN_API_KEY），未配置时返回 404
+router = APIRouter(prefix="/v1/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/slow-queries", response_model=list[SlowQueryStats])
+@budget(0)
+async def list_slow_queries(
+    order: str = Query("total", pattern="^(total|max|count|mean)$", description="排序：累计 / 最大 / 次数 / 平均耗时"),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """当前 worker 的慢查询（超过 SLOW_QUERY_MS 的语句）按指纹汇总，多 worker 时各 worker 分别统计。"""
+    return [
+        SlowQueryStats(
+            fingerprint=e.fingerprint,
+            count=e.count,
+            total_ms=round(e.total_ms, 3),
+            mean_ms=round(e.total_ms / e.count, 3),
+            max_ms=round(e.max_ms, 3),
+            last_ms=round(e.last_ms, 3),
+            last_seen_at=e.last_seen_at,
+            param_shapes=e.param_shapes,
+            routes=dict(e.routes),
+            plans=[
+                SlowQueryPlan(captured_at=p.captured_at, duration_ms=round(p.duration_ms, 3), analyze=p.analyze, plan=p.plan)
+                for p in e.plans
+            ],
+        )
+        for e in top(order, limit)
+    ]
+
+
+@router.post("/match-index/check", response_model=MatchIndexCheck)
+@budget(2, repeats=2)
+async def check_match_index(
+    repair: bool = Query(False, description="发现漂移时以数据库为准重建"),
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    """
+    当前 worker 的能力匹配索引与 capabilities 表（主库）逐条比对，漂移时记录 warning；多 worker 时各 worker 分别检查。
+    比对期间有能力变更时可能误报，repair 重建不受影响；repair 时重建再读一次全表（同一语句执行两次）。
+    """
+    result = await capability_index.check_consistency(db, repair=repair)
+    return MatchIndexCheck(**result, repaired=repair and not result["ok"])
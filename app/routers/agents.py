@@ -2,18 +2,21 @@ import secrets
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
+from app.db import get_db, get_read_db
+from app.query_budget import budget
+from app.http_cache import cacheable
 from app.models import Agent
 from app.schemas import AgentCreate, AgentResponse
-from app.auth import require_agent, generate_api_key, hash_api_key
+from app.auth import AgentSnapshot, require_agent, generate_api_key, hash_api_key
 
 router = APIRouter(prefix="/v1/agents", tags=["agents"])
 
 
 @router.post("/register", response_model=AgentResponse)
+@budget(4)
 async def register_agent(
     body: AgentCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ):
     """注册新 Agent，返回 api_key（仅此一次）。"""
     raw_key = generate_api_key()
@@ -40,9 +43,10 @@ async def register_agent(
 
 
 @router.get("/me")
+@budget(1)
 async def me(
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     """当前认证 Agent 信息（不含 api_key）。"""
     return {
@@ -54,10 +58,28 @@ async def me(
     }
 
 
+@router.post("/me/api-key")
+@budget(5)
+async def rotate_api_key(
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
+):
+    """轮换当前 Agent 的 api_key：旧 Key 立即失效，新 Key 仅此一次返回。"""
+    from sqlalchemy import select
+    r = await db.execute(select(Agent).where(Agent.id == agent.id))
+    row = r.scalar_one()
+    raw_key = generate_api_key()
+    row.api_key_hash = hash_api_key(raw_key)
+    await db.flush()
+    return {"id": row.id, "api_key": raw_key}
+
+
 @router.get("/{agent_id}/public")
+@budget(2)
 async def get_agent_public(
     agent_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    cache: dict = Depends(cacheable("agents")),
 ):
     """公开信息，用于社区帖子等展示作者名。"""
     from sqlalchemy import select
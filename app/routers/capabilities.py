@@ -2,25 +2,59 @@ from __future__ import annotations
 
 import secrets
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, cast, String
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.models import Agent, Capability
-from app.schemas import CapabilityCreate, CapabilityUpdate, CapabilityResponse, CapabilityPublic
-from app.auth import require_agent
+from app.db import get_db, get_read_db, after_commit, session_factory
+from app.query_budget import budget
+from app.config import settings
+from app.http_cache import check_not_modified, conditional, make_etag
+from app.events import EventType, agent_topic, emit
+from app.catalog import catalog, page_json
+from app.match_index import capability_index
+from app.rfp_matches import refresh_agent_matches
+from app.models import Capability
+from app.schemas import CapabilityCreate, CapabilityUpdate, CapabilityResponse, CapabilityPublic, Page
+from app.pagination import keyset, split_page, cursor_param, limit_param
+from app.streaming import NDJSON_RESPONSES, ndjson_response, wants_ndjson
+from app.auth import AgentSnapshot, require_agent
 
 router_private = APIRouter(prefix="/v1/agents", tags=["capabilities"])
 router_public = APIRouter(prefix="/v1", tags=["capabilities-public"])
 
 
+def _capability_changed(db: AsyncSession, cap: Capability, deleted: bool = False) -> None:
+    """
+    广播 capability.changed（各 worker 据此更新能力匹配索引与目录快照）；
+    本 worker 另在提交后立即应用，保证同一 worker 上的读己之写。
+    """
+    data = {
+        "id": cap.id,
+        "agent_id": cap.agent_id,
+        "type": cap.type,
+        "domains": list(cap.domains or []),
+        "input_schema": cap.input_schema,
+        "price": cap.price,
+        "created_at": cap.created_at.isoformat(),
+        "deleted": deleted,
+    }
+    emit(db, EventType.CAPABILITY_CHANGED, agent_topic(cap.agent_id), data)
+
+    def apply() -> None:
+        capability_index.apply(data)
+        catalog.apply(data)
+
+    after_commit(db, apply)
+
+
 @router_private.post("/{agent_id}/capabilities", response_model=CapabilityResponse)
+@budget(7)
 async def create_capability(
     agent_id: str,
     body: CapabilityCreate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     if agent.id != agent_id:
         from fastapi import HTTPException
@@ -37,6 +71,8 @@ async def create_capability(
     db.add(cap)
     await db.flush()
     await db.refresh(cap)
+    await refresh_agent_matches(db, agent_id)
+    _capability_changed(db, cap)
     return CapabilityResponse(
         id=cap.id,
         agent_id=cap.agent_id,
@@ -49,10 +85,11 @@ async def create_capability(
 
 
 @router_private.get("/{agent_id}/capabilities", response_model=list[CapabilityResponse])
+@budget(2)
 async def list_my_capabilities(
     agent_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     if agent.id != agent_id:
         from fastapi import HTTPException
@@ -74,12 +111,13 @@ async def list_my_capabilities(
 
 
 @router_private.patch("/{agent_id}/capabilities/{cap_id}", response_model=CapabilityResponse)
+@budget(8)
 async def update_capability(
     agent_id: str,
     cap_id: str,
     body: CapabilityUpdate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     if agent.id != agent_id:
         from fastapi import HTTPException
@@ -99,6 +137,8 @@ async def update_capability(
         cap.domains = body.domains
     await db.flush()
     await db.refresh(cap)
+    await refresh_agent_matches(db, agent_id)
+    _capability_changed(db, cap)
     return CapabilityResponse(
         id=cap.id,
         agent_id=cap.agent_id,
@@ -111,11 +151,12 @@ async def update_capability(
 
 
 @router_private.delete("/{agent_id}/capabilities/{cap_id}")
+@budget(7)
 async def delete_capability(
     agent_id: str,
     cap_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     if agent.id != agent_id:
         from fastapi import HTTPException
@@ -128,31 +169,78 @@ async def delete_capability(
         from fastapi import HTTPException
         raise HTTPException(404, "Capability not found")
     await db.delete(cap)
+    await db.flush()
+    await refresh_agent_matches(db, agent_id)
+    _capability_changed(db, cap, deleted=True)
     return {"ok": True}
 
 
+MAX_DOMAINS = 20
+
+
+def normalize_domains(domains: Optional[list]) -> list[str]:
+    """去掉空值并去重（保持顺序）；数量超过 MAX_DOMAINS 时抛出 ValueError。"""
+    names = list(dict.fromkeys(d.strip() for d in domains or () if d and d.strip()))
+    if len(names) > MAX_DOMAINS:
+        raise ValueError(f"At most {MAX_DOMAINS} domains")
+    return names
+
+
+def domain_condition(domains: list[str], match_all: bool):
+    """
+    领域精确匹配，使用 JSONB 包含（@>），可走 domains 上的 GIN 索引：
+    all 为一个 @> 条件；any 为多个 @> 的 OR（BitmapOr 合并各次索引扫描）。
+    """
+    if match_all:
+        return Capability.domains.contains(domains)
+    return or_(*(Capability.domains.contains([d]) for d in domains))
+
+
+def _capability_public(c: Capability) -> CapabilityPublic:
+    return CapabilityPublic(
+        agent_id=c.agent_id,
+        type=c.type,
+        input_schema=c.input_schema,
+        price=c.price,
+        domains=c.domains,
+    )
+
+
 # 公开能力目录（无需鉴权，便于发现）
-@router_public.get("/capabilities", response_model=list[CapabilityPublic])
+@router_public.get("/capabilities", response_model=Page[CapabilityPublic], responses=NDJSON_RESPONSES)
+@budget(2)
 async def list_capabilities_public(
+    request: Request,
+    response: Response,
     type: Optional[str] = Query(None, description="能力类型，如 ip_evaluation"),
-    domain: Optional[str] = Query(None, description="领域关键词，如 悬疑"),
-    db: AsyncSession = Depends(get_db),
+    domain: Optional[list[str]] = Query(None, description="领域，如 悬疑；可重复传多个"),
+    domain_match: str = Query("any", pattern="^(any|all)$", description="多个领域时：any 命中任一 | all 全部包含"),
+    cursor: Optional[str] = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
 ):
+    """
+    Accept: application/x-ndjson 时忽略分页参数，流式导出全部匹配能力。
+    分页读取直接由目录快照（app/catalog.py）返回预序列化字节，ETag 取响应内容哈希。
+    """
+    try:
+        domains = normalize_domains(domain)
+    except ValueError as e:
+        from fastapi import HTTPException
+        raise HTTPException(400, str(e))
+    match_all = domain_match == "all"
+    if catalog.ready and not wants_ndjson(request):
+        body = page_json(*catalog.page(type, domains, match_all, cursor, limit))
+        headers = check_not_modified(request, response, make_etag(body), settings.http_cache_max_age)
+        return Response(body, media_type="application/json", headers=headers)
+    cache = await conditional(request, response, db, ("capabilities",))
     q = select(Capability)
     if type:
         q = q.where(Capability.type == type)
-    if domain:
-        # 按 domains JSON 文本包含关键词过滤
-        q = q.where(cast(Capability.domains, String).contains(domain))
-    r = await db.execute(q)
-    caps = r.scalars().all()
-    return [
-        CapabilityPublic(
-            agent_id=c.agent_id,
-            type=c.type,
-            input_schema=c.input_schema,
-            price=c.price,
-            domains=c.domains,
-        )
-        for c in caps
-    ]
+    if domains:
+        q = q.where(domain_condition(domains, match_all))
+    if wants_ndjson(request):
+        return ndjson_response(q, Capability, _capability_public, headers=cache, factory=session_factory(db))
+    r = await db.execute(keyset(q, Capability, cursor, limit))
+    caps, next_cursor = split_page(r.scalars().all(), limit)
+    return Page[CapabilityPublic](items=[_capability_public(c) for c in caps], next_cursor=next_cursor)
@@ -2,23 +2,28 @@ from __future__ import annotations
 
 import secrets
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.models import Agent, Post
-from app.schemas import PostCreate, PostResponse
-from app.auth import require_agent
+from app.db import get_db, get_read_db, session_factory
+from app.query_budget import budget
+from app.http_cache import cacheable
+from app.models import Post
+from app.schemas import PostCreate, PostResponse, Page
+from app.pagination import keyset, split_page, cursor_param, limit_param
+from app.streaming import NDJSON_RESPONSES, ndjson_response, wants_ndjson
+from app.auth import AgentSnapshot, require_agent
 
 router = APIRouter(prefix="/v1/posts", tags=["posts"])
 
 
 @router.post("", response_model=PostResponse)
+@budget(5)
 async def create_post(
     body: PostCreate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     post_id = f"post_{secrets.token_hex(12)}"
     kind = body.kind if body.kind in ("discussion", "inquiry") else "discussion"
@@ -42,33 +47,44 @@ async def create_post(
     )
 
 
-@router.get("", response_model=list[PostResponse])
+def _post_response(p: Post) -> PostResponse:
+    return PostResponse(
+        id=p.id,
+        author_agent_id=p.author_agent_id,
+        title=p.title,
+        content=p.content,
+        kind=p.kind,
+        created_at=p.created_at,
+    )
+
+
+@router.get("", response_model=Page[PostResponse], responses=NDJSON_RESPONSES)
+@budget(2)
 async def list_posts(
+    request: Request,
     kind: Optional[str] = Query(None, description="discussion | inquiry"),
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    cache: dict = Depends(cacheable("posts")),
 ):
-    q = select(Post).order_by(Post.created_at.desc())
+    """Accept: application/x-ndjson 时忽略分页参数，流式导出全部帖子。"""
+    q = select(Post)
     if kind and kind in ("discussion", "inquiry"):
         q = q.where(Post.kind == kind)
-    r = await db.execute(q)
-    posts = r.scalars().all()
-    return [
-        PostResponse(
-            id=p.id,
-            author_agent_id=p.author_agent_id,
-            title=p.title,
-            content=p.content,
-            kind=p.kind,
-            created_at=p.created_at,
-        )
-        for p in posts
-    ]
+    if wants_ndjson(request):
+        return ndjson_response(q, Post, _post_response, headers=cache, factory=session_factory(db))
+    r = await db.execute(keyset(q, Post, cursor, limit))
+    posts, next_cursor = split_page(r.scalars().all(), limit)
+    return Page[PostResponse](items=[_post_response(p) for p in posts], next_cursor=next_cursor)
 
 
 @router.get("/{post_id}", response_model=PostResponse)
+@budget(2)
 async def get_post(
     post_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    cache: dict = Depends(cacheable("posts")),
 ):
     r = await db.execute(select(Post).where(Post.id == post_id))
     post = r.scalar_one_or_none()
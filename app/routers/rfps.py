@@ -4,11 +4,15 @@ from __future__ import annotations
 import secrets
 from typing import Optional, List
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, exists, union
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.models import Agent, Capability, Rfp, Proposal
+from app.db import get_db, get_read_db
+from app.query_budget import budget
+from app.events import EventType, emit, rfp_topic
+from app.match_index import capability_index
+from app.rfp_matches import refresh_rfp_matches
+from app.models import Rfp, RfpMatch, Proposal
 from app.schemas import (
     RfpCreate,
     RfpUpdate,
@@ -17,41 +21,41 @@ from app.schemas import (
     ProposalUpdate,
     ProposalResponse,
     RfpSummaryResponse,
+    Page,
 )
-from app.auth import require_agent
+from app.pagination import keyset, split_page, cursor_param, limit_param
+from app.auth import AgentSnapshot, require_agent
 
 router = APIRouter(prefix="/v1", tags=["rfps"])
 
 
-async def _match_supplier_agent_ids(db: AsyncSession, capability_type: str, domain_filters: Optional[list]) -> List[str]:
-    """根据 capability_type 和 domain_filters 返回可提交提案的 agent_id 列表（去重）。"""
-    q = select(Capability.agent_id).where(Capability.type == capability_type).distinct()
-    r = await db.execute(q)
-    rows = r.scalars().all()
-    agent_ids = [row[0] for row in rows]
-    if not domain_filters:
-        return agent_ids
-    out = []
-    for aid in agent_ids:
-        q2 = select(Capability).where(
-            Capability.agent_id == aid,
-            Capability.type == capability_type,
-        )
-        r2 = await db.execute(q2)
-        caps = r2.scalars().all()
-        for c in caps:
-            domains = c.domains or []
-            if any(d in domains for d in domain_filters):
-                out.append(aid)
-                break
-    return out
+def _match_supplier_agent_ids(capability_type: str, domain_filters: Optional[list]) -> List[str]:
+    """根据 capability_type 和 domain_filters 返回可提交提案的 agent_id 列表（去重），查能力匹配索引。"""
+    return sorted(capability_index.supplier_ids(capability_type, domain_filters))
+
+
+def _matched_to(agent_id: str):
+    """RFP 已扇出到该 agent 的 EXISTS 条件。"""
+    return exists().where(RfpMatch.rfp_id == Rfp.id, RfpMatch.agent_id == agent_id)
+
+
+def _rfp_event(rfp: Rfp) -> dict:
+    return {
+        "id": rfp.id,
+        "creator_agent_id": rfp.creator_agent_id,
+        "capability_type": rfp.capability_type,
+        "domain_filters": rfp.domain_filters,
+        "status": rfp.status,
+        "deadline_at": rfp.deadline_at.isoformat() if rfp.deadline_at else None,
+    }
 
 
 @router.post("/rfps", response_model=RfpResponse)
+@budget(6)
 async def create_rfp(
     body: RfpCreate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     rfp_id = f"rfp_{secrets.token_hex(12)}"
     rfp = Rfp(
@@ -67,7 +71,9 @@ async def create_rfp(
     )
     db.add(rfp)
     await db.flush()
+    await refresh_rfp_matches(db, rfp.id)
     await db.refresh(rfp)
+    emit(db, EventType.RFP_CREATED, rfp_topic(rfp.id), _rfp_event(rfp))
     return RfpResponse(
         id=rfp.id,
         creator_agent_id=rfp.creator_agent_id,
@@ -82,82 +88,63 @@ async def create_rfp(
     )
 
 
-@router.get("/rfps", response_model=list[RfpResponse])
+@router.get("/rfps", response_model=Page[RfpResponse])
+@budget(2)
 async def list_rfps(
     scope: Optional[str] = Query(None, description="created | matched | 不传则两者"),
     status: Optional[str] = Query(None, description="open | closed | cancelled"),
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    cursor: Optional[str] = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
+    created = select(Rfp).where(Rfp.creator_agent_id == agent.id)
+    # 匹配到当前 agent 能力的 RFP：rfp_matches 按 agent_id 走索引
+    matched = select(Rfp).join(RfpMatch, RfpMatch.rfp_id == Rfp.id).where(RfpMatch.agent_id == agent.id)
+    if status:
+        created = created.where(Rfp.status == status)
+        matched = matched.where(Rfp.status == status)
     if scope == "created":
-        q = select(Rfp).where(Rfp.creator_agent_id == agent.id)
+        q = keyset(created, Rfp, cursor, limit)
     elif scope == "matched":
-        # 匹配到当前 agent 能力的 RFP：能力类型+领域匹配
-        all_rfps = (await db.execute(select(Rfp))).scalars().all()
-        my_caps = (await db.execute(select(Capability).where(Capability.agent_id == agent.id))).scalars().all()
-        my_types = {c.type for c in my_caps}
-        my_domains = set()
-        for c in my_caps:
-            for d in (c.domains or []):
-                my_domains.add(d)
-        matched_ids = []
-        for rfp in all_rfps:
-            if rfp.creator_agent_id == agent.id:
-                continue
-            if rfp.capability_type not in my_types:
-                continue
-            if rfp.domain_filters:
-                if not any(d in my_domains for d in rfp.domain_filters):
-                    continue
-            matched_ids.append(rfp.id)
-        q = select(Rfp).where(Rfp.id.in_(matched_ids))
+        q = keyset(matched, Rfp, cursor, limit)
     else:
-        # 默认：我创建的 + 匹配到我的
-        all_rfps = (await db.execute(select(Rfp))).scalars().all()
-        my_caps = (await db.execute(select(Capability).where(Capability.agent_id == agent.id))).scalars().all()
-        my_types = {c.type for c in my_caps}
-        my_domains = set()
-        for c in my_caps:
-            for d in (c.domains or []):
-                my_domains.add(d)
-        matched_ids = [rfp.id for rfp in all_rfps if rfp.creator_agent_id == agent.id]
-        for rfp in all_rfps:
-            if rfp.creator_agent_id == agent.id:
-                continue
-            if rfp.capability_type not in my_types:
-                continue
-            if rfp.domain_filters:
-                if not any(d in my_domains for d in rfp.domain_filters):
-                    continue
-            matched_ids.append(rfp.id)
-        q = select(Rfp).where(Rfp.id.in_(matched_ids))
-    if status:
-        q = q.where(Rfp.status == status)
-    q = q.order_by(Rfp.created_at.desc())
+        # 默认：我创建的 + 匹配到我的。OR 条件只能按 (created_at, id) 扫全表逐行判断，
+        # 改为两路各自走索引并取一页的 UNION（同一 RFP 两路都命中时去重），再合并排序取一页
+        branches = [
+            keyset(q.with_only_columns(Rfp.id, Rfp.created_at), Rfp, cursor, limit).subquery().select()
+            for q in (created, matched)
+        ]
+        u = union(*branches).subquery()
+        q = keyset(select(Rfp).join(u, u.c.id == Rfp.id), Rfp, None, limit)
     r = await db.execute(q)
-    rfps = r.scalars().all()
-    return [
-        RfpResponse(
-            id=x.id,
-            creator_agent_id=x.creator_agent_id,
-            title=x.title,
-            description=x.description,
-            capability_type=x.capability_type,
-            domain_filters=x.domain_filters,
-            budget=x.budget,
-            deadline_at=x.deadline_at,
-            status=x.status,
-            created_at=x.created_at,
-        )
-        for x in rfps
-    ]
+    rfps, next_cursor = split_page(r.scalars().all(), limit)
+    return Page[RfpResponse](
+        items=[
+            RfpResponse(
+                id=x.id,
+                creator_agent_id=x.creator_agent_id,
+                title=x.title,
+                description=x.description,
+                capability_type=x.capability_type,
+                domain_filters=x.domain_filters,
+                budget=x.budget,
+                deadline_at=x.deadline_at,
+                status=x.status,
+                created_at=x.created_at,
+            )
+            for x in rfps
+        ],
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/rfps/{rfp_id}", response_model=RfpResponse)
+@budget(3)
 async def get_rfp(
     rfp_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     r = await db.execute(select(Rfp).where(Rfp.id == rfp_id))
     rfp = r.scalar_one_or_none()
@@ -165,15 +152,10 @@ async def get_rfp(
         raise HTTPException(404, "RFP not found")
     if rfp.creator_agent_id != agent.id:
         # 检查是否匹配到当前 agent
-        my_caps = (await db.execute(select(Capability).where(Capability.agent_id == agent.id))).scalars().all()
-        my_types = {c.type for c in my_caps}
-        my_domains = set()
-        for c in my_caps:
-            for d in (c.domains or []):
-                my_domains.add(d)
-        if rfp.capability_type not in my_types:
-            raise HTTPException(403, "Not creator or matched supplier")
-        if rfp.domain_filters and not any(d in my_domains for d in rfp.domain_filters):
+        matched = (await db.execute(
+            select(RfpMatch.rfp_id).where(RfpMatch.rfp_id == rfp_id, RfpMatch.agent_id == agent.id)
+        )).scalar_one_or_none()
+        if not matched:
             raise HTTPException(403, "Not creator or matched supplier")
     return RfpResponse(
         id=rfp.id,
@@ -190,11 +172,12 @@ async def get_rfp(
 
 
 @router.patch("/rfps/{rfp_id}", response_model=RfpResponse)
+@budget(4)
 async def update_rfp(
     rfp_id: str,
     body: RfpUpdate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     r = await db.execute(select(Rfp).where(Rfp.id == rfp_id))
     rfp = r.scalar_one_or_none()
@@ -207,7 +190,7 @@ async def update_rfp(
     if body.deadline_at is not None:
         rfp.deadline_at = body.deadline_at
     await db.flush()
-    await db.refresh(rfp)
+    emit(db, EventType.RFP_UPDATED, rfp_topic(rfp.id), _rfp_event(rfp))
     return RfpResponse(
         id=rfp.id,
         creator_agent_id=rfp.creator_agent_id,
@@ -222,18 +205,18 @@ async def update_rfp(
     )
 
 
-async def _can_supplier_submit(db: AsyncSession, rfp: Rfp, agent_id: str) -> bool:
-    """当前 agent 是否在 RFP 匹配到的供应方列表中。"""
-    supplier_ids = await _match_supplier_agent_ids(db, rfp.capability_type, rfp.domain_filters)
-    return agent_id in supplier_ids
+def _can_supplier_submit(rfp: Rfp, agent_id: str) -> bool:
+    """当前 agent 是否在 RFP 匹配到的供应方列表中（集合查找，不访问数据库）。"""
+    return capability_index.is_supplier(agent_id, rfp.capability_type, rfp.domain_filters)
 
 
 @router.post("/rfps/{rfp_id}/proposals", response_model=ProposalResponse)
+@budget(6)
 async def create_proposal(
     rfp_id: str,
     body: ProposalCreate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     r = await db.execute(select(Rfp).where(Rfp.id == rfp_id))
     rfp = r.scalar_one_or_none()
@@ -243,7 +226,7 @@ async def create_proposal(
         raise HTTPException(400, "RFP is not open for proposals")
     if rfp.creator_agent_id == agent.id:
         raise HTTPException(400, "Creator cannot submit proposal to own RFP")
-    if not await _can_supplier_submit(db, rfp, agent.id):
+    if not _can_supplier_submit(rfp, agent.id):
         raise HTTPException(403, "Your capabilities do not match this RFP")
     # 同一 RFP 下同一 supplier 仅一条
     r2 = await db.execute(
@@ -276,47 +259,54 @@ async def create_proposal(
     )
 
 
-@router.get("/rfps/{rfp_id}/proposals", response_model=list[ProposalResponse])
+@router.get("/rfps/{rfp_id}/proposals", response_model=Page[ProposalResponse])
+@budget(3)
 async def list_proposals(
     rfp_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    cursor: Optional[str] = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     r = await db.execute(select(Rfp).where(Rfp.id == rfp_id))
     rfp = r.scalar_one_or_none()
     if not rfp:
         raise HTTPException(404, "RFP not found")
     if rfp.creator_agent_id == agent.id:
-        q = select(Proposal).where(Proposal.rfp_id == rfp_id).order_by(Proposal.created_at.desc())
-    else:
+        q = select(Proposal).where(Proposal.rfp_id == rfp_id)
+    elif _can_supplier_submit(rfp, agent.id):
         q = select(Proposal).where(
             Proposal.rfp_id == rfp_id,
             Proposal.supplier_agent_id == agent.id,
-        ).order_by(Proposal.created_at.desc())
-    r2 = await db.execute(q)
-    props = r2.scalars().all()
-    if rfp.creator_agent_id != agent.id and not await _can_supplier_submit(db, rfp, agent.id):
-        raise HTTPException(403, "Not creator or matched supplier")
-    return [
-        ProposalResponse(
-            id=p.id,
-            rfp_id=p.rfp_id,
-            supplier_agent_id=p.supplier_agent_id,
-            status=p.status,
-            price=p.price,
-            delivery_at=p.delivery_at,
-            content=p.content,
-            created_at=p.created_at,
         )
-        for p in props
-    ]
+    else:
+        raise HTTPException(403, "Not creator or matched supplier")
+    r2 = await db.execute(keyset(q, Proposal, cursor, limit))
+    props, next_cursor = split_page(r2.scalars().all(), limit)
+    return Page[ProposalResponse](
+        items=[
+            ProposalResponse(
+                id=p.id,
+                rfp_id=p.rfp_id,
+                supplier_agent_id=p.supplier_agent_id,
+                status=p.status,
+                price=p.price,
+                delivery_at=p.delivery_at,
+                content=p.content,
+                created_at=p.created_at,
+            )
+            for p in props
+        ],
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/rfps/{rfp_id}/summary", response_model=RfpSummaryResponse)
+@budget(3)
 async def get_rfp_summary(
     rfp_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     r = await db.execute(select(Rfp).where(Rfp.id == rfp_id))
     rfp = r.scalar_one_or_none()
@@ -358,10 +348,11 @@ async def get_rfp_summary(
 
 
 @router.get("/proposals/{proposal_id}", response_model=ProposalResponse)
+@budget(3)
 async def get_proposal(
     proposal_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     r = await db.execute(select(Proposal).where(Proposal.id == proposal_id))
     prop = r.scalar_one_or_none()
@@ -386,11 +377,12 @@ async def get_proposal(
 
 
 @router.patch("/proposals/{proposal_id}", response_model=ProposalResponse)
+@budget(5)
 async def update_proposal(
     proposal_id: str,
     body: ProposalUpdate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
     r = await db.execute(select(Proposal).where(Proposal.id == proposal_id))
     prop = r.scalar_one_or_none()
@@ -411,7 +403,13 @@ async def update_proposal(
                 raise HTTPException(400, "Supplier can only set withdrawn")
         prop.status = body.status
     await db.flush()
-    await db.refresh(prop)
+    if body.status is not None:
+        emit(db, EventType.PROPOSAL_STATUS_CHANGED, rfp_topic(prop.rfp_id), {
+            "id": prop.id,
+            "rfp_id": prop.rfp_id,
+            "supplier_agent_id": prop.supplier_agent_id,
+            "status": prop.status,
+        })
     return ProposalResponse(
         id=prop.id,
         rfp_id=prop.rfp_id,
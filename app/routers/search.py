@@ -0,0 +1,123 @@
+# 全文检索：帖子与 RFP（中文分词与向量维护见 app/search.py）
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy import Float, cast, func, literal, or_, select, text, tuple_, union_all
+from sqlalchemy.dialects.postgresql import TSQUERY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_read_db
+from app.query_budget import budget
+from app.models import Post, Rfp
+from app.routers.rfps import _matched_to
+from app.schemas import SearchHit, Page
+from app.pagination import cursor_param, limit_param
+from app.search import MAX_CANDIDATES, query_terms, snippet, tsquery_literal
+from app.auth import AgentSnapshot, require_agent
+
+router = APIRouter(prefix="/v1", tags=["search"])
+
+SEARCH_TYPES = ("post", "rfp")
+
+
+def _encode_cursor(rank: float, created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([rank, created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[float, datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, ts, row_id = json.loads(raw)
+        return float(rank), datetime.fromisoformat(ts), str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def _branch(model, kind: str, body, tsq, after, limit: int, *where):
+    """
+    单表命中：在最新的 MAX_CANDIDATES 条命中内按 (rank, created_at, id) 降序先取 limit + 1 条，合并后再截取。
+    常见词可能命中大半张表，只对候选集计算 ts_rank_cd，使延迟不随命中数线性增长。
+    """
+    candidates = (
+        select(model.id)
+        .where(model.search_vector.op("@@")(tsq), *where)
+        .order_by(model.created_at.desc(), model.id.desc())
+        .limit(MAX_CANDIDATES)
+        .subquery()
+    )
+    rank = func.ts_rank_cd(model.search_vector, tsq, type_=Float)
+    q = select(
+        literal(kind).label("type"),
+        model.id.label("id"),
+        model.title.label("title"),
+        body.label("body"),
+        model.created_at.label("created_at"),
+        rank.label("rank"),
+    ).join(candidates, candidates.c.id == model.id)
+    if after is not None:
+        q = q.where(tuple_(rank, model.created_at, model.id) < tuple_(literal(after[0], Float), after[1], after[2]))
+    return q.order_by(rank.desc(), model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+@router.get("/search", response_model=Page[SearchHit])
+@budget(3)
+async def search(
+    q: str = Query(..., min_length=1, max_length=256, description="关键词，空格分隔多个词（AND）"),
+    types: Optional[str] = Query(None, description="post,rfp 逗号分隔，不传则两者"),
+    cursor: Optional[str] = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
+):
+    """
+    按相关度（标题命中高于正文）降序返回帖子与 RFP；相关度相同按时间倒序。
+    每类只在最新的 MAX_CANDIDATES 条命中中排序，命中更多时更早的内容不会出现在结果中。
+    RFP 仅包含自己创建的与匹配到自己的（同 GET /v1/rfps）。
+    """
+    kinds = SEARCH_TYPES if not types else tuple(t.strip() for t in types.split(",") if t.strip())
+    if not kinds or any(k not in SEARCH_TYPES for k in kinds):
+        raise HTTPException(400, "types must be a comma-separated subset of: post, rfp")
+    terms = query_terms(q)
+    tsq_text = tsquery_literal(terms)
+    if tsq_text is None:
+        raise HTTPException(400, "Query contains no searchable terms")
+    tsq = cast(tsq_text, TSQUERY)
+    after = _decode_cursor(cursor) if cursor else None
+
+    branches = []
+    if "post" in kinds:
+        branches.append(_branch(Post, "post", Post.content, tsq, after, limit))
+    if "rfp" in kinds:
+        visible = or_(Rfp.creator_agent_id == agent.id, _matched_to(agent.id))
+        branches.append(_branch(Rfp, "rfp", Rfp.description, tsq, after, limit, visible))
+    # 不同查询词的命中数相差几个数量级，最优计划不同；禁止复用预编译语句的通用计划
+    await db.execute(text("SET LOCAL plan_cache_mode = force_custom_plan"))
+    u = union_all(*(b.subquery().select() for b in branches)).subquery() if len(branches) > 1 else branches[0].subquery()
+    r = await db.execute(
+        select(u).order_by(u.c.rank.desc(), u.c.created_at.desc(), u.c.id.desc()).limit(limit + 1)
+    )
+    rows = r.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last.rank, last.created_at, last.id)
+    return Page[SearchHit](
+        items=[
+            SearchHit(
+                type=x.type,
+                id=x.id,
+                title=x.title,
+                snippet=snippet(x.body, terms),
+                rank=x.rank,
+                created_at=x.created_at,
+            )
+            for x in rows
+        ],
+        next_cursor=next_cursor,
+    )
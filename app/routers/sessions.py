@@ -1,38 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+import json
 import secrets
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_, select, true, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.models import Agent, Session, Message
-from app.schemas import SessionCreate, SessionResponse, MessageCreate, MessageResponse
-from app.auth import require_agent
+from app.db import get_db, get_read_db, commit, AsyncSessionLocal
+from app.query_budget import budget
+from app.events import bus, session_topic, message_event, emit_message_created
+from app.models import Session, SessionParticipant, Message
+from app.schemas import (
+    SessionCreate, SessionResponse, SessionDigest, SessionReadUpdate, MessageCreate, MessageResponse, Page,
+)
+from app.pagination import keyset, split_page, cursor_param, limit_param, decode_cursor, encode_cursor
+from app.streaming import SSE, SSE_HEADERS, SSE_PING, sse_event
+from app.auth import AgentSnapshot, mark_written, require_agent
+from app.session_participants import add_session, check_party, is_party, record_activity
+from app.message_archive import fetch_messages
+from app.group_commit import message_writer
 
 router = APIRouter(prefix="/v1/sessions", tags=["sessions"])
 
+PING_INTERVAL = 15.0
+CATCHUP_BATCH = 200
+
 
 @router.post("", response_model=SessionResponse)
+@budget(6)
 async def create_session(
     body: SessionCreate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
-    session_id = f"sess_{secrets.token_hex(12)}"
     parties = body.party_ids
     if agent.id not in parties:
         parties = [agent.id] + parties
-    sess = Session(id=session_id, parties=parties, status="active")
-    db.add(sess)
+    msg_id = f"msg_{secrets.token_hex(12)}" if body.initial_message else None
+    sess = add_session(db, parties, first_message_id=msg_id)
     await db.flush()
     if body.initial_message:
-        msg_id = f"msg_{secrets.token_hex(12)}"
         msg = Message(
             id=msg_id,
-            session_id=session_id,
+            session_id=sess.id,
             sender=agent.id,
             payload=body.initial_message,
+            created_at=sess.created_at,
         )
         db.add(msg)
+        emit_message_created(db, msg)
     await db.refresh(sess)
     return SessionResponse(
         id=sess.id,
@@ -42,38 +62,137 @@ async def create_session(
     )
 
 
-@router.get("", response_model=list[SessionResponse])
+@router.get("", response_model=Page[SessionResponse])
+@budget(2)
 async def list_sessions(
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    cursor: Optional[str] = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
-    # 只返回当前 agent 参与的会话（parties 含 agent.id）
-    r = await db.execute(
-        select(Session).where(Session.parties.contains([agent.id]))
+    # 只返回当前 agent 参与的会话，新会话在前：按 session_participants (agent_id, created_at, session_id) 索引范围扫描
+    q = (
+        select(Session)
+        .join(SessionParticipant, SessionParticipant.session_id == Session.id)
+        .where(SessionParticipant.agent_id == agent.id)
+    )
+    key = (SessionParticipant.created_at, SessionParticipant.session_id)
+    r = await db.execute(keyset(q, Session, cursor, limit, columns=key))
+    sessions, next_cursor = split_page(r.scalars().all(), limit)
+    return Page[SessionResponse](
+        items=[
+            SessionResponse(
+                id=s.id,
+                parties=s.parties,
+                status=s.status,
+                created_at=s.created_at,
+            )
+            for s in sessions
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+def _latest_message(session_id):
+    """会话最新一条消息（按 (session_id, created_at, id) 索引倒序取一条）。"""
+    return (
+        select(Message)
+        .where(Message.session_id == session_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(1)
     )
-    sessions = r.scalars().all()
-    return [
-        SessionResponse(
+
+
+@router.get("/digest", response_model=Page[SessionDigest])
+@budget(2)
+async def list_session_digest(
+    sort: str = Query("activity", pattern="^(activity|created)$", description="activity：最近活动在前；created：新会话在前"),
+    cursor: Optional[str] = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
+):
+    """
+    收件箱摘要：当前 agent 的每个会话附最新消息、消息总数、未读数与最后活动时间，一条 SQL 完成。
+    先在参与方索引 (agent_id, last_activity_at 或 created_at, session_id) 上分页（最后活动随消息写入冗余在参与方行上，
+    见 app/session_participants.py），再只为本页会话按主键取最新消息、LATERAL 计数。
+    """
+    P = SessionParticipant
+    mine = select(
+        P.session_id, P.last_read_at, P.last_read_id, P.last_activity_at.label("activity"), P.last_message_id,
+    ).where(P.agent_id == agent.id)
+    key = (P.created_at, P.session_id) if sort == "created" else (P.last_activity_at, P.session_id)
+    page = keyset(mine, P, cursor, limit, columns=key).subquery("page")
+
+    # 最新消息按 (id, created_at) 主键取（可裁剪到所在分区）；已归档到文件时为空
+    latest = Message.__table__.alias("latest")
+    unread = and_(
+        Message.sender != agent.id,
+        or_(
+            page.c.last_read_at.is_(None),
+            tuple_(Message.created_at, Message.id) > tuple_(page.c.last_read_at, page.c.last_read_id),
+        ),
+    )
+    counts = (
+        select(func.count().label("total"), func.count().filter(unread).label("unread"))
+        .where(Message.session_id == page.c.session_id)
+        .lateral("counts")
+    )
+    order = (
+        (Session.created_at.desc(), Session.id.desc()) if sort == "created"
+        else (page.c.activity.desc(), page.c.session_id.desc())
+    )
+    q = (
+        select(Session, latest, counts.c.total, counts.c.unread, page.c.activity)
+        .select_from(page)
+        .join(Session, Session.id == page.c.session_id)
+        .outerjoin(latest, and_(latest.c.id == page.c.last_message_id, latest.c.created_at == page.c.activity))
+        .join(counts, true())
+        .order_by(*order)
+    )
+    rows = (await db.execute(q)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        key_at = last.Session.created_at if sort == "created" else last.activity
+        next_cursor = encode_cursor(key_at, last.Session.id)
+    items = []
+    for row in rows:
+        s = row.Session
+        items.append(SessionDigest(
             id=s.id,
             parties=s.parties,
             status=s.status,
             created_at=s.created_at,
-        )
-        for s in sessions
-    ]
+            last_message=MessageResponse(
+                id=row.id,
+                session_id=row.session_id,
+                sender=row.sender,
+                payload=row.payload,
+                created_at=row.created_at,
+                cursor=encode_cursor(row.created_at, row.id),
+            ) if row.id is not None else None,
+            message_count=row.total,
+            unread_count=row.unread,
+            last_activity_at=row.activity,
+        ))
+    return Page[SessionDigest](items=items, next_cursor=next_cursor)
 
 
 @router.get("/{session_id}", response_model=SessionResponse)
+@budget(2)
 async def get_session(
     session_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
-    r = await db.execute(select(Session).where(Session.id == session_id))
-    sess = r.scalar_one_or_none()
-    if not sess:
+    r = await db.execute(select(Session, is_party(session_id, agent.id)).where(Session.id == session_id))
+    row = r.one_or_none()
+    if not row:
         raise HTTPException(404, "Session not found")
-    if agent.id not in sess.parties:
+    sess, allowed = row
+    if not allowed:
         raise HTTPException(403, "Not a party of this session")
     return SessionResponse(
         id=sess.id,
@@ -84,58 +203,177 @@ async def get_session(
 
 
 @router.post("/{session_id}/messages", response_model=MessageResponse)
+@budget(5)
 async def send_message(
     session_id: str,
     body: MessageCreate,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
-    r = await db.execute(select(Session).where(Session.id == session_id))
-    sess = r.scalar_one_or_none()
-    if not sess:
-        raise HTTPException(404, "Session not found")
-    if agent.id not in sess.parties:
-        raise HTTPException(403, "Not a party of this session")
-    msg_id = f"msg_{secrets.token_hex(12)}"
+    await check_party(db, session_id, agent.id)
+    # created_at 在应用侧赋值：无需回读，且组提交时入队顺序即游标顺序
     msg = Message(
-        id=msg_id,
+        id=f"msg_{secrets.token_hex(12)}",
         session_id=session_id,
         sender=agent.id,
         payload=body.payload,
+        created_at=datetime.now(timezone.utc),
     )
-    db.add(msg)
-    await db.flush()
-    await db.refresh(msg)
+    if message_writer.running:
+        # 组提交：先结束请求事务归还连接，再等待消息所在批次提交
+        mark_written(db)
+        await commit(db)
+        await message_writer.write([msg])
+    else:
+        db.add(msg)
+        await db.flush()
+        await record_activity(db, [msg])
+        emit_message_created(db, msg)
     return MessageResponse(
         id=msg.id,
         session_id=msg.session_id,
         sender=msg.sender,
         payload=msg.payload,
         created_at=msg.created_at,
+        cursor=encode_cursor(msg.created_at, msg.id),
     )
 
 
-@router.get("/{session_id}/messages", response_model=list[MessageResponse])
+@router.get("/{session_id}/messages", response_model=Page[MessageResponse])
+@budget(4)
 async def list_messages(
     session_id: str,
-    db: AsyncSession = Depends(get_db),
-    agent: Agent = Depends(require_agent),
+    cursor: Optional[str] = cursor_param(),
+    after: Optional[str] = Query(None, description="只取该游标之后（更新）的消息，同 cursor"),
+    before: Optional[str] = Query(None, description="只取该游标之前（更旧）的消息，向历史方向翻页"),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_read_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
 ):
-    r = await db.execute(select(Session).where(Session.id == session_id))
-    sess = r.scalar_one_or_none()
-    if not sess:
-        raise HTTPException(404, "Session not found")
-    if agent.id not in sess.parties:
-        raise HTTPException(403, "Not a party of this session")
-    r = await db.execute(select(Message).where(Message.session_id == session_id).order_by(Message.created_at))
-    msgs = r.scalars().all()
-    return [
-        MessageResponse(
-            id=m.id,
-            session_id=m.session_id,
-            sender=m.sender,
-            payload=m.payload,
-            created_at=m.created_at,
-        )
-        for m in msgs
-    ]
+    """
+    消息按 (created_at, id) 正序返回，经 (session_id, created_at, id) 索引范围扫描。
+    - 不带 before：从 after（或 cursor）之后取 limit 条，next_cursor 指向更新的消息，可用于增量拉取；
+    - 带 before：取紧邻 before 之前的 limit 条（本页仍为正序），next_cursor 为本页最早一条，
+      作为下一次的 before 继续向更早翻页；同时带 after 时只取两者之间的消息。
+    """
+    await check_party(db, session_id, agent.id)
+    after = after or cursor
+    if before:
+        rows = await fetch_messages(db, session_id, after, before, limit, descending=True)
+        msgs, next_cursor = split_page(rows, limit)
+        msgs = msgs[::-1]
+    else:
+        rows = await fetch_messages(db, session_id, after, None, limit)
+        msgs, next_cursor = split_page(rows, limit)
+    return Page[MessageResponse](
+        items=[
+            MessageResponse(
+                id=m.id,
+                session_id=m.session_id,
+                sender=m.sender,
+                payload=m.payload,
+                created_at=m.created_at,
+                cursor=encode_cursor(m.created_at, m.id),
+            )
+            for m in msgs
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.post("/{session_id}/read", status_code=204)
+@budget(5)
+async def mark_read(
+    session_id: str,
+    body: Optional[SessionReadUpdate] = None,
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
+):
+    """把当前 agent 在该会话的已读位置推进到 cursor（默认最新一条消息）；已读位置只前进不后退。"""
+    await check_party(db, session_id, agent.id)
+    if body and body.cursor:
+        read_at, read_id = decode_cursor(body.cursor)
+    else:
+        r = await db.execute(_latest_message(session_id).with_only_columns(Message.created_at, Message.id))
+        row = r.one_or_none()
+        if row is None:
+            return Response(status_code=204)
+        read_at, read_id = row
+    P = SessionParticipant
+    await db.execute(
+        update(P)
+        .where(P.session_id == session_id, P.agent_id == agent.id)
+        .where(or_(P.last_read_at.is_(None), tuple_(P.last_read_at, P.last_read_id) < tuple_(read_at, read_id)))
+        .values(last_read_at=read_at, last_read_id=read_id)
+    )
+    return Response(status_code=204)
+
+
+def _message_sse(event: dict) -> bytes:
+    event_id = encode_cursor(datetime.fromisoformat(event["created_at"]), event["id"])
+    return sse_event(json.dumps(event, ensure_ascii=False), event="message", event_id=event_id)
+
+
+async def session_message_events(session_id: str, cursor: Optional[str]) -> AsyncIterator[Optional[dict]]:
+    """
+    依次产出会话消息（message_event 格式）：先补发 cursor 之后的历史，再持续推送新消息。
+    空闲满 PING_INTERVAL 时产出 None 供调用方发送保活；订阅被断开时结束。
+    SSE 接口与 A2A message/stream、tasks/resubscribe 共用。
+    """
+    # 先订阅再补历史，补齐期间到达的新消息在队列中等待，按 id 去重
+    with bus.subscribe(session_topic(session_id)) as queue:
+        sent: set[str] = set()
+        if cursor:
+            async with AsyncSessionLocal() as db:
+                while cursor:
+                    rows = await fetch_messages(db, session_id, cursor, None, CATCHUP_BATCH)
+                    msgs, cursor = split_page(rows, CATCHUP_BATCH)
+                    for m in msgs:
+                        sent.add(m.id)
+                        yield message_event(m)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), PING_INTERVAL)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is None:
+                return
+            data = event["data"]
+            if data["id"] in sent:
+                continue
+            if event.get("partial"):
+                # 负载过大未随 NOTIFY 下发，回库读取完整消息
+                async with AsyncSessionLocal() as db:
+                    m = await db.get(Message, (data["id"], datetime.fromisoformat(data["created_at"])))
+                if m is None:
+                    continue
+                data = message_event(m)
+            yield data
+
+
+async def _message_stream(session_id: str, cursor: Optional[str]):
+    async for data in session_message_events(session_id, cursor):
+        yield SSE_PING if data is None else _message_sse(data)
+
+
+@router.get("/{session_id}/stream", responses={200: {"content": {SSE: {"schema": {"type": "string"}}}}})
+@budget(3)
+async def stream_messages(
+    session_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    after: Optional[str] = Query(None, description="续传游标，同 Last-Event-ID；不传则只推送连接之后的新消息"),
+    db: AsyncSession = Depends(get_db, scope="function"),
+    agent: AgentSnapshot = Depends(require_agent),
+):
+    """
+    Server-Sent Events 实时推送会话新消息（event: message，data 同 MessageResponse）。
+    每条事件的 id 即该消息的分页游标；断线后带 Last-Event-ID 重连即可从断点续传。
+    """
+    await check_party(db, session_id, agent.id)
+    cursor = last_event_id or after
+    if cursor:
+        decode_cursor(cursor)
+    # 提前结束请求事务、归还连接，长连接期间不占用连接池
+    await db.commit()
+    return StreamingResponse(_message_stream(session_id, cursor), media_type=SSE, headers=SSE_HEADERS)
@@ -1,9 +1,17 @@
 from __future__ import annotations
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Generic, Optional, TypeVar
 from datetime import datetime
 
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """游标分页响应：next_cursor 为 None 表示已无更多数据"""
+    items: list[T]
+    next_cursor: Optional[str] = None
+
 
 class AgentCreate(BaseModel):
     name: str
@@ -81,6 +89,22 @@ class MessageResponse(BaseModel):
     sender: str
     payload: dict
     created_at: datetime
+    cursor: Optional[str] = Field(None, description="该消息的游标，可作为消息列表的 after / before")
+
+
+class SessionDigest(BaseModel):
+    id: str
+    parties: list
+    status: str
+    created_at: datetime
+    last_message: Optional[MessageResponse] = None
+    message_count: int
+    unread_count: int = Field(..., description="他方发来、位于已读位置之后的消息数")
+    last_activity_at: datetime = Field(..., description="最后一条消息的时间，无消息时为会话创建时间")
+
+
+class SessionReadUpdate(BaseModel):
+    cursor: Optional[str] = Field(None, description="读到的消息游标（消息列表 / SSE 事件 id），不传则标记到最新一条")
 
 
 class DealCreate(BaseModel):
@@ -164,3 +188,40 @@ class RfpSummaryResponse(BaseModel):
     rfp: RfpResponse
     proposal_count: int
     proposals: list[ProposalResponse]
+
+
+class SearchHit(BaseModel):
+    type: str  # post | rfp
+    id: str
+    title: str
+    snippet: str  # 正文 / 描述片段，已 HTML 转义，命中词以 <b></b> 标出
+    rank: float
+    created_at: datetime
+
+
+class SlowQueryPlan(BaseModel):
+    captured_at: datetime
+    duration_ms: float
+    analyze: bool  # False 时为未实际执行的 EXPLAIN 估算计划（写入语句）
+    plan: Any  # EXPLAIN (FORMAT JSON) 输出
+
+
+class SlowQueryStats(BaseModel):
+    fingerprint: str  # 归一化语句，参数与字面量为 ?
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    last_ms: float
+    last_seen_at: datetime
+    param_shapes: str
+    routes: dict[str, int]  # "方法 路由模板" -> 次数；非请求内执行的为 background
+    plans: list[SlowQueryPlan]
+
+
+class MatchIndexCheck(BaseModel):
+    ok: bool  # 与 capabilities 表一致
+    missing: list[str]  # 表中有、索引中没有的 cap_id
+    stale: list[str]  # 索引中有、表中已没有的 cap_id
+    mismatched: list[str]  # agent_id / type / domains 不一致的 cap_id
+    repaired: bool  # 本次已以数据库为准重建
@@ -0,0 +1,183 @@
+"""
+帖子与 RFP 全文检索（中文友好）。
+
+PostgreSQL 内置分词不切分中文，这里在应用侧分词后直接写入 tsvector（search_vector 列，GIN 索引）：
+- 连续的中日韩字符切成重叠二元组（bigram），每段末字另记一个单字词元，位置连续；
+- 其他文字按字母数字切词并转小写；
+- 标题权重 A，正文 / 描述权重 B。
+
+查询按同样规则切分：中文段转为相邻二元组的短语查询（<->），即“包含该子串”；
+单字查询用前缀匹配（悬:*）。多个关键词之间为 AND。排名使用 ts_rank_cd，摘要在应用侧生成并高亮。
+"""
+from __future__ import annotations
+
+import asyncio
+import html
+import logging
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, cast, event, inspect, select, update
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import AsyncSessionLocal
+from app.models import Post, Rfp
+
+logger = logging.getLogger(__name__)
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+# tsvector 单个词元最多记录 256 个位置，位置上限 16383
+MAX_POSITIONS = 255
+MAX_POSITION = 16383
+MAX_QUERY_TERMS = 16
+SNIPPET_CHARS = 80
+# 每类结果参与相关度排序的候选上限（按时间取最新的命中）
+MAX_CANDIDATES = 5000
+BACKFILL_BATCH = 500
+
+
+def _runs(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text or "")
+
+
+def _is_cjk(run: str) -> bool:
+    return bool(_CJK_RE.match(run))
+
+
+def _lexemes(text: str) -> Iterable[str]:
+    """按位置顺序产出词元。"""
+    for run in _runs(text):
+        if _is_cjk(run):
+            for i in range(len(run) - 1):
+                yield run[i:i + 2]
+            yield run[-1]
+        else:
+            yield run.lower()
+
+
+def _quote(lexeme: str) -> str:
+    return "'" + lexeme.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def vector_literal(weighted: Iterable[tuple[Optional[str], str]]) -> str:
+    """[(文本, 权重), ...] -> tsvector 字面量，如 '悬疑':1A,5B 'abc':2A。"""
+    positions: dict[str, list[str]] = {}
+    pos = 0
+    for text, weight in weighted:
+        for lex in _lexemes(text or ""):
+            pos = min(pos + 1, MAX_POSITION)
+            slots = positions.setdefault(lex, [])
+            if len(slots) < MAX_POSITIONS:
+                slots.append(f"{pos}{weight}")
+        # 字段之间留出间隔，避免短语查询跨字段命中
+        pos = min(pos + 1, MAX_POSITION)
+    return " ".join(f"{_quote(lex)}:{','.join(slots)}" for lex, slots in positions.items())
+
+
+def query_terms(q: str) -> list[str]:
+    """查询串切分出的关键词（中文段、外文词），用于 tsquery 与摘要高亮。"""
+    return _runs(q)[:MAX_QUERY_TERMS]
+
+
+def tsquery_literal(terms: list[str]) -> Optional[str]:
+    parts = []
+    for term in terms:
+        if not _is_cjk(term):
+            parts.append(_quote(term.lower()))
+        elif len(term) == 1:
+            parts.append(_quote(term) + ":*")
+        else:
+            parts.append("(" + " <-> ".join(_quote(term[i:i + 2]) for i in range(len(term) - 1)) + ")")
+    return " & ".join(parts) or None
+
+
+def snippet(text: Optional[str], terms: list[str], width: int = SNIPPET_CHARS) -> str:
+    """截取首个命中附近的片段，HTML 转义后用 <b></b> 标出命中词。"""
+    text = text or ""
+    if not terms:
+        return html.escape(text[:width])
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    m = pattern.search(text)
+    start = max(0, (m.start() if m else 0) - width // 4)
+    end = min(len(text), start + width)
+    window = text[start:end]
+    out, last = [], 0
+    for hit in pattern.finditer(window):
+        out.append(html.escape(window[last:hit.start()]))
+        out.append("<b>" + html.escape(hit.group()) + "</b>")
+        last = hit.end()
+    out.append(html.escape(window[last:]))
+    return ("…" if start > 0 else "") + "".join(out) + ("…" if end < len(text) else "")
+
+
+# 参与检索的 (标题, 正文) 字段
+_INDEXED = {Post: ("title", "content"), Rfp: ("title", "description")}
+
+
+def _vector(title: Optional[str], body: Optional[str]):
+    return cast(vector_literal([(title, "A"), (body, "B")]), TSVECTOR)
+
+
+# 写入时维护 search_vector：新建总是计算，更新仅在相关文本字段变化时重算
+def _on_insert(mapper, connection, target) -> None:
+    title, body = _INDEXED[mapper.class_]
+    target.search_vector = _vector(getattr(target, title), getattr(target, body))
+
+
+def _on_update(mapper, connection, target) -> None:
+    fields = _INDEXED[mapper.class_]
+    attrs = inspect(target).attrs
+    if any(attrs[f].history.has_changes() for f in fields):
+        _on_insert(mapper, connection, target)
+
+
+for _model in _INDEXED:
+    event.listen(_model, "before_insert", _on_insert)
+    event.listen(_model, "before_update", _on_update)
+
+
+async def backfill(db: AsyncSession, model, batch: int = BACKFILL_BATCH) -> int:
+    """
+    为 search_vector 为空的存量行补算向量；SKIP LOCKED 使多个 worker 可并行而不重复。
+    按主键 id 顺序分批（keyset），每批从上一批最后的 id 之后继续，已补算的行只扫过一次。
+    """
+    title, body = (getattr(model, f) for f in _INDEXED[model])
+    table = model.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(search_vector=cast(bindparam("b_vector"), TSVECTOR))
+    )
+    total = 0
+    last_id = None
+    while True:
+        q = select(model.id, title, body).where(model.search_vector.is_(None))
+        if last_id is not None:
+            q = q.where(model.id > last_id)
+        r = await db.execute(q.order_by(model.id).limit(batch).with_for_update(skip_locked=True))
+        rows = r.all()
+        if not rows:
+            return total
+        last_id = rows[-1][0]
+        await db.execute(stmt, [
+            {"b_id": row_id, "b_vector": vector_literal([(t, "A"), (b, "B")])} for row_id, t, b in rows
+        ])
+        await db.commit()
+        total += len(rows)
+
+
+async def backfill_all() -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            for model in (Post, Rfp):
+                n = await backfill(db, model)
+                if n:
+                    logger.info("search_vector backfilled: %s %d rows", model.__tablename__, n)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("search_vector backfill failed")
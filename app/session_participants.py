@@ -0,0 +1,104 @@
+"""
+会话参与方（session_participants）的维护与成员校验。
+
+sessions.parties 为 JSONB 数组，按成员过滤需扫描全表；这里在创建会话的同一事务内把参与方展开成
+(session_id, agent_id) 行：主键即成员校验的索引，(agent_id, created_at, session_id) 索引服务收件箱分页。
+每个参与方行另冗余会话的最后活动（最新一条消息的 (created_at, id)），由各消息写入路径在写消息的同一事务内推进
+（record_activity），收件箱按最近活动排序时直接在 (agent_id, last_activity_at, session_id) 索引上分页。
+"""
+from __future__ import annotations
+
+import secrets
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, exists, func, select, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Message, Session, SessionParticipant
+
+_FOR_ALL = text("""
+    INSERT INTO session_participants (session_id, agent_id, created_at, last_activity_at, last_message_id)
+    SELECT DISTINCT s.id, p.agent_id, s.created_at, coalesce(m.created_at, s.created_at), m.id
+    FROM sessions s
+    CROSS JOIN LATERAL jsonb_array_elements_text(s.parties) AS p(agent_id)
+    LEFT JOIN LATERAL (
+        SELECT created_at, id FROM messages WHERE session_id = s.id ORDER BY created_at DESC, id DESC LIMIT 1
+    ) m ON true
+    WHERE jsonb_typeof(s.parties) = 'array'
+    ON CONFLICT DO NOTHING
+""")
+
+_P = SessionParticipant.__table__
+# 只前进不后退：并发写入（组提交的不同批次、多个 worker）按 (created_at, id) 取较新者
+_ADVANCE = (
+    update(_P)
+    .where(_P.c.session_id == bindparam("sid"))
+    .where(
+        tuple_(_P.c.last_activity_at, func.coalesce(_P.c.last_message_id, ""))
+        < tuple_(bindparam("at", type_=_P.c.last_activity_at.type), bindparam("mid", type_=_P.c.last_message_id.type))
+    )
+    .values(last_activity_at=bindparam("at"), last_message_id=bindparam("mid"))
+)
+
+
+def new_session_id() -> str:
+    return f"sess_{secrets.token_hex(12)}"
+
+
+def add_session(
+    db: AsyncSession, parties: Sequence[str], session_id: Optional[str] = None, first_message_id: Optional[str] = None,
+) -> Session:
+    """
+    新建会话并登记参与方；created_at 在应用侧赋值，两表取同一时间。session_id 缺省时新生成。
+    first_message_id 为随会话一并写入的首条消息（其 created_at 须取会话的 created_at），直接记为最后活动，无需再 record_activity。
+    """
+    now = datetime.utcnow()
+    sess = Session(id=session_id or new_session_id(), parties=list(parties), status="active", created_at=now)
+    db.add(sess)
+    db.add_all(
+        SessionParticipant(
+            session_id=sess.id, agent_id=agent_id, created_at=now, last_activity_at=now, last_message_id=first_message_id,
+        )
+        for agent_id in dict.fromkeys(parties)
+    )
+    return sess
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+async def record_activity(db: AsyncSession, msgs: Iterable[Message]) -> None:
+    """把 msgs 所在各会话全部参与方的最后活动推进到该会话在 msgs 中最新的一条；一条 executemany UPDATE。"""
+    latest: dict[str, tuple[datetime, str]] = {}
+    for m in msgs:
+        key = (_utc(m.created_at), m.id)
+        if m.session_id not in latest or key > latest[m.session_id]:
+            latest[m.session_id] = key
+    if latest:
+        # 按 session_id 顺序加行锁，并发批次之间不会互相死锁
+        await db.execute(_ADVANCE, [{"sid": sid, "at": at, "mid": mid} for sid, (at, mid) in sorted(latest.items())])
+
+
+def is_party(session_id: str, agent_id: str):
+    """EXISTS 子句：agent 是否为会话参与方（主键查找）。"""
+    return exists().where(SessionParticipant.session_id == session_id, SessionParticipant.agent_id == agent_id)
+
+
+async def check_party(db: AsyncSession, session_id: str, agent_id: str) -> None:
+    """成员校验：命中时只有一次主键 EXISTS；未命中再区分会话不存在（404）与无权访问（403）。"""
+    if (await db.execute(select(is_party(session_id, agent_id)))).scalar():
+        return
+    if not (await db.execute(select(exists().where(Session.id == session_id)))).scalar():
+        raise HTTPException(404, "Session not found")
+    raise HTTPException(403, "Not a party of this session")
+
+
+async def backfill_participants_if_empty(db: AsyncSession) -> None:
+    """新建 session_participants 表后首次启动时，按现有 sessions.parties 全量回填。"""
+    has_rows = (await db.execute(select(exists().select_from(SessionParticipant)))).scalar()
+    if not has_rows:
+        await db.execute(_FOR_ALL)
+        await db.commit()
@@ -0,0 +1,209 @@
+"""
+慢查询日志：执行时间超过 SLOW_QUERY_MS 的 SQL 按指纹（见 app/query_budget.fingerprint）汇总，
+按 SLOW_QUERY_SAMPLE_RATE 抽样写 warning 日志（归一化语句、参数形状、调用路由、耗时，不含参数值）。
+
+- 每个指纹的前 SLOW_QUERY_EXPLAIN_COUNT 次慢执行，在后台另取连接以原参数执行 EXPLAIN (ANALYZE, BUFFERS) 并保存计划；
+  ANALYZE 会真正执行语句，故只对只读语句（SELECT / 不含写入的 WITH，且不加行锁）使用，其余语句只取 EXPLAIN 估算计划；
+  EXPLAIN 在回滚的事务内执行，受 SLOW_QUERY_EXPLAIN_TIMEOUT_MS 限制，且自身不计入慢查询与请求的 SQL 统计；
+- 汇总只在进程内、按 worker 独立，最多保留 SLOW_QUERY_MAX_FINGERPRINTS 个指纹（满时淘汰累计耗时最少的）；
+  GET /v1/admin/slow-queries 返回当前 worker 累计耗时等排序最靠前的指纹。
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.query_budget import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# execution_options 中该项为 False 的语句（EXPLAIN 自身）不计入慢查询
+SKIP_OPTION = "slow_query_log"
+BACKGROUND_ROUTE = "background"
+
+_EXPLAINABLE = re.compile(r"^\s*(select|with|insert|update|delete|merge|values)\b", re.I)
+_READ_ONLY = re.compile(r"^\s*(select|with)\b", re.I)
+_WRITES = re.compile(r"\b(insert|update|delete|merge)\b|\bfor\s+(no\s+key\s+)?(update|share|key\s+share)\b", re.I)
+
+
+@dataclass
+class Plan:
+    captured_at: datetime
+    duration_ms: float
+    analyze: bool
+    plan: Any
+
+
+@dataclass
+class SlowQuery:
+    fingerprint: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+    last_seen_at: Optional[datetime] = None
+    param_shapes: str = ""
+    routes: Counter = field(default_factory=Counter)
+    plans: list[Plan] = field(default_factory=list)
+    # 已发起（含进行中）的 EXPLAIN 次数
+    explains: int = 0
+
+
+_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("slow_query_scope", default=None)
+_stats: dict[str, SlowQuery] = {}
+_tasks: set[asyncio.Task] = set()
+# 同步引擎 -> AsyncEngine：EXPLAIN 在慢语句所在的数据库（主库或副本）上执行
+_engines: dict = {}
+
+
+def _shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def param_shapes(parameters: Any, executemany: bool) -> str:
+    """参数的类型与元素个数（不含取值），如 (str, int, list[3])；executemany 时为 行数 x (首行形状)。"""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {param_shapes(rows[0], False)}" if rows else "0 x ()"
+    if isinstance(parameters, dict):
+        return "(" + ", ".join(f"{k}: {_shape(v)}" for k, v in parameters.items()) + ")"
+    return "(" + ", ".join(_shape(v) for v in parameters or ()) + ")"
+
+
+def _current_route() -> str:
+    scope = _scope.get()
+    if scope is None:
+        return BACKGROUND_ROUTE
+    return f"{scope['method']} {getattr(scope.get('route'), 'path', None) or 'unmatched'}"
+
+
+def _entry(fp: str) -> SlowQuery:
+    entry = _stats.get(fp)
+    if entry is None:
+        if len(_stats) >= settings.slow_query_max_fingerprints:
+            del _stats[min(_stats, key=lambda k: _stats[k].total_ms)]
+        entry = _stats[fp] = SlowQuery(fp)
+    return entry
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_slow_query_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms < settings.slow_query_ms or context.execution_options.get(SKIP_OPTION) is False:
+        return
+    fp = fingerprint(statement)
+    route = _current_route()
+    shapes = param_shapes(parameters, executemany)
+    entry = _entry(fp)
+    entry.count += 1
+    entry.total_ms += elapsed_ms
+    entry.max_ms = max(entry.max_ms, elapsed_ms)
+    entry.last_ms = elapsed_ms
+    entry.last_seen_at = datetime.now(timezone.utc)
+    entry.param_shapes = shapes
+    entry.routes[route] += 1
+    if random.random() < settings.slow_query_sample_rate:
+        logger.warning("slow query %.1f ms route=%s params=%s: %s", elapsed_ms, route, shapes, fp[:2000])
+    engine = _engines.get(conn.engine)
+    if (
+        engine is not None
+        and entry.explains < settings.slow_query_explain_count
+        and not executemany
+        and conn.dialect.name == "postgresql"
+        and _EXPLAINABLE.match(statement)
+    ):
+        _schedule_explain(engine, entry, statement, parameters)
+
+
+def _schedule_explain(engine: AsyncEngine, entry: SlowQuery, statement: str, parameters: Any) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    entry.explains += 1
+    params = tuple(parameters) if isinstance(parameters, (list, tuple)) else parameters
+    # 在空上下文中创建任务（任务复制创建时的上下文）：EXPLAIN 不计入当前请求的 SQL 条数与预算；
+    # 不用 create_task(context=...)，该参数 Python 3.11 起才有
+    task = contextvars.Context().run(loop.create_task, _explain(engine, entry, statement, params))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _explain(engine: AsyncEngine, entry: SlowQuery, statement: str, parameters: Any) -> None:
+    analyze = bool(_READ_ONLY.match(statement)) and not _WRITES.search(statement)
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    start = time.perf_counter()
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(**{SKIP_OPTION: False})
+            async with conn.begin() as tx:
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.slow_query_explain_timeout_ms)}")
+                r = await conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters)
+                plan = r.scalar()
+                await tx.rollback()
+    except Exception as e:
+        logger.warning("slow query EXPLAIN failed (%s): %s", e.__class__.__name__, entry.fingerprint[:300])
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    entry.plans.append(Plan(datetime.now(timezone.utc), elapsed_ms, analyze, plan))
+    logger.info("captured %s plan for slow query: %s", "EXPLAIN ANALYZE" if analyze else "EXPLAIN", entry.fingerprint[:300])
+
+
+def track_slow_queries(engine: AsyncEngine) -> None:
+    """SLOW_QUERY_MS 为 0 时不挂事件。"""
+    if settings.slow_query_ms <= 0:
+        return
+    _engines[engine.sync_engine] = engine
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def top(order: str = "total", limit: int = 20) -> list[SlowQuery]:
+    key = {
+        "total": lambda e: e.total_ms,
+        "max": lambda e: e.max_ms,
+        "count": lambda e: e.count,
+        "mean": lambda e: e.total_ms / e.count,
+    }[order]
+    return sorted(_stats.values(), key=key, reverse=True)[:limit]
+
+
+class SlowQueryMiddleware:
+    """登记当前请求的 ASGI scope；路由匹配后 scope["route"] 即为路由模板，供慢查询日志标注调用方。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
@@ -0,0 +1,66 @@
+"""
+NDJSON 流式导出：请求头 Accept: application/x-ndjson 时，列表接口改为逐行输出全部结果。
+
+使用服务端游标（AsyncSession.stream + yield_per）分批取数，每批序列化后立即发送，
+内存占用与结果集大小无关。流在独立的数据库会话中执行，不依赖请求级 get_db 的生命周期；
+factory 传路由 Session 所在库的 sessionmaker（见 app.db.session_factory），与 ETag 读同一个库（主库或副本）。
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db import AsyncSessionLocal
+
+NDJSON = "application/x-ndjson"
+YIELD_PER = 500
+
+# 供路由声明 OpenAPI 中的可选响应类型
+NDJSON_RESPONSES: dict = {200: {"content": {NDJSON: {"schema": {"type": "string"}}}}}
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+
+def ndjson_response(
+    q: Select,
+    model: Any,
+    to_schema: Callable[[Any], BaseModel],
+    headers: Optional[dict] = None,
+    factory: async_sessionmaker = AsyncSessionLocal,
+) -> StreamingResponse:
+    """按 (created_at, id) 正序流式输出 q 的全部行，每行一个 JSON 对象。"""
+    q = q.order_by(model.created_at, model.id).execution_options(yield_per=YIELD_PER)
+
+    async def rows():
+        async with factory() as db:
+            result = await db.stream(q)
+            async for batch in result.scalars().partitions():
+                # 身份映射为弱引用，已发送的行随批次释放
+                yield b"".join(to_schema(row).model_dump_json().encode() + b"\n" for row in batch)
+
+    return StreamingResponse(rows(), media_type=NDJSON, headers=headers)
+
+
+SSE = "text/event-stream"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data: str, event: Optional[str] = None, event_id: Optional[str] = None) -> bytes:
+    """按 Server-Sent Events 格式编码一条事件。"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+SSE_PING = b": ping\n\n"
@@ -0,0 +1,651 @@
+#!/usr/bin/env python3
+"""
+端到端基准：向数据库灌入合成的 Agent 网络数据，再由并发的买方 / 供应方 Agent 经 HTTP 驱动真实服务，
+按路由统计延迟与吞吐，并与保存的基线对比。
+
+1. 灌数据（直连数据库，读取 DATABASE_URL，与服务相同；需已建表）：
+    python benchmarks/agent_swarm.py seed --agents 10000
+   规模可到 --agents 1000000；能力、RFP、提案、会话、消息的数量默认按 agent 数等比放大，也可单独指定。
+   灌入的行 id 带固定前缀，重复执行只补足差额。
+2. 启动服务（在灌数据之后启动：能力匹配索引与目录快照在启动时加载）：
+    uvicorn app.main:app --port 8000 --workers 4
+3. 压测：
+    python benchmarks/agent_swarm.py run http://localhost:8000 --buyers 20 --suppliers 80 --duration 60 --out result.json
+   买方循环：浏览能力目录 → 发布 RFP → 等待提案 → 接受报价最低的提案 → 与供应方建会话并多轮收发消息 → 标记已读 → 关闭 RFP；
+   供应方循环：拉取匹配到自己的 RFP → 查看并提交提案 → 查看会话摘要 → 读取未读消息并回复 → 标记已读。
+4. 对比基线（也可在 run 时直接加 --baseline baseline.json）：
+    python benchmarks/agent_swarm.py compare baseline.json result.json --tolerance 0.15
+
+run 输出 JSON：每个路由（方法 + 路径模板）的请求数、错误数、p50/p95/p99/平均延迟（毫秒）与吞吐（次/秒），
+以及完整成交流程的次数与耗时。对比时 p95 变慢超过容差（且绝对值超过 --min-delta-ms）或总吞吐下降超过容差记为回退，
+退出码为 1。同一台机器、同样的数据规模与参数下的结果才可比。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.db import engine  # noqa: E402
+from app.match_index import CapabilityMatchIndex  # noqa: E402
+from app.partitions import ensure_partitions  # noqa: E402
+from app.search import vector_literal  # noqa: E402
+
+TYPES = [f"swarm_type_{i:02d}" for i in range(20)]
+DOMAINS = [f"领域{i:03d}" for i in range(300)]
+# 压测中的供应方只在最常见的几个类型 / 领域上提供能力，买方的 RFP 因此总能匹配到在线的供应方
+SWARM_TYPES = TYPES[:5]
+SWARM_DOMAINS = DOMAINS[:20]
+INTENTS = ["inquiry", "offer", "counter_offer", "accept", "question"]
+CHUNK = 20000
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "p50": round(percentile(samples, 50), 2),
+        "p95": round(percentile(samples, 95), 2),
+        "p99": round(percentile(samples, 99), 2),
+        "mean": round(sum(samples) / len(samples), 2) if samples else 0.0,
+    }
+
+
+# ---------------------------------------------------------------- seed
+
+def seeded_id(prefix: str, i: int) -> str:
+    # 固定前缀 + 序号：重复灌数据时据此统计已有条数，只补差额
+    return f"{prefix}_5eed{i:020x}"
+
+
+def zipf_weights(n: int) -> list[float]:
+    return list(accumulate(1 / (i + 1) for i in range(n)))
+
+
+class Seeder:
+    def __init__(self, raw, rng: random.Random, start: datetime, now: datetime) -> None:
+        self.raw = raw
+        self.rng = rng
+        self.start = start
+        self.now = now
+        self.type_weights = zipf_weights(len(TYPES))
+        self.domain_weights = zipf_weights(len(DOMAINS))
+
+    def when(self, after: Optional[datetime] = None) -> datetime:
+        lo = after or self.start
+        return lo + (self.now - lo) * self.rng.random()
+
+    def domains(self, k: int) -> list[str]:
+        return sorted(set(self.rng.choices(DOMAINS, cum_weights=self.domain_weights, k=k)))
+
+    async def have(self, table: str, prefix: str) -> int:
+        return await self.raw.fetchval(f"SELECT count(*) FROM {table} WHERE id LIKE $1", f"{prefix}_5eed%")
+
+    async def copy(self, table: str, columns: list[str], rows) -> int:
+        n, batch = 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == CHUNK:
+                await self.raw.copy_records_to_table(table, records=batch, columns=columns)
+                n += len(batch)
+                batch.clear()
+        if batch:
+            await self.raw.copy_records_to_table(table, records=batch, columns=columns)
+            n += len(batch)
+        return n
+
+    async def agents(self, n: int) -> int:
+        have = await self.have("agents", "agent")
+
+        def rows():
+            for i in range(have, n):
+                agent_id = seeded_id("agent", i)
+                yield (
+                    agent_id, f"did:wymyk:agent:{agent_id}", f"swarm-seed-{i}",
+                    self.rng.choice(("publisher", "studio", "other")),
+                    hashlib.sha256(agent_id.encode()).hexdigest(), self.when(),
+                )
+
+        return await self.copy("agents", ["id", "did", "name", "type", "api_key_hash", "created_at"], rows())
+
+    async def capabilities(self, n: int, agents: int) -> int:
+        have = await self.have("capabilities", "cap")
+
+        def rows():
+            for i in range(have, n):
+                price = {"currency": "CNY", "amount": self.rng.randrange(1000, 100000, 500)}
+                yield (
+                    seeded_id("cap", i), seeded_id("agent", self.rng.randrange(agents)),
+                    self.rng.choices(TYPES, cum_weights=self.type_weights)[0],
+                    json.dumps(price), json.dumps(self.domains(self.rng.randint(1, 3)), ensure_ascii=False),
+                    self.when(),
+                )
+
+        return await self.copy("capabilities", ["id", "agent_id", "type", "price", "domains", "created_at"], rows())
+
+    async def match_index(self) -> CapabilityMatchIndex:
+        """与服务相同的匹配规则（app/match_index.py），用于计算 rfp_matches 与挑选提案方。"""
+        index = CapabilityMatchIndex()
+        async for r in self.raw.cursor("SELECT id, agent_id, type, domains::text AS domains FROM capabilities"):
+            index.upsert(r["id"], r["agent_id"], r["type"], json.loads(r["domains"]) if r["domains"] else None)
+        return index
+
+    async def rfps(self, n: int, agents: int, proposals_per_rfp: int) -> tuple[int, int, int]:
+        have = await self.have("rfps", "rfp")
+        if have >= n:
+            return 0, 0, 0
+        index = await self.match_index()
+        rfps, matches, proposals = [], [], []
+        for i in range(have, n):
+            rfp_id = seeded_id("rfp", i)
+            creator = seeded_id("agent", self.rng.randrange(agents))
+            cap_type = self.rng.choices(TYPES, cum_weights=self.type_weights)[0]
+            # RFP 的领域条件均匀取值，避免每条都扇出到热门领域的全部供应方
+            filters = sorted(set(self.rng.choices(DOMAINS, k=self.rng.randint(1, 2))))
+            created_at = self.when()
+            status = "open" if self.rng.random() < 0.7 else self.rng.choice(("closed", "cancelled"))
+            title = f"{cap_type} 需求 {'、'.join(filters)}"
+            description = f"寻找 {cap_type} 供应方，领域：{'、'.join(filters)}。预算面议，编号 {i}。"
+            rfps.append((
+                rfp_id, creator, title, description, cap_type, json.dumps(filters, ensure_ascii=False),
+                json.dumps({"currency": "CNY", "amount": self.rng.randrange(5000, 500000, 1000)}),
+                created_at + timedelta(days=30), status, created_at,
+                vector_literal([(title, "A"), (description, "B")]),
+            ))
+            suppliers = sorted(index.supplier_ids(cap_type, filters) - {creator})
+            matches.extend((rfp_id, agent_id, created_at) for agent_id in suppliers)
+            for j, agent_id in enumerate(self.rng.sample(suppliers, min(proposals_per_rfp, len(suppliers)))):
+                proposals.append((
+                    seeded_id("prop", i * proposals_per_rfp + j), rfp_id, agent_id,
+                    "pending" if status == "open" else self.rng.choice(("accepted", "rejected")),
+                    json.dumps({"currency": "CNY", "amount": self.rng.randrange(5000, 500000, 1000)}),
+                    "30 天内交付", "已阅读需求，附报价与交付计划。", self.when(created_at),
+                ))
+        await self.raw.executemany(
+            "INSERT INTO rfps (id, creator_agent_id, title, description, capability_type, domain_filters,"
+            " budget, deadline_at, status, created_at, search_vector)"
+            " VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11::tsvector)",
+            rfps,
+        )
+        await self.copy("rfp_matches", ["rfp_id", "agent_id", "created_at"], matches)
+        await self.copy(
+            "proposals",
+            ["id", "rfp_id", "supplier_agent_id", "status", "price", "delivery_at", "content", "created_at"],
+            proposals,
+        )
+        return len(rfps), len(matches), len(proposals)
+
+    async def sessions(self, n: int, agents: int, messages_per_session: int) -> tuple[int, int]:
+        have = await self.have("sessions", "sess")
+        sessions, participants, messages = [], [], []
+        for i in range(have, n):
+            session_id = seeded_id("sess", i)
+            a, b = (seeded_id("agent", k) for k in self.rng.sample(range(agents), 2))
+            created_at = self.when()
+            sessions.append((
+                session_id, json.dumps([a, b]), "active" if self.rng.random() < 0.8 else "closed", created_at,
+            ))
+            span = min(self.now - created_at, timedelta(days=7))
+            times = sorted(created_at + span * self.rng.random() for _ in range(messages_per_session))
+            ids = [seeded_id("msg", i * messages_per_session + j) for j in range(messages_per_session)]
+            for j, (msg_id, t) in enumerate(zip(ids, times)):
+                payload = {"intent": self.rng.choice(INTENTS), "text": f"第 {j + 1} 轮沟通", "price": self.rng.randrange(1000, 100000)}
+                messages.append((msg_id, session_id, (a, b)[j % 2], json.dumps(payload, ensure_ascii=False), t))
+            # 约一半参与方读到中途某条消息，其余未读过：会话摘要的未读数因此有真实分布
+            for agent_id in (a, b):
+                k = self.rng.randrange(messages_per_session + 1) if self.rng.random() < 0.5 else 0
+                last = (times[k - 1], ids[k - 1]) if k else (None, None)
+                participants.append((session_id, agent_id, created_at, *last))
+            if len(messages) >= CHUNK:
+                await self._flush_sessions(sessions, participants, messages)
+        await self._flush_sessions(sessions, participants, messages)
+        added = max(n - have, 0)
+        return added, added * messages_per_session
+
+    async def _flush_sessions(self, sessions: list, participants: list, messages: list) -> None:
+        await self.copy("sessions", ["id", "parties", "status", "created_at"], sessions)
+        await self.copy(
+            "session_participants", ["session_id", "agent_id", "created_at", "last_read_at", "last_read_id"],
+            participants,
+        )
+        await self.copy("messages", ["id", "session_id", "sender", "payload", "created_at"], messages)
+        sessions.clear()
+        participants.clear()
+        messages.clear()
+
+
+async def seed(args) -> None:
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=args.days)
+    agents = args.agents
+    sizes = {
+        "agents": agents,
+        "capabilities": args.capabilities if args.capabilities is not None else agents * 2,
+        "rfps": args.rfps if args.rfps is not None else max(1, agents // 20),
+        "sessions": args.sessions if args.sessions is not None else agents // 2,
+    }
+    # 覆盖灌数据时间窗口的每个月都需要有分区
+    months = (now.year - start.year) * 12 + now.month - start.month
+    async with engine.begin() as conn:
+        await ensure_partitions(conn, months + settings.message_partitions_ahead, now=start)
+
+    added: dict = {}
+    t0 = time.perf_counter()
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        s = Seeder(raw, random.Random(args.seed), start, now)
+        steps = [
+            ("agents", lambda: s.agents(agents)),
+            ("capabilities", lambda: s.capabilities(sizes["capabilities"], agents)),
+            ("rfps", lambda: s.rfps(sizes["rfps"], agents, args.proposals_per_rfp)),
+            ("sessions", lambda: s.sessions(sizes["sessions"], agents, args.messages_per_session)),
+        ]
+        for name, step in steps:
+            t = time.perf_counter()
+            async with raw.transaction():
+                added[name] = await step()
+            print(f"seeded {name}: {added[name]} in {time.perf_counter() - t:.1f}s", file=sys.stderr)
+        for table in ("agents", "capabilities", "rfps", "rfp_matches", "proposals", "sessions",
+                      "session_participants", "messages"):
+            await raw.execute(f"ANALYZE {table}")
+    await engine.dispose()
+    rfps, matches, proposals = added["rfps"] or (0, 0, 0)
+    sessions, messages = added["sessions"]
+    print(json.dumps({
+        "sizes": sizes,
+        "messages_per_session": args.messages_per_session,
+        "added": {
+            "agents": added["agents"], "capabilities": added["capabilities"], "rfps": rfps,
+            "rfp_matches": matches, "proposals": proposals, "sessions": sessions, "messages": messages,
+        },
+        "seconds": round(time.perf_counter() - t0, 1),
+    }, indent=2))
+
+
+# ---------------------------------------------------------------- run
+
+class Stats:
+    """按路由模板记录延迟；recording 为 False（预热期）时只发请求不计入。"""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.flows: dict[str, list[float]] = defaultdict(list)
+        self.outcomes: Counter = Counter()
+        self.recording = False
+
+    def record(self, route: str, ms: float, ok: bool) -> None:
+        if self.recording:
+            self.samples[route].append(ms)
+            if not ok:
+                self.errors[route] += 1
+
+    def flow(self, name: str, ms: Optional[float] = None) -> None:
+        if self.recording:
+            self.outcomes[name] += 1
+            if ms is not None:
+                self.flows[name].append(ms)
+
+
+class Api:
+    def __init__(self, client: httpx.AsyncClient, stats: Stats) -> None:
+        self.client = client
+        self.stats = stats
+
+    async def call(
+        self, method: str, route: str, key: Optional[str] = None, path: Optional[dict] = None, **kwargs,
+    ) -> Optional[httpx.Response]:
+        """按路由模板发请求并计时；非 2xx 或连接错误记为该路由的错误并返回 None。"""
+        url = route.format(**path) if path else route
+        headers = {"X-API-Key": key} if key else None
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            r = None
+        ok = r is not None and r.is_success
+        self.stats.record(f"{method} {route}", (time.perf_counter() - t0) * 1000, ok)
+        return r if ok else None
+
+
+class SwarmAgent:
+    def __init__(self, api: Api, name: str, rng: random.Random) -> None:
+        self.api = api
+        self.name = name
+        self.rng = rng
+        self.id = ""
+        self.key = ""
+        self.profiles: list[tuple[str, str]] = []
+        # 会话 id -> 已读到的消息游标
+        self.cursors: dict[str, Optional[str]] = {}
+
+    async def register(self) -> bool:
+        r = await self.api.call("POST", "/v1/agents/register", json={"name": self.name})
+        if r is None:
+            return False
+        data = r.json()
+        self.id, self.key = data["id"], data["api_key"]
+        return True
+
+    async def offer_capabilities(self) -> None:
+        for _ in range(self.rng.randint(1, 2)):
+            cap_type = self.rng.choice(SWARM_TYPES)
+            domains = sorted(set(self.rng.sample(SWARM_DOMAINS, self.rng.randint(1, 3))))
+            r = await self.api.call(
+                "POST", "/v1/agents/{agent_id}/capabilities", self.key, {"agent_id": self.id},
+                json={"type": cap_type, "domains": domains, "price": {"currency": "CNY", "amount": 20000}},
+            )
+            if r is not None:
+                self.profiles.extend((cap_type, d) for d in domains)
+
+    async def read_new(self, session_id: str) -> list[dict]:
+        params = {"limit": 50}
+        if self.cursors.get(session_id):
+            params["after"] = self.cursors[session_id]
+        r = await self.api.call(
+            "GET", "/v1/sessions/{session_id}/messages", self.key, {"session_id": session_id}, params=params,
+        )
+        if r is None:
+            return []
+        items = r.json()["items"]
+        if items:
+            self.cursors[session_id] = items[-1]["cursor"]
+        return items
+
+    async def send(self, session_id: str, payload: dict) -> Optional[dict]:
+        r = await self.api.call(
+            "POST", "/v1/sessions/{session_id}/messages", self.key, {"session_id": session_id},
+            json={"payload": payload},
+        )
+        return r.json() if r is not None else None
+
+    async def mark_read(self, session_id: str) -> None:
+        await self.api.call(
+            "POST", "/v1/sessions/{session_id}/read", self.key, {"session_id": session_id},
+            json={"cursor": self.cursors.get(session_id)},
+        )
+
+
+async def buyer_loop(agent: SwarmAgent, profiles: list[tuple[str, str]], stop: asyncio.Event, args, stats: Stats) -> None:
+    api, rng = agent.api, agent.rng
+    while not stop.is_set():
+        t_flow = time.perf_counter()
+        cap_type, domain = rng.choice(profiles)
+        await api.call("GET", "/v1/capabilities", params={"type": cap_type, "domain": domain, "limit": 20})
+        r = await api.call("POST", "/v1/rfps", agent.key, json={
+            "title": f"{cap_type} 采购 {domain}",
+            "description": f"寻找 {domain} 领域的 {cap_type} 供应方",
+            "capability_type": cap_type,
+            "domain_filters": [domain],
+            "budget": {"currency": "CNY", "amount": rng.randrange(10000, 100000, 1000)},
+        })
+        if r is None:
+            await asyncio.sleep(args.poll)
+            continue
+        rfp_id = r.json()["id"]
+        await api.call("GET", "/v1/rfps", agent.key, params={"scope": "created", "status": "open", "limit": 20})
+
+        proposals: list[dict] = []
+        deadline = time.monotonic() + args.proposal_wait
+        while not proposals and time.monotonic() < deadline and not stop.is_set():
+            await asyncio.sleep(args.poll)
+            r = await api.call("GET", "/v1/rfps/{rfp_id}/summary", agent.key, {"rfp_id": rfp_id})
+            proposals = r.json()["proposals"] if r is not None else []
+        if not proposals:
+            await api.call("PATCH", "/v1/rfps/{rfp_id}", agent.key, {"rfp_id": rfp_id}, json={"status": "cancelled"})
+            stats.flow("rfp_without_proposal")
+            continue
+
+        best = min(proposals, key=lambda p: (p.get("price") or {}).get("amount", 0))
+        await api.call("PATCH", "/v1/proposals/{proposal_id}", agent.key, {"proposal_id": best["id"]},
+                       json={"status": "accepted"})
+        r = await api.call("POST", "/v1/sessions", agent.key, json={
+            "party_ids": [best["supplier_agent_id"]],
+            "capability_type": cap_type,
+            "initial_message": {"intent": "inquiry", "rfp_id": rfp_id, "proposal_id": best["id"]},
+        })
+        if r is None:
+            continue
+        session_id = r.json()["id"]
+        for i in range(args.rounds):
+            if stop.is_set():
+                break
+            await agent.send(session_id, {"intent": "counter_offer", "round": i, "price": rng.randrange(10000, 100000)})
+            # 等待供应方回复
+            deadline = time.monotonic() + args.proposal_wait
+            while time.monotonic() < deadline and not stop.is_set():
+                await asyncio.sleep(args.think)
+                if any(m["sender"] != agent.id for m in await agent.read_new(session_id)):
+                    break
+        await agent.mark_read(session_id)
+        await api.call("GET", "/v1/sessions/digest", agent.key, params={"limit": 20})
+        await api.call("PATCH", "/v1/rfps/{rfp_id}", agent.key, {"rfp_id": rfp_id}, json={"status": "closed"})
+        stats.flow("deal", (time.perf_counter() - t_flow) * 1000)
+
+
+async def supplier_loop(agent: SwarmAgent, stop: asyncio.Event, args) -> None:
+    api, rng = agent.api, agent.rng
+    proposed: set[str] = set()
+    while not stop.is_set():
+        r = await api.call("GET", "/v1/rfps", agent.key, params={"scope": "matched", "status": "open", "limit": 20})
+        fresh = [x for x in (r.json()["items"] if r is not None else []) if x["id"] not in proposed][:3]
+        for rfp in fresh:
+            proposed.add(rfp["id"])
+            if await api.call("GET", "/v1/rfps/{rfp_id}", agent.key, {"rfp_id": rfp["id"]}) is None:
+                continue
+            await api.call("POST", "/v1/rfps/{rfp_id}/proposals", agent.key, {"rfp_id": rfp["id"]}, json={
+                "price": {"currency": "CNY", "amount": rng.randrange(5000, 100000, 500)},
+                "delivery_at": "14 天内",
+                "content": "可按需求交付，附样例。",
+            })
+        r = await api.call("GET", "/v1/sessions/digest", agent.key, params={"limit": 20})
+        unread = [d for d in (r.json()["items"] if r is not None else []) if d["unread_count"] > 0][:3]
+        for d in unread:
+            if await agent.read_new(d["id"]):
+                await agent.send(d["id"], {"intent": "offer", "price": rng.randrange(5000, 100000, 500)})
+            await agent.mark_read(d["id"])
+        await asyncio.sleep(args.poll)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(stats: Stats, elapsed: float, meta: dict) -> dict:
+    routes = {}
+    for route in sorted(stats.samples):
+        samples = stats.samples[route]
+        routes[route] = {
+            "requests": len(samples),
+            "errors": stats.errors[route],
+            **summarize(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+        }
+    total = sum(len(s) for s in stats.samples.values())
+    return {
+        "meta": meta,
+        "totals": {
+            "requests": total,
+            "errors": sum(stats.errors.values()),
+            "seconds": round(elapsed, 1),
+            "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        },
+        "routes": routes,
+        "flows": {
+            name: {"count": count, **summarize(stats.flows.get(name, []))}
+            for name, count in sorted(stats.outcomes.items())
+        },
+    }
+
+
+async def run(args) -> int:
+    stats = Stats()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.buyers + args.suppliers + 10)
+    async with httpx.AsyncClient(base_url=args.base.rstrip("/"), timeout=60.0, limits=limits) as client:
+        api = Api(client, stats)
+        tag = f"{int(time.time())}"
+        suppliers = [SwarmAgent(api, f"swarm-supplier-{tag}-{i}", random.Random(rng.random())) for i in range(args.suppliers)]
+        buyers = [SwarmAgent(api, f"swarm-buyer-{tag}-{i}", random.Random(rng.random())) for i in range(args.buyers)]
+        # 注册与能力发布计入预热期：只在之后的循环里统计
+        if not all(await asyncio.gather(*(a.register() for a in suppliers + buyers))):
+            print("agent registration failed; is the server running?", file=sys.stderr)
+            return 2
+        await asyncio.gather(*(a.offer_capabilities() for a in suppliers))
+        profiles = sorted({p for a in suppliers for p in a.profiles})
+        if not profiles:
+            print("no supplier capabilities were created", file=sys.stderr)
+            return 2
+
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(supplier_loop(a, stop, args)) for a in suppliers]
+        tasks += [asyncio.create_task(buyer_loop(a, profiles, stop, args, stats)) for a in buyers]
+        await asyncio.sleep(args.warmup)
+        stats.recording = True
+        t0 = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        stats.recording = False
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await asyncio.gather(*tasks)
+
+    report = build_report(stats, elapsed, {
+        "base": args.base,
+        "git": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "buyers": args.buyers,
+        "suppliers": args.suppliers,
+        "warmup": args.warmup,
+        "duration": args.duration,
+        "rounds": args.rounds,
+        "seed": args.seed,
+    })
+    code = 0
+    if args.baseline:
+        report["comparison"] = compare_reports(
+            json.loads(Path(args.baseline).read_text()), report, args.tolerance, args.min_delta_ms,
+        )
+        code = 1 if report["comparison"]["regressions"] else 0
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return code
+
+
+# ---------------------------------------------------------------- compare
+
+def _change(before: float, after: float) -> Optional[float]:
+    return round((after - before) / before, 3) if before else None
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float, min_delta_ms: float) -> dict:
+    """逐路由对比延迟分位数与吞吐；change 为相对变化（0.1 即 +10%）。"""
+    routes, regressions = {}, []
+    for route in sorted(set(baseline["routes"]) | set(current["routes"])):
+        b, c = baseline["routes"].get(route), current["routes"].get(route)
+        if b is None or c is None:
+            routes[route] = {"only_in": "current" if b is None else "baseline"}
+            continue
+        routes[route] = {
+            metric: {"baseline": b[metric], "current": c[metric], "change": _change(b[metric], c[metric])}
+            for metric in ("p50", "p95", "p99", "throughput_rps")
+        }
+        if c["p95"] > b["p95"] * (1 + tolerance) and c["p95"] - b["p95"] > min_delta_ms:
+            regressions.append(f"{route}: p95 {b['p95']} -> {c['p95']} ms")
+        if c["errors"] > b["errors"]:
+            regressions.append(f"{route}: errors {b['errors']} -> {c['errors']}")
+    b_rps, c_rps = baseline["totals"]["throughput_rps"], current["totals"]["throughput_rps"]
+    if c_rps < b_rps * (1 - tolerance):
+        regressions.append(f"total throughput {b_rps} -> {c_rps} req/s")
+    return {
+        "baseline_git": baseline.get("meta", {}).get("git"),
+        "tolerance": tolerance,
+        "totals": {"throughput_rps": {"baseline": b_rps, "current": c_rps, "change": _change(b_rps, c_rps)}},
+        "routes": routes,
+        "regressions": regressions,
+    }
+
+
+def compare(args) -> int:
+    result = compare_reports(
+        json.loads(Path(args.baseline).read_text()), json.loads(Path(args.current).read_text()),
+        args.tolerance, args.min_delta_ms,
+    )
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 1 if result["regressions"] else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Agent 网络端到端基准")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("seed", help="灌入合成数据")
+    p.add_argument("--agents", type=int, default=10_000)
+    p.add_argument("--capabilities", type=int, default=None, help="默认 agents × 2")
+    p.add_argument("--rfps", type=int, default=None, help="默认 agents / 20")
+    p.add_argument("--proposals-per-rfp", type=int, default=5)
+    p.add_argument("--sessions", type=int, default=None, help="默认 agents / 2")
+    p.add_argument("--messages-per-session", type=int, default=20)
+    p.add_argument("--days", type=int, default=90, help="数据创建时间分布在最近多少天内")
+    p.add_argument("--seed", type=int, default=7)
+
+    p = sub.add_parser("run", help="并发模拟买方 / 供应方 Agent 压测服务")
+    p.add_argument("base", nargs="?", default="http://localhost:8000")
+    p.add_argument("--buyers", type=int, default=20)
+    p.add_argument("--suppliers", type=int, default=80)
+    p.add_argument("--warmup", type=float, default=5.0, help="秒；预热期的请求不计入统计")
+    p.add_argument("--duration", type=float, default=60.0, help="秒")
+    p.add_argument("--rounds", type=int, default=3, help="每次成交的消息往返轮数")
+    p.add_argument("--poll", type=float, default=0.2, help="轮询间隔（秒）")
+    p.add_argument("--think", type=float, default=0.05, help="等待对方回复时的检查间隔（秒）")
+    p.add_argument("--proposal-wait", type=float, default=3.0, help="等待提案 / 回复的最长秒数")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--out", help="结果另存为 JSON 文件")
+    p.add_argument("--save-baseline", help="把本次结果保存为基线文件")
+    p.add_argument("--baseline", help="与该基线文件对比，有回退时退出码为 1")
+    p.add_argument("--tolerance", type=float, default=0.15)
+    p.add_argument("--min-delta-ms", type=float, default=2.0)
+
+    p = sub.add_parser("compare", help="对比两次 run 的结果")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--tolerance", type=float, default=0.15, help="相对容差，0.15 即 15%%")
+    p.add_argument("--min-delta-ms", type=float, default=2.0, help="p95 绝对变化小于该值时不算回退")
+
+    args = ap.parse_args()
+    if args.command == "seed":
+        asyncio.run(seed(args))
+    elif args.command == "run":
+        sys.exit(asyncio.run(run(args)))
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+事件总线投递延迟基准：一方发消息，多条 SSE 订阅连接接收，统计“提交 -> 推送到达”的延迟。
+
+以多 worker 启动服务后运行（订阅连接与写请求会被分散到不同 worker，覆盖跨 worker 的 NOTIFY 路径）：
+    uvicorn app.main:app --workers 4 --port 8000
+    python benchmarks/event_bus_latency.py http://localhost:8000 --messages 500 --subscribers 8
+
+输出 JSON：p50/p95/p99（毫秒）、投递条数与丢失条数。
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def register(c: httpx.AsyncClient, name: str) -> tuple[str, dict]:
+    r = await c.post("/v1/agents/register", json={"name": name})
+    r.raise_for_status()
+    d = r.json()
+    return d["id"], {"X-API-Key": d["api_key"]}
+
+
+async def subscribe(base: str, sid: str, headers: dict, expected: int, ready: asyncio.Event, latencies: list[float]):
+    got = 0
+    async with httpx.AsyncClient(base_url=base, timeout=None) as c:
+        async with c.stream("GET", f"/v1/sessions/{sid}/stream", headers=headers) as r:
+            r.raise_for_status()
+            ready.set()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = json.loads(line[5:])["payload"]
+                if "sent_at" not in payload:
+                    continue
+                latencies.append((time.time() - payload["sent_at"]) * 1000)
+                got += 1
+                if got >= expected:
+                    return
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("base", nargs="?", default=os.environ.get("WYMYK_BASE_URL", "http://localhost:8000"))
+    ap.add_argument("--messages", type=int, default=200)
+    ap.add_argument("--subscribers", type=int, default=4)
+    ap.add_argument("--interval", type=float, default=0.005, help="两条消息之间的间隔（秒）")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    args = ap.parse_args()
+    base = args.base.rstrip("/")
+
+    async with httpx.AsyncClient(base_url=base, timeout=30.0) as c:
+        _, ha = await register(c, "bench-sender")
+        b_id, hb = await register(c, "bench-receiver")
+        r = await c.post("/v1/sessions", json={"party_ids": [b_id]}, headers=ha)
+        r.raise_for_status()
+        sid = r.json()["id"]
+
+        latencies: list[float] = []
+        readies = [asyncio.Event() for _ in range(args.subscribers)]
+        tasks = [
+            asyncio.create_task(subscribe(base, sid, hb, args.messages, ev, latencies))
+            for ev in readies
+        ]
+        await asyncio.wait_for(asyncio.gather(*(ev.wait() for ev in readies)), args.timeout)
+
+        started = time.perf_counter()
+        for i in range(args.messages):
+            await c.post(
+                f"/v1/sessions/{sid}/messages",
+                json={"payload": {"seq": i, "sent_at": time.time()}},
+                headers=ha,
+            )
+            if args.interval:
+                await asyncio.sleep(args.interval)
+        elapsed = time.perf_counter() - started
+
+        done, pending = await asyncio.wait(tasks, timeout=args.timeout)
+        for t in pending:
+            t.cancel()
+
+    expected = args.messages * args.subscribers
+    print(json.dumps({
+        "messages": args.messages,
+        "subscribers": args.subscribers,
+        "delivered": len(latencies),
+        "lost": expected - len(latencies),
+        "send_rate": round(args.messages / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+MCP 工具调用延迟基准：对比“每次调用新建同步 httpx.Client”（旧实现）与 mcp_server 共享 AsyncClient 的实现。
+
+先启动服务（uvicorn app.main:app --port 8000），再运行：
+    python benchmarks/mcp_tools_latency.py http://localhost:8000 --calls 200 --concurrency 10
+
+输出 JSON：每个工具顺序调用的 p50/p95/p99（毫秒），以及并发调用的吞吐（次/秒）。
+旧实现为同步调用，并发场景下以线程池模拟其阻塞行为。
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "p50": round(percentile(samples, 50), 2),
+        "p95": round(percentile(samples, 95), 2),
+        "p99": round(percentile(samples, 99), 2),
+    }
+
+
+def make_legacy_tools(base: str, api_key: str) -> dict:
+    """旧实现：每次调用新建同步 Client。"""
+    headers = {"X-API-Key": api_key}
+
+    def list_capabilities():
+        with httpx.Client(timeout=30.0) as client:
+            r = client.get(f"{base}/v1/capabilities", params={"limit": 20})
+            r.raise_for_status()
+            return r.json()
+
+    def create_inquiry(party_ids):
+        with httpx.Client(timeout=30.0) as client:
+            r = client.post(f"{base}/v1/sessions", json={"party_ids": party_ids}, headers=headers)
+            r.raise_for_status()
+            return r.json()
+
+    def send_message(session_id):
+        with httpx.Client(timeout=30.0) as client:
+            r = client.post(f"{base}/v1/sessions/{session_id}/messages", json={"payload": {"bench": 1}}, headers=headers)
+            r.raise_for_status()
+            return r.json()
+
+    return {"list_capabilities": list_capabilities, "create_inquiry": create_inquiry, "send_message": send_message}
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("base", nargs="?", default=os.environ.get("WYMYK_BASE_URL", "http://localhost:8000"))
+    ap.add_argument("--calls", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=10)
+    args = ap.parse_args()
+    base = args.base.rstrip("/")
+
+    async with httpx.AsyncClient(base_url=base, timeout=30.0) as c:
+        r = await c.post("/v1/agents/register", json={"name": "bench-mcp"})
+        r.raise_for_status()
+        me = r.json()
+        r = await c.post("/v1/agents/register", json={"name": "bench-mcp-peer"})
+        r.raise_for_status()
+        peer_id = r.json()["id"]
+
+    # mcp_server 在导入时读取环境变量
+    os.environ["WYMYK_BASE_URL"] = base
+    os.environ["WYMYK_API_KEY"] = me["api_key"]
+    import mcp_server
+
+    legacy = make_legacy_tools(base, me["api_key"])
+    session_id = legacy["create_inquiry"]([peer_id])["id"]
+    pooled = {
+        "list_capabilities": lambda: mcp_server.wymyk_list_capabilities(limit=20),
+        "create_inquiry": lambda: mcp_server.wymyk_create_inquiry([peer_id]),
+        "send_message": lambda: mcp_server.wymyk_send_message(session_id, {"bench": 1}),
+    }
+    legacy_calls = {
+        "list_capabilities": legacy["list_capabilities"],
+        "create_inquiry": lambda: legacy["create_inquiry"]([peer_id]),
+        "send_message": lambda: legacy["send_message"](session_id),
+    }
+
+    report: dict = {"calls": args.calls, "concurrency": args.concurrency, "before": {}, "after": {}}
+    for tool in pooled:
+        samples = []
+        for _ in range(args.calls):
+            t0 = time.perf_counter()
+            legacy_calls[tool]()
+            samples.append((time.perf_counter() - t0) * 1000)
+        report["before"][tool] = summarize(samples)
+
+        await pooled[tool]()  # 预热连接池
+        samples = []
+        for _ in range(args.calls):
+            t0 = time.perf_counter()
+            await pooled[tool]()
+            samples.append((time.perf_counter() - t0) * 1000)
+        report["after"][tool] = summarize(samples)
+
+    # 并发吞吐：旧实现的同步调用放进线程池，新实现直接并发协程
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def run_legacy():
+        async with sem:
+            await asyncio.to_thread(legacy_calls["list_capabilities"])
+
+    async def run_pooled():
+        async with sem:
+            await pooled["list_capabilities"]()
+
+    for label, fn in (("before", run_legacy), ("after", run_pooled)):
+        t0 = time.perf_counter()
+        await asyncio.gather(*(fn() for _ in range(args.calls)))
+        report[label]["concurrent_list_capabilities_rps"] = round(args.calls / (time.perf_counter() - t0), 1)
+
+    await mcp_server.close_client()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
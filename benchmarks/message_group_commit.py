@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+消息写入吞吐基准：逐条提交（当前 send_message 的写入路径）对比组提交（app/group_commit.py）。
+
+直连数据库（读取 DATABASE_URL，与服务相同；需已建表），在同一进程内以 C 个并发写入方各写入消息：
+- per_request：每条消息一个事务（add + flush + 事件 + commit），同 MESSAGE_GROUP_COMMIT 关闭时；
+- group_commit：经 GroupCommitWriter 入队，按批提交，同 MESSAGE_GROUP_COMMIT 开启时。
+
+    python benchmarks/message_group_commit.py --messages 5000 --concurrency 1 16 64 256
+
+输出 JSON：每种模式、每个并发度下的吞吐（条/秒）、单条写入延迟 p50/p95/p99（毫秒）与事务数。
+提交延迟越高（如 synchronous_commit=on 且磁盘 fsync 较慢、跨机房数据库），组提交的收益越明显。
+"""
+import argparse
+import asyncio
+import json
+import secrets
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import group_commit  # noqa: E402
+from app.db import AsyncSessionLocal, commit, engine  # noqa: E402
+from app.events import emit_message_created  # noqa: E402
+from app.models import Message  # noqa: E402
+from app.partitions import ensure_partitions  # noqa: E402
+from app.session_participants import add_session  # noqa: E402
+
+BENCH_AGENT = "bench-group-commit"
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))]
+
+
+def new_message(session_id: str, i: int) -> Message:
+    return Message(
+        id=f"msg_{secrets.token_hex(12)}",
+        session_id=session_id,
+        sender=BENCH_AGENT,
+        payload={"intent": "offer", "price": i, "note": "benchmark"},
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+async def send_per_request(session_id: str, i: int) -> None:
+    async with AsyncSessionLocal() as db:
+        msg = new_message(session_id, i)
+        db.add(msg)
+        await db.flush()
+        emit_message_created(db, msg)
+        await commit(db)
+
+
+async def send_group_commit(session_id: str, i: int) -> None:
+    await group_commit.message_writer.write([new_message(session_id, i)])
+
+
+async def run(mode: str, session_id: str, messages: int, concurrency: int) -> dict:
+    send = send_per_request if mode == "per_request" else send_group_commit
+    latencies: list[float] = []
+    transactions = 0
+    counter = iter(range(messages))
+
+    if mode == "group_commit":
+        # 统计批次数（= 事务数）
+        original = group_commit._insert
+
+        async def counting_insert(msgs):
+            nonlocal transactions
+            transactions += 1
+            await original(msgs)
+
+        group_commit._insert = counting_insert
+        group_commit.message_writer.start()
+
+    async def worker():
+        for i in counter:
+            t0 = time.perf_counter()
+            await send(session_id, i)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    if mode == "group_commit":
+        await group_commit.message_writer.stop()
+        group_commit._insert = original
+    else:
+        transactions = messages
+    return {
+        "throughput_per_s": round(messages / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "transactions": transactions,
+    }
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=5000, help="每轮写入条数")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    ap.add_argument("--max-rows", type=int, default=group_commit.message_writer.max_rows)
+    ap.add_argument("--max-delay-ms", type=float, default=group_commit.message_writer.max_delay * 1000)
+    args = ap.parse_args()
+    group_commit.message_writer.max_rows = args.max_rows
+    group_commit.message_writer.max_delay = args.max_delay_ms / 1000
+
+    async with engine.begin() as conn:
+        await ensure_partitions(conn, 1)
+    async with AsyncSessionLocal() as db:
+        sess = add_session(db, [BENCH_AGENT])
+        await db.commit()
+
+    report: dict = {
+        "messages": args.messages,
+        "max_rows": args.max_rows,
+        "max_delay_ms": args.max_delay_ms,
+        "pool_size": engine.pool.size(),
+        "results": {},
+    }
+    for c in args.concurrency:
+        report["results"][str(c)] = {
+            mode: await run(mode, sess.id, args.messages, c) for mode in ("per_request", "group_commit")
+        }
+    await engine.dispose()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+全文检索基准：向数据库灌入合成中文帖子语料（默认 100 万条），再经 GET /v1/search 测量不同选择度查询的延迟。
+
+语料按 Zipf 分布从合成词表取词，检索向量用与服务相同的分词规则（app/search.py）生成。
+灌数据直连数据库（读取 DATABASE_URL，与服务相同），语料挂在名为 bench-search 的 agent 下，已存在足够条数时跳过。
+先启动服务（uvicorn app.main:app --port 8000），再运行：
+    python benchmarks/search_corpus.py http://localhost:8000 --posts 1000000 --requests 50
+
+输出 JSON：每个查询的命中数、首页与翻页的 p50/p95/p99（毫秒）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from pathlib import Path
+
+import asyncpg
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.db import asyncpg_dsn  # noqa: E402
+from app.search import query_terms, tsquery_literal, vector_literal  # noqa: E402
+
+BENCH_AGENT = "bench-search"
+VOCAB_SIZE = 20000
+CHUNK = 20000
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "p50": round(percentile(samples, 50), 2),
+        "p95": round(percentile(samples, 95), 2),
+        "p99": round(percentile(samples, 99), 2),
+    }
+
+
+def make_vocab(rng: random.Random) -> list[str]:
+    """合成 2~3 字的中文词；词表下标即 Zipf 排名（0 最常见）。"""
+    chars = [chr(c) for c in rng.sample(range(0x4E00, 0x9FA5), 3000)]
+    words: dict[str, None] = {}
+    while len(words) < VOCAB_SIZE:
+        words["".join(rng.choices(chars, k=rng.choice((2, 2, 3))))] = None
+    return list(words)
+
+
+def make_posts(rng: random.Random, vocab: list[str], n: int, agent_id: str):
+    cum_weights = list(accumulate(1 / (i + 1) for i in range(len(vocab))))
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(22, 64))
+        title = "".join(words[:rng.randint(2, 4)])
+        content = "，".join("".join(words[j:j + 6]) for j in range(4, len(words), 6)) + "。"
+        vector = vector_literal([(title, "A"), (content, "B")])
+        yield (f"post_{secrets.token_hex(12)}", agent_id, title, content, start + timedelta(seconds=i), vector)
+
+
+async def seed(dsn: str, n: int, seed_value: int) -> list[str]:
+    rng = random.Random(seed_value)
+    vocab = make_vocab(rng)
+    conn = await asyncpg.connect(dsn)
+    try:
+        agent_id = await conn.fetchval("SELECT id FROM agents WHERE name = $1", BENCH_AGENT)
+        if agent_id is None:
+            agent_id = f"agent_{secrets.token_hex(12)}"
+            await conn.execute(
+                "INSERT INTO agents (id, did, name, type, api_key_hash, created_at)"
+                " VALUES ($1, $2, $3, 'other', $4, now())",
+                agent_id, f"did:wymyk:agent:{agent_id}", BENCH_AGENT, secrets.token_hex(32),
+            )
+        have = await conn.fetchval("SELECT count(*) FROM posts WHERE author_agent_id = $1", agent_id)
+        if have >= n:
+            return vocab
+        print(f"seeding {n - have} posts ...", file=sys.stderr)
+        t0 = time.perf_counter()
+        await conn.execute(
+            "CREATE TEMP TABLE bench_posts (id text, author_agent_id text, title text, content text,"
+            " created_at timestamptz, search_vector text)"
+        )
+        batch = []
+        for row in make_posts(rng, vocab, n - have, agent_id):
+            batch.append(row)
+            if len(batch) == CHUNK:
+                await conn.copy_records_to_table("bench_posts", records=batch)
+                batch.clear()
+        if batch:
+            await conn.copy_records_to_table("bench_posts", records=batch)
+        await conn.execute(
+            "INSERT INTO posts (id, author_agent_id, title, content, kind, created_at, search_vector)"
+            " SELECT id, author_agent_id, title, content, 'discussion', created_at, search_vector::tsvector"
+            " FROM bench_posts"
+        )
+        await conn.execute("ANALYZE posts")
+        print(f"seeded in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        return vocab
+    finally:
+        await conn.close()
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("base", nargs="?", default=os.environ.get("WYMYK_BASE_URL", "http://localhost:8000"))
+    ap.add_argument("--posts", type=int, default=1_000_000)
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    vocab = await seed(asyncpg_dsn, args.posts, args.seed)
+    # 选择度从高到低：常见词、中频词、罕见词、两词 AND、单字前缀
+    queries = {
+        "common": vocab[0],
+        "mid": vocab[200],
+        "rare": vocab[VOCAB_SIZE - 1],
+        "two_terms": f"{vocab[5]} {vocab[50]}",
+        "single_char": vocab[1000][0],
+    }
+
+    report: dict = {"posts": args.posts, "requests": args.requests, "queries": {}}
+    async with httpx.AsyncClient(base_url=args.base.rstrip("/"), timeout=120.0) as c:
+        r = await c.post("/v1/agents/register", json={"name": "bench-search-client"})
+        r.raise_for_status()
+        headers = {"X-API-Key": r.json()["api_key"]}
+        for label, q in queries.items():
+            first, paged, cursor = [], [], None
+            for _ in range(args.requests):
+                t0 = time.perf_counter()
+                r = await c.get("/v1/search", params={"q": q, "types": "post", "limit": 20}, headers=headers)
+                first.append((time.perf_counter() - t0) * 1000)
+                r.raise_for_status()
+                cursor = r.json()["next_cursor"]
+            # 沿游标连续翻页
+            for _ in range(args.requests if cursor else 0):
+                t0 = time.perf_counter()
+                r = await c.get(
+                    "/v1/search", params={"q": q, "types": "post", "limit": 20, "cursor": cursor}, headers=headers,
+                )
+                paged.append((time.perf_counter() - t0) * 1000)
+                r.raise_for_status()
+                cursor = r.json()["next_cursor"]
+                if not cursor:
+                    break
+            report["queries"][label] = {"q": q, "first_page_ms": summarize(first), "next_pages_ms": summarize(paged)}
+
+    conn = await asyncpg.connect(asyncpg_dsn)
+    try:
+        for label, entry in report["queries"].items():
+            # 命中数：直接以同样的 tsquery 统计
+            tsq = tsquery_literal(query_terms(entry["q"]))
+            entry["hits"] = await conn.fetchval("SELECT count(*) FROM posts WHERE search_vector @@ $1::tsquery", tsq)
+    finally:
+        await conn.close()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,11 +11,17 @@ def main():
         params["type"] = sys.argv[2]
     if len(sys.argv) > 3:
         params["domain"] = sys.argv[3]
-    r = httpx.get(f"{BASE}/v1/capabilities", params=params or None, timeout=30.0)
-    r.raise_for_status()
-    data = r.json()
-    print(f"共 {len(data)} 条能力")
-    for cap in data:
+    caps = []
+    while True:
+        r = httpx.get(f"{BASE}/v1/capabilities", params=params, timeout=30.0)
+        r.raise_for_status()
+        data = r.json()
+        caps.extend(data["items"])
+        if not data["next_cursor"]:
+            break
+        params["cursor"] = data["next_cursor"]
+    print(f"共 {len(caps)} 条能力")
+    for cap in caps:
         print(f"  - agent_id={cap.get('agent_id')} type={cap.get('type')} domains={cap.get('domains')} price={cap.get('price')}")
 
 if __name__ == "__main__":
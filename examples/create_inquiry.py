@@ -22,9 +22,9 @@ def main():
     headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
 
     # 2. 查能力目录
-    r = httpx.get(f"{BASE}/v1/capabilities", timeout=30.0)
+    r = httpx.get(f"{BASE}/v1/capabilities", params={"limit": 1}, timeout=30.0)
     r.raise_for_status()
-    caps = r.json()
+    caps = r.json()["items"]
     if not caps:
         print("能力目录为空，请先由出版社 Agent 注册能力。")
         return
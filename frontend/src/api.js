@@ -40,8 +40,28 @@ async function request(path, options = {}) {
   return res.json();
 }
 
+function withCursor(path, cursor) {
+  if (!cursor) return path;
+  const sep = path.includes('?') ? '&' : '?';
+  return `${path}${sep}cursor=${encodeURIComponent(cursor)}`;
+}
+
+// 游标分页列表：逐页请求直到 next_cursor 为空，返回全部 items
+async function getAll(path) {
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await request(withCursor(path, cursor), { method: 'GET' });
+    items.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
+}
+
 export const api = {
   get: (path) => request(path, { method: 'GET' }),
+  getPage: (path, cursor) => request(withCursor(path, cursor), { method: 'GET' }),
+  getAll,
   post: (path, body) => request(path, { method: 'POST', body: body ? JSON.stringify(body) : undefined }),
   patch: (path, body) => request(path, { method: 'PATCH', body: body ? JSON.stringify(body) : undefined }),
   delete: (path) => request(path, { method: 'DELETE' }),
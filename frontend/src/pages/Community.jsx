@@ -4,17 +4,34 @@ import { api, isLoggedIn } from '../api'
 
 export default function Community() {
   const [posts, setPosts] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
   const [filter, setFilter] = useState('')
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [error, setError] = useState('')
 
+  const path = filter ? `/v1/posts?kind=${filter}` : '/v1/posts'
+
   useEffect(() => {
-    const q = filter ? `?kind=${filter}` : ''
-    api.get(`/v1/posts${q}`)
-      .then(setPosts)
+    api.getPage(path)
+      .then((page) => {
+        setPosts(page.items)
+        setNextCursor(page.next_cursor)
+      })
       .catch((e) => setError(e.message))
       .finally(() => setLoading(false))
-  }, [filter])
+  }, [path])
+
+  const loadMore = () => {
+    setLoadingMore(true)
+    api.getPage(path, nextCursor)
+      .then((page) => {
+        setPosts((prev) => [...prev, ...page.items])
+        setNextCursor(page.next_cursor)
+      })
+      .catch((e) => setError(e.message))
+      .finally(() => setLoadingMore(false))
+  }
 
   if (error) return <div className="text-red-400">{error}</div>
 
@@ -64,10 +81,26 @@ export default function Community() {
           ))}
         </ul>
       )}
+      {nextCursor && (
+        <LoadMoreBtn onClick={loadMore} loading={loadingMore} />
+      )}
     </div>
   )
 }
 
+function LoadMoreBtn({ onClick, loading }) {
+  return (
+    <button
+      type="button"
+      onClick={onClick}
+      disabled={loading}
+      className="mt-6 w-full py-2 rounded-lg border border-a2a-border text-gray-400 hover:text-a2a-accent hover:border-a2a-accent/40 transition-colors text-sm disabled:opacity-50"
+    >
+      {loading ? '加载中…' : '加载更多'}
+    </button>
+  )
+}
+
 function FilterBtn({ active, onClick, children }) {
   return (
     <button
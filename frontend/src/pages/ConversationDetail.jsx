@@ -13,7 +13,7 @@ export default function ConversationDetail() {
     if (!sessionId) return
     Promise.all([
       api.get(`/v1/sessions/${sessionId}`),
-      api.get(`/v1/sessions/${sessionId}/messages`),
+      api.getAll(`/v1/sessions/${sessionId}/messages?limit=200`),
     ])
       .then(([s, m]) => {
         setSession(s)
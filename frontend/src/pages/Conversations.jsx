@@ -4,16 +4,32 @@ import { api } from '../api'
 
 export default function Conversations() {
   const [sessions, setSessions] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [error, setError] = useState('')
 
   useEffect(() => {
-    api.get('/v1/sessions')
-      .then(setSessions)
+    api.getPage('/v1/sessions')
+      .then((page) => {
+        setSessions(page.items)
+        setNextCursor(page.next_cursor)
+      })
       .catch((e) => setError(e.message))
       .finally(() => setLoading(false))
   }, [])
 
+  const loadMore = () => {
+    setLoadingMore(true)
+    api.getPage('/v1/sessions', nextCursor)
+      .then((page) => {
+        setSessions((prev) => [...prev, ...page.items])
+        setNextCursor(page.next_cursor)
+      })
+      .catch((e) => setError(e.message))
+      .finally(() => setLoadingMore(false))
+  }
+
   if (error) return <div className="text-red-400">{error}</div>
 
   return (
@@ -49,6 +65,16 @@ export default function Conversations() {
           ))}
         </ul>
       )}
+      {nextCursor && (
+        <button
+          type="button"
+          onClick={loadMore}
+          disabled={loadingMore}
+          className="mt-6 w-full py-2 rounded-lg border border-a2a-border text-gray-400 hover:text-a2a-accent hover:border-a2a-accent/40 transition-colors text-sm disabled:opacity-50"
+        >
+          {loadingMore ? '加载中…' : '加载更多'}
+        </button>
+      )}
     </div>
   )
 }
@@ -1,45 +1,191 @@
 """
 WYMYK 平台 MCP Server：暴露 list_capabilities、create_inquiry、send_message 工具，
 供 OpenClaw、Claude Desktop 等 MCP 客户端调用。需先启动主服务 (uvicorn app.main:app)。
-依赖: pip install fastmcp httpx
+依赖: pip install fastmcp "httpx[http2]"
+
+所有工具共用一个 httpx.AsyncClient（连接池 + keep-alive，HTTPS 下启用 HTTP/2，MCP 服务退出时关闭），
+工具为异步函数，不阻塞 MCP 事件循环。超时与重试次数可由环境变量配置：
+- WYMYK_TIMEOUT（默认 30 秒）、WYMYK_CONNECT_TIMEOUT（默认 5 秒）
+- WYMYK_MAX_RETRIES（默认 2）、WYMYK_MAX_CONNECTIONS（默认 20）
+
+内嵌模式（WYMYK_EMBEDDED=1）：与主服务部署在同一主机时，直接导入 app.main:app，
+经进程内 ASGI transport 调用，鉴权与校验逻辑不变，但没有 socket 与 HTTP 解析开销。
+此模式需能连上主服务的数据库（同一 DATABASE_URL）；WYMYK_BASE_URL 指向远程主机时自动退回 HTTP。
 """
 from __future__ import annotations
 
+import asyncio
+import importlib.util
+import logging
 import os
+import random
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator
+from urllib.parse import urlparse
+
 import httpx
 from fastmcp import FastMCP
 
 BASE_URL = os.environ.get("WYMYK_BASE_URL", "http://localhost:8000")
 API_KEY = os.environ.get("WYMYK_API_KEY", "")
 
+TIMEOUT = float(os.environ.get("WYMYK_TIMEOUT", "30"))
+CONNECT_TIMEOUT = float(os.environ.get("WYMYK_CONNECT_TIMEOUT", "5"))
+MAX_RETRIES = int(os.environ.get("WYMYK_MAX_RETRIES", "2"))
+MAX_CONNECTIONS = int(os.environ.get("WYMYK_MAX_CONNECTIONS", "20"))
+RETRY_BACKOFF = 0.2
+EMBEDDED = os.environ.get("WYMYK_EMBEDDED", "").lower() in ("1", "true", "yes")
+
+_LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0"}
+
+logger = logging.getLogger(__name__)
+
+# 请求未发出的连接类错误：任何方法都可安全重试
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# 幂等方法额外在读超时、断连与 5xx 时重试；POST 可能已写入，不在这些情况下重试以免重复创建
+_IDEMPOTENT = {"GET", "HEAD", "OPTIONS"}
+
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP) -> AsyncIterator[dict]:
+    """MCP 服务退出时关闭共享的 AsyncClient；内嵌模式下启动时即进入、退出时退出主服务 lifespan
+    （消息组提交缓冲落库、LISTEN 连接关闭、engine.dispose）。"""
+    if use_embedded():
+        await get_client()
+    try:
+        yield {}
+    finally:
+        await close_client()
+
+
 mcp = FastMCP(
     "WYMYK Agent 商业层",
     instructions="提供 WYMYK 平台能力发现与协商：查询能力目录、创建询价会话、发送消息。",
+    lifespan=_lifespan,
 )
 
+_client: httpx.AsyncClient | None = None
+_lock = asyncio.Lock()
+# 内嵌模式下持有主服务 lifespan（建表、索引构建、事件监听）
+_app_stack: AsyncExitStack | None = None
+
+
+def use_embedded() -> bool:
+    if not EMBEDDED:
+        return False
+    host = urlparse(BASE_URL).hostname
+    if host not in _LOCAL_HOSTS:
+        logger.warning("WYMYK_EMBEDDED ignored: WYMYK_BASE_URL points to remote host %s, using HTTP", host)
+        return False
+    return True
+
+
+async def _embedded_client() -> httpx.AsyncClient:
+    global _app_stack
+    from app.main import app
+
+    _app_stack = AsyncExitStack()
+    await _app_stack.enter_async_context(app.router.lifespan_context(app))
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://wymyk.embedded",
+        timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+    )
 
-@mcp.tool(name="wymyk_list_capabilities", description="查询 WYMYK 平台公开能力目录，可按类型或领域过滤。")
-def wymyk_list_capabilities(
+
+def _http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=BASE_URL,
+        # 需安装 h2；未安装时退回 HTTP/1.1 keep-alive
+        http2=importlib.util.find_spec("h2") is not None,
+        timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+    )
+
+
+async def get_client() -> httpx.AsyncClient:
+    """惰性创建进程内共享的 AsyncClient（内嵌模式下同时启动主服务 lifespan）。"""
+    global _client
+    if _client is None or _client.is_closed:
+        async with _lock:
+            if _client is None or _client.is_closed:
+                _client = await _embedded_client() if use_embedded() else _http_client()
+    return _client
+
+
+async def close_client() -> None:
+    global _client, _app_stack
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _app_stack is not None:
+        await _app_stack.aclose()
+        _app_stack = None
+
+
+def _should_retry(method: str, exc: Exception | None, response: httpx.Response | None) -> bool:
+    if exc is not None:
+        if isinstance(exc, _CONNECT_ERRORS):
+            return True
+        return method in _IDEMPOTENT and isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+    return method in _IDEMPOTENT and response is not None and response.status_code >= 500
+
+
+async def request(method: str, path: str, **kwargs) -> dict:
+    """发送请求并返回 JSON；可重试的失败按指数退避（带抖动）重试至多 MAX_RETRIES 次。"""
+    client = await get_client()
+    attempt = 0
+    while True:
+        exc: Exception | None = None
+        response: httpx.Response | None = None
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            exc = e
+        if attempt < MAX_RETRIES and _should_retry(method, exc, response):
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt * (1 + random.random()))
+            attempt += 1
+            continue
+        if exc is not None:
+            raise exc
+        response.raise_for_status()
+        return response.json()
+
+
+@mcp.tool(
+    name="wymyk_list_capabilities",
+    description=(
+        "查询 WYMYK 平台公开能力目录，可按类型或领域过滤（可传多个领域，domain_match 为 any 命中任一、all 全部包含）；"
+        "结果分页，用返回的 next_cursor 取下一页。"
+    ),
+)
+async def wymyk_list_capabilities(
     type: str | None = None,
-    domain: str | None = None,
-) -> list[dict]:
-    """无需 API Key。返回能力列表（agent_id、type、price、domains 等）。"""
+    domain: str | list[str] | None = None,
+    domain_match: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> dict:
+    """无需 API Key。返回 {"items": 能力列表（agent_id、type、price、domains 等）, "next_cursor": 下一页游标或 null}。"""
     params = {}
     if type:
         params["type"] = type
     if domain:
         params["domain"] = domain
-    with httpx.Client(timeout=30.0) as client:
-        r = client.get(f"{BASE_URL}/v1/capabilities", params=params or None)
-        r.raise_for_status()
-        return r.json()
+    if domain_match:
+        params["domain_match"] = domain_match
+    if cursor:
+        params["cursor"] = cursor
+    if limit:
+        params["limit"] = limit
+    return await request("GET", "/v1/capabilities", params=params or None)
 
 
 @mcp.tool(
     name="wymyk_create_inquiry",
     description="在 WYMYK 平台创建协商会话并可选发送首条询价消息。",
 )
-def wymyk_create_inquiry(
+async def wymyk_create_inquiry(
     party_ids: list[str],
     initial_message: dict | None = None,
     capability_type: str | None = None,
@@ -47,39 +193,35 @@ def wymyk_create_inquiry(
     """需要设置环境变量 WYMYK_API_KEY。party_ids 为参与方 agent id 列表。"""
     if not API_KEY:
         return {"error": "WYMYK_API_KEY not set"}
-    with httpx.Client(timeout=30.0) as client:
-        r = client.post(
-            f"{BASE_URL}/v1/sessions",
-            json={
-                "party_ids": party_ids,
-                "initial_message": initial_message,
-                "capability_type": capability_type,
-            },
-            headers={ "X-API-Key": API_KEY },
-        )
-        r.raise_for_status()
-        return r.json()
+    return await request(
+        "POST",
+        "/v1/sessions",
+        json={
+            "party_ids": party_ids,
+            "initial_message": initial_message,
+            "capability_type": capability_type,
+        },
+        headers={ "X-API-Key": API_KEY },
+    )
 
 
 @mcp.tool(
     name="wymyk_send_message",
     description="向已有 WYMYK 会话发送一条消息（询价、报价、确认等）。",
 )
-def wymyk_send_message(
+async def wymyk_send_message(
     session_id: str,
     payload: dict,
 ) -> dict:
     """需要设置环境变量 WYMYK_API_KEY。payload 为消息体（可含 A2A 或商业字段）。"""
     if not API_KEY:
         return {"error": "WYMYK_API_KEY not set"}
-    with httpx.Client(timeout=30.0) as client:
-        r = client.post(
-            f"{BASE_URL}/v1/sessions/{session_id}/messages",
-            json={"payload": payload},
-            headers={ "X-API-Key": API_KEY },
-        )
-        r.raise_for_status()
-        return r.json()
+    return await request(
+        "POST",
+        f"/v1/sessions/{session_id}/messages",
+        json={"payload": payload},
+        headers={ "X-API-Key": API_KEY },
+    )
 
 
 if __name__ == "__main__":
@@ -11,6 +11,8 @@ CREATE TABLE IF NOT EXISTS agents (
     created_at  TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS idx_agents_api_key_hash ON agents(api_key_hash);
+
 -- 能力注册表
 CREATE TABLE IF NOT EXISTS capabilities (
     id           VARCHAR(64) PRIMARY KEY,
@@ -24,6 +26,12 @@ CREATE TABLE IF NOT EXISTS capabilities (
 
 CREATE INDEX IF NOT EXISTS idx_capabilities_agent_id ON capabilities(agent_id);
 CREATE INDEX IF NOT EXISTS idx_capabilities_type ON capabilities(type);
+-- 游标分页 (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_capabilities_created_at_id ON capabilities(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_capabilities_type_created_at_id ON capabilities(type, created_at, id);
+-- 领域过滤：domains @> '["悬疑"]'；提高统计精度，使计划器能区分常见与罕见领域（罕见领域走 GIN，常见领域按时间倒序扫描）
+CREATE INDEX IF NOT EXISTS idx_capabilities_domains ON capabilities USING gin(domains jsonb_path_ops);
+ALTER TABLE capabilities ALTER COLUMN domains SET STATISTICS 1000;
 
 -- 协商会话表
 CREATE TABLE IF NOT EXISTS sessions (
@@ -34,6 +42,7 @@ CREATE TABLE IF NOT EXISTS sessions (
 );
 
 CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions(status);
+CREATE INDEX IF NOT EXISTS idx_sessions_created_at_id ON sessions(created_at, id);
 
 -- 会话消息表
 CREATE TABLE IF NOT EXISTS messages (
@@ -44,7 +53,7 @@ CREATE TABLE IF NOT EXISTS messages (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id);
+CREATE INDEX IF NOT EXISTS idx_messages_session_created_at_id ON messages(session_id, created_at, id);
 
 -- 意向/交易记录表
 CREATE TABLE IF NOT EXISTS deals (
@@ -69,3 +78,5 @@ CREATE TABLE IF NOT EXISTS posts (
 );
 CREATE INDEX IF NOT EXISTS idx_posts_author ON posts(author_agent_id);
 CREATE INDEX IF NOT EXISTS idx_posts_kind ON posts(kind);
+CREATE INDEX IF NOT EXISTS idx_posts_created_at_id ON posts(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_posts_kind_created_at_id ON posts(kind, created_at, id);
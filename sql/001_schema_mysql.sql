@@ -10,6 +10,8 @@ CREATE TABLE IF NOT EXISTS agents (
     created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX idx_agents_api_key_hash ON agents(api_key_hash);
+
 CREATE TABLE IF NOT EXISTS capabilities (
     id           VARCHAR(64) PRIMARY KEY,
     agent_id     VARCHAR(64) NOT NULL,
@@ -23,6 +25,10 @@ CREATE TABLE IF NOT EXISTS capabilities (
 
 CREATE INDEX idx_capabilities_agent_id ON capabilities(agent_id);
 CREATE INDEX idx_capabilities_type ON capabilities(type);
+CREATE INDEX idx_capabilities_created_at_id ON capabilities(created_at, id);
+CREATE INDEX idx_capabilities_type_created_at_id ON capabilities(type, created_at, id);
+-- 领域过滤：多值索引（MySQL 8.0.17+），供 JSON_CONTAINS / JSON_OVERLAPS / MEMBER OF 使用
+CREATE INDEX idx_capabilities_domains ON capabilities((CAST(domains AS CHAR(64) ARRAY)));
 
 CREATE TABLE IF NOT EXISTS sessions (
     id         VARCHAR(64) PRIMARY KEY,
@@ -32,6 +38,7 @@ CREATE TABLE IF NOT EXISTS sessions (
 );
 
 CREATE INDEX idx_sessions_status ON sessions(status);
+CREATE INDEX idx_sessions_created_at_id ON sessions(created_at, id);
 
 CREATE TABLE IF NOT EXISTS messages (
     id         VARCHAR(64) PRIMARY KEY,
@@ -43,6 +50,7 @@ CREATE TABLE IF NOT EXISTS messages (
 );
 
 CREATE INDEX idx_messages_session_id ON messages(session_id);
+CREATE INDEX idx_messages_session_created_at_id ON messages(session_id, created_at, id);
 
 CREATE TABLE IF NOT EXISTS deals (
     id         VARCHAR(64) PRIMARY KEY,
@@ -67,3 +75,5 @@ CREATE TABLE IF NOT EXISTS posts (
 );
 CREATE INDEX idx_posts_author ON posts(author_agent_id);
 CREATE INDEX idx_posts_kind ON posts(kind);
+CREATE INDEX idx_posts_created_at_id ON posts(created_at, id);
+CREATE INDEX idx_posts_kind_created_at_id ON posts(kind, created_at, id);
@@ -18,6 +18,7 @@ CREATE TABLE IF NOT EXISTS rfps (
 CREATE INDEX IF NOT EXISTS idx_rfps_creator ON rfps(creator_agent_id);
 CREATE INDEX IF NOT EXISTS idx_rfps_status ON rfps(status);
 CREATE INDEX IF NOT EXISTS idx_rfps_capability_type ON rfps(capability_type);
+CREATE INDEX IF NOT EXISTS idx_rfps_created_at_id ON rfps(created_at, id);
 
 -- 提案：供应方 Agent 针对某 RFP 提交
 CREATE TABLE IF NOT EXISTS proposals (
@@ -34,6 +35,7 @@ CREATE TABLE IF NOT EXISTS proposals (
 CREATE INDEX IF NOT EXISTS idx_proposals_rfp ON proposals(rfp_id);
 CREATE INDEX IF NOT EXISTS idx_proposals_supplier ON proposals(supplier_agent_id);
 CREATE UNIQUE INDEX IF NOT EXISTS idx_proposals_rfp_supplier ON proposals(rfp_id, supplier_agent_id);
+CREATE INDEX IF NOT EXISTS idx_proposals_rfp_created_at_id ON proposals(rfp_id, created_at, id);
 
 -- 可选：会话关联 RFP/提案，便于溯源
 -- ALTER TABLE sessions ADD COLUMN IF NOT EXISTS rfp_id VARCHAR(64) REFERENCES rfps(id) ON DELETE SET NULL;
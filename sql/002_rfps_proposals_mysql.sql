@@ -18,6 +18,7 @@ CREATE TABLE IF NOT EXISTS rfps (
 CREATE INDEX idx_rfps_creator ON rfps(creator_agent_id);
 CREATE INDEX idx_rfps_status ON rfps(status);
 CREATE INDEX idx_rfps_capability_type ON rfps(capability_type);
+CREATE INDEX idx_rfps_created_at_id ON rfps(created_at, id);
 
 CREATE TABLE IF NOT EXISTS proposals (
     id                  VARCHAR(64) PRIMARY KEY,
@@ -35,3 +36,4 @@ CREATE TABLE IF NOT EXISTS proposals (
 
 CREATE INDEX idx_proposals_rfp ON proposals(rfp_id);
 CREATE INDEX idx_proposals_supplier ON proposals(supplier_agent_id);
+CREATE INDEX idx_proposals_rfp_created_at_id ON proposals(rfp_id, created_at, id);
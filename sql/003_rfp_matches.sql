@@ -0,0 +1,24 @@
+-- RFP ↔ 供应方匹配关系（写时扇出），用于「匹配到我的 RFP」走索引查询
+-- 依赖 002_rfps_proposals.sql
+
+CREATE TABLE IF NOT EXISTS rfp_matches (
+    rfp_id      VARCHAR(64) NOT NULL REFERENCES rfps(id) ON DELETE CASCADE,
+    agent_id    VARCHAR(64) NOT NULL REFERENCES agents(id) ON DELETE CASCADE,
+    created_at  TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (rfp_id, agent_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rfp_matches_agent ON rfp_matches(agent_id, rfp_id);
+
+-- 回填现有数据（规则同 app/rfp_matches.py）
+INSERT INTO rfp_matches (rfp_id, agent_id, created_at)
+SELECT DISTINCT r.id, c.agent_id, now()
+FROM rfps r
+JOIN capabilities c ON c.type = r.capability_type
+WHERE c.agent_id <> r.creator_agent_id
+  AND CASE
+      WHEN jsonb_typeof(r.domain_filters) = 'array' AND jsonb_array_length(r.domain_filters) > 0
+      THEN c.domains ?| ARRAY(SELECT jsonb_array_elements_text(r.domain_filters))
+      ELSE true
+  END
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,24 @@
+-- RFP ↔ 供应方匹配关系（MySQL，需 8.0.17+ 的 JSON_OVERLAPS）
+-- 依赖 002_rfps_proposals_mysql.sql
+
+CREATE TABLE IF NOT EXISTS rfp_matches (
+    rfp_id      VARCHAR(64) NOT NULL,
+    agent_id    VARCHAR(64) NOT NULL,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (rfp_id, agent_id),
+    FOREIGN KEY (rfp_id) REFERENCES rfps(id) ON DELETE CASCADE,
+    FOREIGN KEY (agent_id) REFERENCES agents(id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_rfp_matches_agent ON rfp_matches(agent_id, rfp_id);
+
+INSERT IGNORE INTO rfp_matches (rfp_id, agent_id, created_at)
+SELECT DISTINCT r.id, c.agent_id, NOW()
+FROM rfps r
+JOIN capabilities c ON c.type = r.capability_type
+WHERE c.agent_id <> r.creator_agent_id
+  AND CASE
+    WHEN JSON_TYPE(r.domain_filters) = 'ARRAY' AND JSON_LENGTH(r.domain_filters) > 0
+    THEN JSON_OVERLAPS(c.domains, r.domain_filters)
+    ELSE TRUE
+  END;
@@ -0,0 +1,7 @@
+-- 表级变更计数（MySQL），公开 GET 接口据此生成 ETag（条件请求 / CDN 缓存）
+-- 计数由应用在写入 capabilities / posts / agents 的同一事务内递增
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    name     VARCHAR(64) PRIMARY KEY,
+    version  BIGINT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,8 @@
+-- 帖子与 RFP 全文检索：search_vector 由应用侧中文分词后写入（规则见 app/search.py），GIN 索引
+-- 依赖 001_schema.sql、002_rfps_proposals.sql；存量行的向量由服务启动后的后台任务分批补算
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE rfps ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE INDEX IF NOT EXISTS idx_posts_search ON posts USING gin(search_vector);
+CREATE INDEX IF NOT EXISTS idx_rfps_search ON rfps USING gin(search_vector);
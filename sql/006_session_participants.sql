@@ -0,0 +1,21 @@
+-- 会话参与方（由 sessions.parties 展开），用于成员校验与「我的会话」走索引查询
+-- 依赖 001_schema.sql
+
+CREATE TABLE IF NOT EXISTS session_participants (
+    session_id  VARCHAR(64) NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    agent_id    VARCHAR(64) NOT NULL,
+    created_at  TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (session_id, agent_id)
+);
+
+-- 收件箱：agent_id 等值 + (created_at, session_id) 倒序翻页
+CREATE INDEX IF NOT EXISTS idx_session_participants_agent_created_at
+    ON session_participants(agent_id, created_at, session_id);
+
+-- 回填现有数据（created_at 取会话的 created_at，与会话列表游标一致）
+INSERT INTO session_participants (session_id, agent_id, created_at)
+SELECT DISTINCT s.id, p.agent_id, s.created_at
+FROM sessions s
+CROSS JOIN LATERAL jsonb_array_elements_text(s.parties) AS p(agent_id)
+WHERE jsonb_typeof(s.parties) = 'array'
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,17 @@
+-- 会话参与方（MySQL，回填需 8.0 的 JSON_TABLE）
+-- 依赖 001_schema_mysql.sql
+
+CREATE TABLE IF NOT EXISTS session_participants (
+    session_id  VARCHAR(64) NOT NULL,
+    agent_id    VARCHAR(64) NOT NULL,
+    created_at  TIMESTAMP NOT NULL,
+    PRIMARY KEY (session_id, agent_id),
+    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_session_participants_agent_created_at ON session_participants(agent_id, created_at, session_id);
+
+INSERT IGNORE INTO session_participants (session_id, agent_id, created_at)
+SELECT DISTINCT s.id, p.agent_id, s.created_at
+FROM sessions s
+JOIN JSON_TABLE(s.parties, '$[*]' COLUMNS (agent_id VARCHAR(64) PATH '$')) AS p;
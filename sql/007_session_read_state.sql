@@ -0,0 +1,3 @@
+-- 会话已读位置（未读数统计用），依赖 006_session_participants.sql
+ALTER TABLE session_participants ADD COLUMN IF NOT EXISTS last_read_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE session_participants ADD COLUMN IF NOT EXISTS last_read_id VARCHAR(64);
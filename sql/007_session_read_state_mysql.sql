@@ -0,0 +1,3 @@
+-- 会话已读位置（MySQL），依赖 006_session_participants_mysql.sql
+ALTER TABLE session_participants ADD COLUMN last_read_at TIMESTAMP NULL;
+ALTER TABLE session_participants ADD COLUMN last_read_id VARCHAR(64) NULL;
@@ -0,0 +1,4 @@
+-- 消息按 (session_id, created_at, id) 游标分页 / 增量拉取
+-- 复合索引已覆盖按 session_id 的等值查询，单列索引冗余，删除以减少写入开销
+CREATE INDEX IF NOT EXISTS idx_messages_session_created_at_id ON messages(session_id, created_at, id);
+DROP INDEX IF EXISTS idx_messages_session_id;
@@ -0,0 +1,54 @@
+-- messages 改为按 created_at 按月分区（PostgreSQL 12+），并新建归档清单表；依赖 001 ~ 008
+-- 在维护窗口执行：旧表数据整体复制进分区表，期间应停止写入。已是分区表时跳过。
+-- 之后由 python -m app.partitions ensure（cron 每天）预建未来分区，archive 导出并摘除旧分区。
+
+CREATE TABLE IF NOT EXISTS message_archives (
+    partition   VARCHAR(64) PRIMARY KEY,
+    range_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    range_end   TIMESTAMP WITH TIME ZONE NOT NULL,
+    path        VARCHAR(512) NOT NULL,
+    row_count   BIGINT NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+DO $$
+DECLARE
+    m timestamptz;
+    last_month timestamptz;
+BEGIN
+    -- 月份边界与加减按 UTC 计算
+    PERFORM set_config('TimeZone', 'UTC', true);
+    last_month := date_trunc('month', now()) + interval '3 months';
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'messages'::regclass) THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE messages RENAME TO messages_unpartitioned;
+    ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey;
+    ALTER INDEX idx_messages_session_created_at_id RENAME TO idx_messages_unpartitioned_session_created_at_id;
+
+    -- 分区表的主键必须包含分区键
+    CREATE TABLE messages (
+        id         VARCHAR(64) NOT NULL,
+        session_id VARCHAR(64) NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+        sender     VARCHAR(64) NOT NULL,
+        payload    JSONB NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE INDEX idx_messages_session_created_at_id ON messages(session_id, created_at, id);
+
+    -- 分区命名与范围同 app/partitions.py：messages_pYYYYMM，[UTC 当月 1 日, 次月 1 日)
+    m := date_trunc('month', COALESCE((SELECT min(created_at) FROM messages_unpartitioned), now()));
+    WHILE m <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+            'messages_p' || to_char(m, 'YYYYMM'), m, m + interval '1 month'
+        );
+        m := m + interval '1 month';
+    END LOOP;
+
+    INSERT INTO messages (id, session_id, sender, payload, created_at)
+    SELECT id, session_id, sender, payload, COALESCE(created_at, now()) FROM messages_unpartitioned;
+    DROP TABLE messages_unpartitioned;
+END $$;
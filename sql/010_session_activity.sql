@@ -0,0 +1,19 @@
+-- 会话最后活动（收件箱按最近活动排序），依赖 007_session_read_state.sql、009_messages_partitioning.sql
+ALTER TABLE session_participants ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE session_participants ADD COLUMN IF NOT EXISTS last_message_id VARCHAR(64);
+
+-- 回填：各会话最新一条消息，无消息时取会话创建时间
+UPDATE session_participants p
+SET last_activity_at = m.created_at, last_message_id = m.id
+FROM (
+    SELECT DISTINCT ON (session_id) session_id, created_at, id
+    FROM messages
+    ORDER BY session_id, created_at DESC, id DESC
+) m
+WHERE m.session_id = p.session_id;
+UPDATE session_participants SET last_activity_at = created_at WHERE last_activity_at IS NULL;
+ALTER TABLE session_participants ALTER COLUMN last_activity_at SET NOT NULL;
+
+-- 收件箱：agent_id 等值 + (last_activity_at, session_id) 倒序翻页
+CREATE INDEX IF NOT EXISTS idx_session_participants_agent_activity
+    ON session_participants(agent_id, last_activity_at, session_id);
@@ -0,0 +1,20 @@
+-- 会话最后活动（MySQL 8.0+），依赖 007_session_read_state_mysql.sql
+ALTER TABLE session_participants ADD COLUMN last_activity_at TIMESTAMP NULL;
+ALTER TABLE session_participants ADD COLUMN last_message_id VARCHAR(64) NULL;
+
+-- 回填：各会话最新一条消息，无消息时取会话创建时间
+UPDATE session_participants p
+JOIN (
+    SELECT session_id, created_at, id
+    FROM (
+        SELECT session_id, created_at, id,
+               ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY created_at DESC, id DESC) AS rn
+        FROM messages
+    ) ranked
+    WHERE rn = 1
+) m ON m.session_id = p.session_id
+SET p.last_activity_at = m.created_at, p.last_message_id = m.id;
+UPDATE session_participants SET last_activity_at = created_at WHERE last_activity_at IS NULL;
+ALTER TABLE session_participants MODIFY last_activity_at TIMESTAMP NOT NULL;
+
+CREATE INDEX idx_session_participants_agent_activity ON session_participants(agent_id, last_activity_at, session_id);
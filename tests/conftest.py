@@ -0,0 +1,101 @@
+"""
+pytest 配置：
+
+    pip install pytest
+    python -m pytest -q
+
+不依赖数据库的测试直接运行。需要 PostgreSQL 的测试使用 pg 标记：设置 TEST_DATABASE_URL（与 DATABASE_URL 格式相同，
+指向任一可建库的服务器）时，在该服务器上新建一个临时数据库（wymyk_test_*）运行，结束后删除；未设置时跳过。
+应用模块在导入时读取配置，故临时库须在导入 app 之前创建，由本文件在收集测试前完成。
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import secrets
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "")
+_test_db: str | None = None
+
+
+def _with_database(url: str, name: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(path=f"/{name}"))
+
+
+def _admin_dsn(url: str) -> str:
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def _admin(sql: str) -> None:
+    import asyncpg
+
+    conn = await asyncpg.connect(_admin_dsn(TEST_DATABASE_URL))
+    try:
+        await conn.execute(sql)
+    finally:
+        await conn.close()
+
+
+if TEST_DATABASE_URL:
+    _test_db = f"wymyk_test_{secrets.token_hex(4)}"
+    asyncio.run(_admin(f'CREATE DATABASE "{_test_db}"'))
+    os.environ["DATABASE_URL"] = _with_database(TEST_DATABASE_URL, _test_db)
+    os.environ.pop("DATABASE_READ_URLS", None)
+else:
+    # 未配置临时库时不连接任何数据库，避免误写 .env 中的库
+    os.environ["DATABASE_URL"] = "postgresql+asyncpg://wymyk-test@127.0.0.1:1/unused"
+os.environ["QUERY_BUDGET"] = "raise"
+os.environ["ADMIN_API_KEY"] = f"test-{secrets.token_hex(8)}"
+
+
+def pytest_configure(config) -> None:
+    config.addinivalue_line("markers", "pg: 需要 PostgreSQL（TEST_DATABASE_URL），未设置时跳过")
+
+
+def pytest_collection_modifyitems(config, items) -> None:
+    if TEST_DATABASE_URL:
+        return
+    skip = pytest.mark.skip(reason="TEST_DATABASE_URL not set")
+    for item in items:
+        if "pg" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_unconfigure(config) -> None:
+    if _test_db is not None:
+        asyncio.run(_admin(f'DROP DATABASE IF EXISTS "{_test_db}" WITH (FORCE)'))
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def app_client(anyio_backend):
+    """在临时库上启动应用（lifespan 建表），返回进程内 ASGI 客户端。"""
+    import httpx
+
+    from app.main import app, lifespan
+
+    async with lifespan(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+
+
+@pytest.fixture
+async def db(app_client):
+    """临时库上的 Session（测试结束回滚未提交的部分）。"""
+    from app.db import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        yield session
+        await session.rollback()
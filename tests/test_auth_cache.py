@@ -0,0 +1,80 @@
+"""AuthCache：TTL / 负缓存与查库期间的失效（见 app/auth.py）。"""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from app.auth import AgentSnapshot, AuthCache, get_agent_by_api_key, hash_api_key
+import app.auth as auth
+
+
+def _snapshot(agent_id: str = "agent_1") -> AgentSnapshot:
+    return AgentSnapshot(id=agent_id, did=f"did:wymyk:{agent_id}", name="a", type="agent", created_at=datetime(2024, 1, 1))
+
+
+def _cache() -> AuthCache:
+    return AuthCache(size=10, ttl=300, negative_size=10, negative_ttl=30)
+
+
+def test_put_get_and_negative_entry():
+    cache = _cache()
+    assert cache.get("h1") == (False, None)
+    cache.put("h1", _snapshot())
+    assert cache.get("h1") == (True, _snapshot())
+    cache.put("bad", None)
+    assert cache.get("bad") == (True, None)
+    assert cache.stats()["misses"] == 1
+
+
+def test_invalidate_agent_drops_snapshot():
+    cache = _cache()
+    cache.put("h1", _snapshot())
+    cache.invalidate_agent("agent_1")
+    assert cache.get("h1") == (False, None)
+
+
+def test_put_after_concurrent_invalidation_is_dropped():
+    cache = _cache()
+    generation = cache.generation
+    # 查库进行中：轮换提交，两次失效均已执行
+    cache.invalidate_agent("agent_1")
+    cache.invalidate_key_hash("h_old")
+    cache.put("h_old", _snapshot(), generation)
+    assert cache.get("h_old") == (False, None)
+
+
+def test_put_without_interleaved_invalidation_is_kept():
+    cache = _cache()
+    generation = cache.generation
+    cache.put("h1", _snapshot(), generation)
+    assert cache.get("h1") == (True, _snapshot())
+
+
+class _Result:
+    def __init__(self, agent) -> None:
+        self.agent = agent
+
+    def scalar_one_or_none(self):
+        return self.agent
+
+
+class _RotatingDb:
+    """模拟查库期间另一请求的 Key 轮换提交：execute 返回轮换前的行，但期间缓存已被失效。"""
+
+    def __init__(self, agent) -> None:
+        self.agent = agent
+
+    async def execute(self, statement):
+        auth.auth_cache.invalidate_agent(self.agent.id)
+        return _Result(self.agent)
+
+
+@pytest.mark.anyio
+async def test_miss_racing_rotation_does_not_recache_old_key(monkeypatch):
+    monkeypatch.setattr(auth, "auth_cache", _cache())
+    old = type("Row", (), {"id": "agent_1", "did": "did:x", "name": "a", "type": "agent", "created_at": datetime(2024, 1, 1)})()
+    snapshot = await get_agent_by_api_key(_RotatingDb(old), "sk_old")
+    # 本次请求仍按查到的行放行，但旧 Key 不进入缓存，下一次请求会重新查库
+    assert snapshot is not None
+    assert auth.auth_cache.get(hash_api_key("sk_old")) == (False, None)
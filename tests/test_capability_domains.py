@@ -0,0 +1,113 @@
+"""
+能力领域过滤：normalize_domains 的归一化，以及 GET /v1/capabilities 生成的领域过滤 SQL
+（domain_condition + keyset）的执行计划（pg）。
+
+执行计划检查在临时库的事务内灌入合成能力数据并 ANALYZE，对编译后的语句执行 EXPLAIN ANALYZE，
+确认选择性较高的领域过滤经 idx_capabilities_domains（GIN）取数而不是顺序扫描；结束时回滚。
+常见领域命中大量行时，按 (created_at, id) 倒序扫描再过滤更快，计划器选择该路径属正常，不作断言。
+"""
+from __future__ import annotations
+
+import json
+import random
+import secrets
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+import pytest
+from sqlalchemy import select
+
+from app.routers.capabilities import MAX_DOMAINS, normalize_domains
+
+INDEX = "idx_capabilities_domains"
+CAPABILITIES = 100_000
+DOMAINS = [f"领域{i:03d}" for i in range(300)]
+TYPES = [f"type_{i}" for i in range(10)]
+
+
+def test_normalize_domains_strips_blanks_and_duplicates():
+    assert normalize_domains([" 悬疑 ", "", "科幻", "悬疑", "  ", None]) == ["悬疑", "科幻"]
+    assert normalize_domains(None) == []
+
+
+def test_normalize_domains_rejects_too_many():
+    normalize_domains([f"d{i}" for i in range(MAX_DOMAINS)])
+    with pytest.raises(ValueError):
+        normalize_domains([f"d{i}" for i in range(MAX_DOMAINS + 1)])
+
+
+def _rows(rng: random.Random, n: int, agent_id: str):
+    # 领域按 Zipf 分布：前几个领域很常见，靠后的领域只命中少量能力
+    cum_weights = list(accumulate(1 / (i + 1) for i in range(len(DOMAINS))))
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        domains = sorted(set(rng.choices(DOMAINS, cum_weights=cum_weights, k=rng.randint(1, 3))))
+        yield (
+            f"cap_{secrets.token_hex(12)}", agent_id, rng.choice(TYPES),
+            json.dumps(domains, ensure_ascii=False), start + timedelta(seconds=i),
+        )
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+
+async def _explain(conn, q) -> dict:
+    """对编译后的语句（与服务执行的 SQL 相同，含绑定参数）执行 EXPLAIN ANALYZE。"""
+    compiled = q.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    processors = compiled._bind_processors
+    args = tuple(processors[k](params[k]) if k in processors else params[k] for k in compiled.positiontup)
+    r = await conn.exec_driver_sql("EXPLAIN (ANALYZE, FORMAT JSON) " + compiled.string, args)
+    return r.scalar()[0]
+
+
+@pytest.fixture(scope="module")
+async def seeded(app_client):
+    """事务内灌入 CAPABILITIES 条合成能力并 ANALYZE 的连接；模块内用例结束后回滚。"""
+    from app.db import engine
+
+    async with engine.connect() as conn:
+        tx = await conn.begin()
+        try:
+            # 经 SQLAlchemy 执行（而非驱动连接）：asyncpg 方言在首条语句时才发出 BEGIN，直接用驱动连接会自动提交
+            agent_id = f"agent_{secrets.token_hex(12)}"
+            await conn.exec_driver_sql(
+                "INSERT INTO agents (id, did, name, type, api_key_hash, created_at)"
+                " VALUES ($1, $2, 'domains-explain', 'other', $3, now())",
+                (agent_id, f"did:wymyk:agent:{agent_id}", secrets.token_hex(32)),
+            )
+            await conn.exec_driver_sql(
+                "INSERT INTO capabilities (id, agent_id, type, domains, created_at) VALUES ($1, $2, $3, $4::jsonb, $5)",
+                list(_rows(random.Random(7), CAPABILITIES, agent_id)),
+            )
+            # 把 GIN 待插入列表合并进索引（VACUUM 不能在事务内执行），并刷新统计信息（事务内插入的行同样计入）
+            await conn.exec_driver_sql(f"SELECT gin_clean_pending_list('{INDEX}')")
+            await conn.exec_driver_sql("ANALYZE capabilities")
+            yield conn
+        finally:
+            await tx.rollback()
+
+
+@pytest.mark.pg
+@pytest.mark.anyio
+@pytest.mark.parametrize("cap_type, domains, match_all", [
+    (None, [DOMAINS[250]], False),
+    (None, DOMAINS[200:203], False),
+    (None, [DOMAINS[3], DOMAINS[120]], True),
+    (TYPES[0], [DOMAINS[180]], False),
+], ids=["single domain", "any of 3 domains", "all of 2 domains", "type + domain"])
+async def test_selective_domain_filter_uses_gin_index(seeded, cap_type, domains, match_all):
+    from app.models import Capability
+    from app.pagination import keyset
+    from app.routers.capabilities import domain_condition
+
+    q = select(Capability).where(domain_condition(domains, match_all))
+    if cap_type:
+        q = q.where(Capability.type == cap_type)
+    plan = await _explain(seeded, keyset(q, Capability, None, 50))
+    nodes = [n["Node Type"] + (f" ({n['Index Name']})" if "Index Name" in n else "") for n in _nodes(plan["Plan"])]
+    assert any(INDEX in n for n in nodes), nodes
+
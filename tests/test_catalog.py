@@ -0,0 +1,243 @@
+"""能力目录快照（app/catalog.py）：重建与增量、分页语义。"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.catalog import CatalogSnapshot
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def cap(i: int, cap_type: str = "eval", domains=("悬疑",), created_at=None, **kw) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=kw.get("id", f"cap_{i:04d}"),
+        created_at=created_at or T0 + timedelta(minutes=i),
+        agent_id=kw.get("agent_id", f"agent_{i}"),
+        type=cap_type,
+        input_schema=None,
+        price={"amount": i},
+        domains=list(domains),
+    )
+
+
+def event(c: SimpleNamespace) -> dict:
+    return {
+        "id": c.id, "created_at": c.created_at.isoformat(), "agent_id": c.agent_id, "type": c.type,
+        "input_schema": c.input_schema, "price": c.price, "domains": c.domains,
+    }
+
+
+def amounts(snapshot: CatalogSnapshot, *args) -> list[str]:
+    items, _ = snapshot.page(*args)
+    return [json.loads(b)["price"]["amount"] for b in items]
+
+
+class _Result:
+    def __init__(self, rows) -> None:
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class _Db:
+    """execute 等待期间（on_execute）模拟收到 capability.changed 事件。"""
+
+    def __init__(self, rows, on_execute) -> None:
+        self.rows = rows
+        self.on_execute = on_execute
+
+    async def execute(self, statement):
+        self.on_execute()
+        return _Result(self.rows)
+
+
+def test_load_accepts_unordered_rows():
+    snapshot = CatalogSnapshot()
+    snapshot.load([cap(3), cap(1), cap(2)])
+    assert amounts(snapshot, None, [], False, None, 10) == [3, 2, 1]
+
+
+@pytest.mark.anyio
+async def test_rebuild_replays_changes_received_while_reading():
+    snapshot = CatalogSnapshot()
+    snapshot.load([cap(1), cap(2)])
+    late = cap(3)
+
+    def during_read():
+        # 读出的行不含 3 号且仍含 1 号：3 号在查询开始后新增，1 号在查询开始后删除
+        snapshot.apply(event(late))
+        snapshot.apply({"id": "cap_0001", "deleted": True})
+
+    await snapshot.rebuild(_Db([cap(1), cap(2)], during_read))
+    assert amounts(snapshot, None, [], False, None, 10) == [3, 2]
+    assert len(snapshot) == 2
+
+
+def _domain_snapshot() -> CatalogSnapshot:
+    snapshot = CatalogSnapshot()
+    snapshot.load([
+        cap(1, domains=["悬疑"]),
+        cap(2, domains=["悬疑", "科幻"]),
+        cap(3, domains=["科幻"]),
+        cap(4, domains=["悬疑小说"]),
+        cap(5, cap_type="script", domains=["悬疑", "科幻"]),
+        cap(6, domains=["悬疑", 7, None]),
+    ])
+    return snapshot
+
+
+def test_domain_filter_is_exact_match():
+    # 与 SQL 的 domains @> '["悬疑"]' 一致：不做前缀 / 子串匹配，非字符串元素不参与
+    snapshot = _domain_snapshot()
+    assert amounts(snapshot, None, ["悬疑"], False, None, 10) == [6, 5, 2, 1]
+    assert amounts(snapshot, None, ["悬疑小说"], False, None, 10) == [4]
+    assert amounts(snapshot, None, ["悬"], False, None, 10) == []
+    assert amounts(snapshot, None, ["7"], False, None, 10) == []
+
+
+def test_domain_filter_any_merges_buckets_without_duplicates():
+    snapshot = _domain_snapshot()
+    assert amounts(snapshot, None, ["悬疑", "科幻"], False, None, 10) == [6, 5, 3, 2, 1]
+    assert amounts(snapshot, "eval", ["科幻", "悬疑", "科幻"], False, None, 10) == [6, 3, 2, 1]
+    # 跨页时同一能力不重复出现
+    first, cursor = snapshot.page(None, ["悬疑", "科幻"], False, None, 2)
+    rest, _ = snapshot.page(None, ["悬疑", "科幻"], False, cursor, 10)
+    assert [json.loads(b)["price"]["amount"] for b in first + rest] == [6, 5, 3, 2, 1]
+
+
+def test_domain_filter_all_requires_every_domain():
+    snapshot = _domain_snapshot()
+    assert amounts(snapshot, None, ["悬疑", "科幻"], True, None, 10) == [5, 2]
+    assert amounts(snapshot, "eval", ["悬疑", "科幻"], True, None, 10) == [2]
+    assert amounts(snapshot, None, ["悬疑", "言情"], True, None, 10) == []
+
+
+# ---------- 与 SQL 路径（domain_condition + keyset）对照（pg） ----------
+
+
+async def _sql_page(db, cap_type, domains, match_all, cursor, limit):
+    from sqlalchemy import select
+
+    from app.models import Capability
+    from app.pagination import keyset, split_page
+    from app.routers.capabilities import domain_condition
+
+    q = select(Capability).where(Capability.type == cap_type)
+    if domains:
+        q = q.where(domain_condition(domains, match_all))
+    r = await db.execute(keyset(q, Capability, cursor, limit))
+    rows, next_cursor = split_page(r.scalars().all(), limit)
+    return [c.price["amount"] for c in rows], next_cursor
+
+
+def _catalog_page(snapshot, cap_type, domains, match_all, cursor, limit):
+    items, next_cursor = snapshot.page(cap_type, domains, match_all, cursor, limit)
+    return [json.loads(b)["price"]["amount"] for b in items], next_cursor
+
+
+FILTERS = [
+    ([], False),
+    (["悬疑"], False),
+    (["悬疑", "科幻"], False),
+    (["科幻", "言情", "悬疑"], False),
+    (["悬疑", "科幻"], True),
+]
+
+
+@pytest.fixture
+async def compared(db):
+    """同一批能力分别写入临时库与目录快照：一半经 rebuild 读出，一半以 naive created_at 的事件应用（同创建接口）。"""
+    import secrets
+
+    from app.models import Agent, Capability
+
+    cap_type = f"cmp_{secrets.token_hex(4)}"
+    agent = Agent(id=f"agent_{secrets.token_hex(8)}", did=f"did:cmp:{secrets.token_hex(8)}", name="cmp", type="other",
+                  api_key_hash=secrets.token_hex(32))
+    db.add(agent)
+    domain_sets = [["悬疑"], ["科幻"], ["悬疑", "科幻"], ["言情"], ["悬疑", "言情"], ["科幻", "悬疑", "言情"]]
+    caps = []
+    for i in range(24):
+        # 每 3 条共用一个时间戳：(created_at, id) 中 id 决定顺序
+        created_at = datetime(2024, 1, 1, 8) + timedelta(minutes=i // 3)
+        c = cap(i, cap_type, domain_sets[i % len(domain_sets)], created_at=created_at,
+                id=f"cap_{secrets.token_hex(12)}", agent_id=agent.id)
+        caps.append(c)
+    first, late = caps[:12], caps[12:]
+    await db.flush()
+    for c in caps:
+        db.add(Capability(id=c.id, agent_id=c.agent_id, type=c.type, price=c.price, domains=c.domains,
+                          created_at=c.created_at.replace(tzinfo=timezone.utc)))
+    await db.flush()
+
+    snapshot = CatalogSnapshot()
+    late_ids = {c.id for c in late}
+    rows = (await db.execute(_select_caps(cap_type))).all()
+    snapshot.load([r for r in rows if r.id not in late_ids])
+    for c in late:
+        # 创建接口在提交前广播，created_at 仍为 datetime.utcnow() 的 naive 值
+        snapshot.apply(event(c))
+    assert len(snapshot) == len(first) + len(late)
+    return db, snapshot, cap_type
+
+
+def _select_caps(cap_type):
+    from sqlalchemy import select
+
+    from app.catalog import _COLUMNS
+    from app.models import Capability
+
+    return select(*_COLUMNS).where(Capability.type == cap_type)
+
+
+@pytest.mark.pg
+@pytest.mark.anyio
+@pytest.mark.parametrize("domains, match_all", FILTERS)
+async def test_page_matches_sql_keyset(compared, domains, match_all):
+    db, snapshot, cap_type = compared
+    for limit in (1, 2, 5, 50):
+        walked = {"sql": [], "catalog": []}
+        cursors = {"sql": None, "catalog": None}
+        while True:
+            sql_items, sql_next = await _sql_page(db, cap_type, domains, match_all, cursors["sql"], limit)
+            cat_items, cat_next = _catalog_page(snapshot, cap_type, domains, match_all, cursors["catalog"], limit)
+            assert cat_items == sql_items
+            assert (cat_next is None) == (sql_next is None)
+            walked["sql"] += sql_items
+            walked["catalog"] += cat_items
+            if sql_next is None:
+                break
+            cursors = {"sql": sql_next, "catalog": cat_next}
+        assert walked["catalog"] == walked["sql"]
+        assert len(set(walked["sql"])) == len(walked["sql"])
+
+
+@pytest.mark.pg
+@pytest.mark.anyio
+@pytest.mark.parametrize("domains, match_all", FILTERS)
+async def test_cursors_are_interchangeable(compared, domains, match_all):
+    db, snapshot, cap_type = compared
+    _, sql_cursor = await _sql_page(db, cap_type, domains, match_all, None, 2)
+    _, cat_cursor = _catalog_page(snapshot, cap_type, domains, match_all, None, 2)
+    expected, _ = await _sql_page(db, cap_type, domains, match_all, sql_cursor, 50)
+    assert _catalog_page(snapshot, cap_type, domains, match_all, sql_cursor, 50)[0] == expected
+    assert (await _sql_page(db, cap_type, domains, match_all, cat_cursor, 50))[0] == expected
+    assert _catalog_page(snapshot, cap_type, domains, match_all, cat_cursor, 50)[0] == expected
+
+
+@pytest.mark.pg
+@pytest.mark.anyio
+async def test_naive_cursor_is_utc_on_both_paths(compared):
+    from app.pagination import encode_cursor
+
+    db, snapshot, cap_type = compared
+    # 客户端自行构造的游标可能不带时区：两条路径都按 UTC 解释
+    cursor = encode_cursor(datetime(2024, 1, 1, 8, 4), "cap_")
+    expected, _ = await _sql_page(db, cap_type, [], False, cursor, 50)
+    assert sorted(expected) == list(range(12))
+    assert _catalog_page(snapshot, cap_type, [], False, cursor, 50)[0] == expected
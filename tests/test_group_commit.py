@@ -0,0 +1,69 @@
+"""消息组提交（app/group_commit.py）：攒批、批次失败后的逐条重试与停止时写完队列。"""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import group_commit
+from app.group_commit import GroupCommitWriter
+
+
+class _Inserts:
+    """代替 _insert：记录每次写入的批次，含 bad 消息的批次整体失败。"""
+
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    async def __call__(self, msgs) -> None:
+        self.batches.append([m.id for m in msgs])
+        await asyncio.sleep(0)
+        if any(m.id.startswith("bad") for m in msgs):
+            raise RuntimeError(f"cannot insert {msgs[0].id}")
+
+
+def msg(i) -> SimpleNamespace:
+    return SimpleNamespace(id=str(i))
+
+
+@pytest.fixture
+def inserts(monkeypatch) -> _Inserts:
+    fake = _Inserts()
+    monkeypatch.setattr(group_commit, "_insert", fake)
+    return fake
+
+
+@pytest.mark.anyio
+async def test_concurrent_writes_share_batches_up_to_max_rows(inserts):
+    writer = GroupCommitWriter(max_rows=4, max_delay=0.05)
+    writer.start()
+    await asyncio.gather(*(writer.write([msg(i)]) for i in range(10)))
+    await writer.stop()
+    assert inserts.batches == [["0", "1", "2", "3"], ["4", "5", "6", "7"], ["8", "9"]]
+
+
+@pytest.mark.anyio
+async def test_failed_batch_is_retried_row_by_row(inserts):
+    writer = GroupCommitWriter(max_rows=10, max_delay=0.05)
+    writer.start()
+    results = await asyncio.gather(
+        writer.write([msg(1)]), writer.write([msg("bad")]), writer.write([msg(2), msg(3)]), return_exceptions=True,
+    )
+    await writer.stop()
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], RuntimeError)
+    assert inserts.batches == [["1", "bad", "2", "3"], ["1"], ["bad"], ["2"], ["3"]]
+
+
+@pytest.mark.anyio
+async def test_stop_flushes_pending_messages(inserts):
+    writer = GroupCommitWriter(max_rows=100, max_delay=0.05)
+    writer.start()
+    pending = asyncio.ensure_future(writer.write([msg(1), msg(2)]))
+    await asyncio.sleep(0)
+    await writer.stop()
+    # 入队的消息写完才退出
+    assert inserts.batches == [["1", "2"]]
+    await pending
+    assert not writer.running
@@ -0,0 +1,106 @@
+"""能力匹配倒排索引（app/match_index.py）。"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.match_index import CapabilityMatchIndex
+
+
+def cap(cap_id: str, agent_id: str, cap_type: str = "eval", domains=("悬疑",)) -> SimpleNamespace:
+    return SimpleNamespace(id=cap_id, agent_id=agent_id, type=cap_type, domains=list(domains))
+
+
+class _Result:
+    def __init__(self, rows) -> None:
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class _Db:
+    def __init__(self, rows, on_execute=lambda: None) -> None:
+        self.rows = rows
+        self.on_execute = on_execute
+
+    async def execute(self, statement):
+        self.on_execute()
+        return _Result(self.rows)
+
+
+def test_supplier_lookup_by_type_and_domain():
+    index = CapabilityMatchIndex()
+    index.load([cap("c1", "a1"), cap("c2", "a2", domains=("科幻",)), cap("c3", "a3", cap_type="other")])
+    assert index.supplier_ids("eval", None) == {"a1", "a2"}
+    assert index.supplier_ids("eval", ["悬疑"]) == {"a1"}
+    assert index.is_supplier("a2", "eval", ["悬疑", "科幻"])
+    assert not index.is_supplier("a3", "eval", None)
+
+
+@pytest.mark.anyio
+async def test_rebuild_replays_changes_received_while_reading():
+    index = CapabilityMatchIndex()
+    index.load([cap("c1", "a1")])
+
+    def during_read():
+        index.apply({"id": "c2", "agent_id": "a2", "type": "eval", "domains": ["悬疑"]})
+        index.apply({"id": "c1", "deleted": True})
+
+    await index.rebuild(_Db([cap("c1", "a1")], during_read))
+    assert index.supplier_ids("eval", ["悬疑"]) == {"a2"}
+
+
+@pytest.mark.anyio
+async def test_check_consistency_reports_and_repairs_drift():
+    rows = [cap("c1", "a1"), cap("c2", "a2"), cap("c3", "a3")]
+    index = CapabilityMatchIndex()
+    index.load(rows)
+    assert (await index.check_consistency(_Db(rows)))["ok"]
+
+    # 漏掉 c1 的删除之外的三种漂移：c2 缺失、c9 多余、c3 的领域不一致
+    index.remove("c2")
+    index.upsert("c9", "a9", "eval", ["悬疑"])
+    index.upsert("c3", "a3", "eval", ["科幻"])
+    report = await index.check_consistency(_Db(rows))
+    assert report == {"ok": False, "missing": ["c2"], "stale": ["c9"], "mismatched": ["c3"]}
+    assert index.supplier_ids("eval", ["悬疑"]) == {"a1", "a9"}
+
+    report = await index.check_consistency(_Db(rows), repair=True)
+    assert not report["ok"]
+    assert (await index.check_consistency(_Db(rows)))["ok"]
+    assert index.supplier_ids("eval", ["悬疑"]) == {"a1", "a2", "a3"}
+
+
+@pytest.mark.pg
+@pytest.mark.anyio
+async def test_admin_check_route_repairs_corrupted_index(app_client):
+    from app.config import settings
+    from app.match_index import capability_index
+
+    headers = {"X-Admin-Key": settings.admin_api_key}
+    r = await app_client.post("/v1/agents/register", json={"name": "match-index-check"})
+    agent = r.json()
+    r = await app_client.post(f"/v1/agents/{agent['id']}/capabilities", headers={"X-API-Key": agent["api_key"]},
+                              json={"type": "match_check", "domains": ["悬疑"]})
+    cap_id = r.json()["id"]
+
+    assert (await app_client.post("/v1/admin/match-index/check")).status_code == 401
+    r = await app_client.post("/v1/admin/match-index/check", headers=headers)
+    assert r.json()["ok"] is True, r.json()
+
+    # 模拟丢失的 capability.changed 事件：索引中删掉这条能力、并多出一条不存在的能力
+    capability_index.remove(cap_id)
+    capability_index.upsert("cap_ghost", "agent_ghost", "match_check", ["悬疑"])
+    r = await app_client.post("/v1/admin/match-index/check", headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json() == {"ok": False, "missing": [cap_id], "stale": ["cap_ghost"], "mismatched": [], "repaired": False}
+    assert capability_index.supplier_ids("match_check", ["悬疑"]) == {"agent_ghost"}
+
+    r = await app_client.post("/v1/admin/match-index/check", headers=headers, params={"repair": "true"})
+    assert r.status_code == 200, r.text
+    assert r.json()["repaired"] is True
+    assert capability_index.supplier_ids("match_check", ["悬疑"]) == {agent["id"]}
+    r = await app_client.post("/v1/admin/match-index/check", headers=headers)
+    assert r.json() == {"ok": True, "missing": [], "stale": [], "mismatched": [], "repaired": False}
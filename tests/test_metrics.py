@@ -0,0 +1,44 @@
+"""Prometheus 文本输出与多 worker 快照汇总（app/metrics.py 的 render / merge）。"""
+from __future__ import annotations
+
+from app.metrics import Counter, Histogram, Registry, merge, render
+
+
+def _snapshot(requests: dict, latencies: list[float]) -> dict:
+    registry = Registry()
+    counter = registry.add(Counter("http_requests_total", "HTTP requests.", ("method", "route")))
+    histogram = registry.add(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    for labels, n in requests.items():
+        counter.inc(labels, n)
+    for v in latencies:
+        histogram.observe(("/x",), v)
+    return registry.snapshot()
+
+
+def test_render_counter_and_cumulative_histogram():
+    text = render(_snapshot({("GET", '/a"b\\c'): 2}, [0.05, 0.1, 0.5, 3.0]))
+    assert text.splitlines() == [
+        "# HELP http_requests_total HTTP requests.",
+        "# TYPE http_requests_total counter",
+        'http_requests_total{method="GET",route="/a\\"b\\\\c"} 2',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/x",le="0.1"} 2',
+        'latency_seconds_bucket{route="/x",le="1"} 3',
+        'latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'latency_seconds_sum{route="/x"} 3.65',
+        'latency_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_merge_sums_counters_and_histogram_buckets():
+    a = _snapshot({("GET", "/a"): 2, ("POST", "/a"): 1}, [0.05, 3.0])
+    b = _snapshot({("GET", "/a"): 5, ("GET", "/b"): 1}, [0.5])
+    merged = merge([a, b])
+    assert sorted(merged["http_requests_total"]["samples"]) == [
+        [["GET", "/a"], 7.0], [["GET", "/b"], 1.0], [["POST", "/a"], 1.0],
+    ]
+    assert merged["latency_seconds"]["samples"] == [[["/x"], [1, 1, 1, 3.55]]]
+    # 汇总不改动原快照
+    assert a["latency_seconds"]["samples"] == [[["/x"], [1, 0, 1, 3.05]]]
+    assert render(merge([a])) == render(a)
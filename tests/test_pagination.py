@@ -0,0 +1,38 @@
+"""游标分页（app/pagination.py）：游标编解码与分页截取。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, split_page
+
+
+@pytest.mark.parametrize("ts", [
+    datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc),
+    datetime(2024, 5, 6, 15, 8, 9, tzinfo=timezone(timedelta(hours=8))),
+    datetime(2024, 5, 6, 7, 8, 9),
+])
+def test_cursor_round_trip(ts):
+    cursor = encode_cursor(ts, "msg_0a1b")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (ts, "msg_0a1b")
+    assert decode_cursor(cursor)[0].tzinfo == ts.tzinfo
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "W10", encode_cursor(datetime(2024, 1, 1), "x")[:-3] + "!!!"])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_split_page():
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [SimpleNamespace(id=f"r{i}", created_at=t0 - timedelta(seconds=i)) for i in range(3)]
+    assert split_page(rows, 3) == (rows, None)
+    page, cursor = split_page(rows, 2)
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == (rows[1].created_at, "r1")
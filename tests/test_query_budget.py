@@ -0,0 +1,237 @@
+"""
+SQL 预算（app/query_budget.py）：指纹归一化与违规判定；以及逐个调用 app/routers/ 下全部路由的预算回归检查（pg）。
+
+路由检查在临时库中先构造每类列表都有多条记录的数据，每次调用前清空鉴权缓存以统计最坏情况；
+以下情况失败：路由未用 @budget 声明预算、请求超出预算（QUERY_BUDGET=raise 时返回 500）、非流式路由未被调用到。
+新增或修改路由后运行本测试，按失败信息调整预算或修正查询。
+"""
+from __future__ import annotations
+
+import secrets
+from collections import defaultdict
+from typing import Any, Optional
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app.query_budget import Budget, QueryBudgetExceeded, QueryLog, fingerprint, query_budget
+
+# 流式路由：响应头发出前的部分同样受检查，但这里不调用
+STREAMING = {("GET", "/v1/sessions/{session_id}/stream")}
+ITEMS = 3
+
+
+@pytest.mark.parametrize("statement, expected", [
+    (
+        "SELECT a.id FROM a WHERE a.id IN ($1::VARCHAR, $2::VARCHAR, $3::VARCHAR)",
+        "SELECT a.id FROM a WHERE a.id IN (?)",
+    ),
+    (
+        "INSERT INTO m (id, created_at) VALUES ($1::VARCHAR, $2::TIMESTAMP WITH TIME ZONE)",
+        "INSERT INTO m (id, created_at) VALUES (?)",
+    ),
+    (
+        "SELECT * FROM t WHERE price = $1::NUMERIC(10, 2) AND tags @> $2::VARCHAR[]",
+        "SELECT * FROM t WHERE price = ? AND tags @> ?",
+    ),
+    (
+        "SELECT * FROM t WHERE name = 'it''s' AND n = 42 AND x = -3.5 LIMIT 10",
+        "SELECT * FROM t WHERE name = ? AND n = ? AND x = ? LIMIT ?",
+    ),
+    ("SELECT t1.col2 FROM t1\n   WHERE   a = %(a_1)s", "SELECT t1.col2 FROM t1 WHERE a = ?"),
+])
+def test_fingerprint_collapses_literals_params_and_casts(statement, expected):
+    assert fingerprint(statement) == expected
+
+
+def test_fingerprint_same_for_different_in_list_lengths():
+    assert fingerprint("SELECT 1 FROM t WHERE id IN ($1)") == fingerprint("SELECT 1 FROM t WHERE id IN ($1, $2, $3, $4)")
+
+
+def test_violations_statement_count_and_repeats():
+    log = QueryLog()
+    for i in range(3):
+        log.record(f"SELECT * FROM t WHERE id = {i}")
+    log.record("SELECT * FROM u")
+    assert log.statements == 4
+    assert log.violations(Budget(statements=4, repeats=3)) == []
+    problems = log.violations(Budget(statements=3))
+    assert problems[0] == "4 statements > budget 3"
+    assert problems[1].startswith("repeated 3x (> 1): SELECT * FROM t WHERE id = ?")
+    # 未声明预算时只检查重复
+    assert len(log.violations(Budget())) == 1
+
+
+def test_query_budget_context_manager_raises():
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(statements=1, label="test") as log:
+            log.record("SELECT 1")
+            log.record("SELECT 2")
+
+
+# ---------- 路由预算回归（pg） ----------
+
+
+class Recorder:
+    def __init__(self, client) -> None:
+        self.client = client
+        self.observed: dict[tuple[str, str], int] = defaultdict(int)
+
+    async def call(self, method: str, route: str, key: Optional[str] = None, path: Optional[dict] = None, **kw) -> Any:
+        from app.auth import auth_cache
+
+        auth_cache.clear()
+        headers = kw.pop("headers", {})
+        if key:
+            headers["X-API-Key"] = key
+        r = await self.client.request(method, route.format(**(path or {})), headers=headers, **kw)
+        count = int(r.headers.get("x-query-count", 0))
+        self.observed[(method, route)] = max(self.observed[(method, route)], count)
+        assert r.status_code < 400, f"{method} {route} -> {r.status_code}: {r.text[:2000]}"
+        return r.json() if r.content else {}
+
+
+def _api_routes(routes) -> list[APIRoute]:
+    out = []
+    for route in routes:
+        if isinstance(route, APIRoute):
+            out.append(route)
+        elif hasattr(route, "original_router"):
+            # include_router 挂载的子路由
+            out.extend(_api_routes(route.original_router.routes))
+    return out
+
+
+def declared_routes() -> dict[tuple[str, str], Any]:
+    from app.main import app
+
+    routes = {}
+    for route in _api_routes(app.routes):
+        if route.endpoint.__module__.startswith("app.routers."):
+            for method in route.methods:
+                routes[(method, route.path)] = getattr(route.endpoint, "__query_budget__", None)
+    return routes
+
+
+async def register(api: Recorder, name: str) -> tuple[str, str]:
+    d = await api.call("POST", "/v1/agents/register", json={"name": f"qb-{name}-{secrets.token_hex(3)}"})
+    return d["id"], d["api_key"]
+
+
+async def exercise(api: Recorder) -> None:
+    from app.config import settings
+
+    cap_type = f"qb_type_{secrets.token_hex(4)}"
+    buyer, bkey = await register(api, "buyer")
+    suppliers = [await register(api, f"supplier{i}") for i in range(ITEMS)]
+    await api.call("GET", "/v1/agents/me", bkey)
+    await api.call("GET", "/v1/agents/{agent_id}/public", path={"agent_id": suppliers[0][0]})
+
+    # 能力
+    cap_ids = []
+    for sid, skey in suppliers:
+        for domain in ("悬疑", "科幻"):
+            c = await api.call("POST", "/v1/agents/{agent_id}/capabilities", skey, {"agent_id": sid},
+                               json={"type": cap_type, "domains": [domain], "price": {"amount": 100}})
+            cap_ids.append((sid, skey, c["id"]))
+    sid, skey = suppliers[0]
+    await api.call("GET", "/v1/agents/{agent_id}/capabilities", skey, {"agent_id": sid})
+    await api.call("PATCH", "/v1/agents/{agent_id}/capabilities/{cap_id}", skey,
+                   {"agent_id": sid, "cap_id": cap_ids[0][2]}, json={"domains": ["悬疑", "言情"]})
+    await api.call("GET", "/v1/capabilities", params={"type": cap_type, "limit": 20})
+    await api.call("GET", "/v1/capabilities", params={"domain": ["悬疑", "言情"], "domain_match": "all"})
+
+    # 帖子
+    post_ids = []
+    for i in range(ITEMS):
+        p = await api.call("POST", "/v1/posts", bkey, json={"title": f"悬疑剧本评估 {i}", "content": "寻找悬疑题材的评估服务"})
+        post_ids.append(p["id"])
+    await api.call("GET", "/v1/posts", params={"limit": 20})
+    await api.call("GET", "/v1/posts/{post_id}", path={"post_id": post_ids[0]})
+
+    # RFP 与提案
+    rfp_ids = []
+    for i in range(ITEMS):
+        r = await api.call("POST", "/v1/rfps", bkey, json={
+            "title": f"悬疑剧本评估需求 {i}", "description": "评估悬疑剧本", "capability_type": cap_type, "domain_filters": ["悬疑"],
+        })
+        rfp_ids.append(r["id"])
+    proposal_ids = []
+    for sid, skey in suppliers:
+        await api.call("GET", "/v1/rfps", skey, params={"scope": "matched", "status": "open"})
+        for rfp_id in rfp_ids:
+            await api.call("GET", "/v1/rfps/{rfp_id}", skey, {"rfp_id": rfp_id})
+            p = await api.call("POST", "/v1/rfps/{rfp_id}/proposals", skey, {"rfp_id": rfp_id},
+                               json={"price": {"amount": 100}, "content": "可承接"})
+            proposal_ids.append((skey, p["id"]))
+        await api.call("GET", "/v1/rfps/{rfp_id}/proposals", skey, {"rfp_id": rfp_ids[0]})
+    await api.call("GET", "/v1/rfps", bkey)
+    await api.call("GET", "/v1/rfps", bkey, params={"scope": "created"})
+    await api.call("GET", "/v1/rfps/{rfp_id}", bkey, {"rfp_id": rfp_ids[0]})
+    await api.call("GET", "/v1/rfps/{rfp_id}/proposals", bkey, {"rfp_id": rfp_ids[0]})
+    await api.call("GET", "/v1/rfps/{rfp_id}/summary", bkey, {"rfp_id": rfp_ids[0]})
+    await api.call("GET", "/v1/proposals/{proposal_id}", bkey, {"proposal_id": proposal_ids[0][1]})
+    await api.call("PATCH", "/v1/proposals/{proposal_id}", bkey, {"proposal_id": proposal_ids[0][1]}, json={"status": "accepted"})
+    await api.call("PATCH", "/v1/proposals/{proposal_id}", proposal_ids[1][0], {"proposal_id": proposal_ids[1][1]},
+                   json={"status": "withdrawn"})
+    await api.call("PATCH", "/v1/rfps/{rfp_id}", bkey, {"rfp_id": rfp_ids[-1]}, json={"status": "closed"})
+    await api.call("GET", "/v1/search", bkey, params={"q": "悬疑 评估"})
+
+    # 会话与消息
+    session_ids = []
+    for sid, _ in suppliers:
+        s = await api.call("POST", "/v1/sessions", bkey, json={
+            "party_ids": [buyer, sid], "capability_type": cap_type, "initial_message": {"text": "你好"},
+        })
+        session_ids.append(s["id"])
+    for session_id, (_, skey) in zip(session_ids, suppliers):
+        for i in range(ITEMS):
+            await api.call("POST", "/v1/sessions/{session_id}/messages", skey, {"session_id": session_id},
+                           json={"payload": {"text": f"回复 {i}"}})
+    await api.call("GET", "/v1/sessions", bkey)
+    await api.call("GET", "/v1/sessions/digest", bkey)
+    await api.call("GET", "/v1/sessions/{session_id}", bkey, {"session_id": session_ids[0]})
+    page = await api.call("GET", "/v1/sessions/{session_id}/messages", bkey, {"session_id": session_ids[0]}, params={"limit": 2})
+    await api.call("GET", "/v1/sessions/{session_id}/messages", bkey, {"session_id": session_ids[0]},
+                   params={"cursor": page["next_cursor"]})
+    await api.call("POST", "/v1/sessions/{session_id}/read", bkey, {"session_id": session_ids[0]}, json={})
+    await api.call("GET", "/v1/sessions/digest", bkey)
+
+    # A2A：单条与批量
+    await api.call("POST", "/a2a/v1", bkey, json={"jsonrpc": "2.0", "id": 1, "method": "capabilities/list", "params": {"type": cap_type}})
+    await api.call("POST", "/a2a/v1", bkey, json={
+        "jsonrpc": "2.0", "id": 1, "method": "message/send", "params": {"session_id": session_ids[0], "payload": {"text": "单条"}},
+    })
+    batch = [{"jsonrpc": "2.0", "id": f"c{i}", "method": "session/create",
+              "params": {"party_ids": [sid], "initial_message": {"text": "批量"}}} for i, (sid, _) in enumerate(suppliers)]
+    batch += [{"jsonrpc": "2.0", "id": f"m{i}{j}", "method": "message/send",
+               "params": {"session_id": session_id, "payload": {"text": f"批量 {j}"}}}
+              for i, session_id in enumerate(session_ids) for j in range(ITEMS)]
+    batch.append({"jsonrpc": "2.0", "id": "l", "method": "capabilities/list", "params": {"type": cap_type}})
+    await api.call("POST", "/a2a/v1", bkey, json=batch)
+
+    # 收尾：删除能力、轮换 Key、管理接口
+    for sid, skey, cap_id in cap_ids[:2]:
+        await api.call("DELETE", "/v1/agents/{agent_id}/capabilities/{cap_id}", skey, {"agent_id": sid, "cap_id": cap_id})
+    await api.call("POST", "/v1/agents/me/api-key", bkey)
+    await api.call("GET", "/v1/admin/slow-queries", headers={"X-Admin-Key": settings.admin_api_key})
+    await api.call("POST", "/v1/admin/match-index/check", headers={"X-Admin-Key": settings.admin_api_key},
+                   params={"repair": "true"})
+
+
+@pytest.mark.pg
+@pytest.mark.anyio
+async def test_every_route_declares_and_stays_within_budget(app_client):
+    routes = declared_routes()
+    undeclared = sorted(f"{m} {p}" for (m, p), b in routes.items() if b is None)
+    assert not undeclared, f"routes without @budget: {undeclared}"
+
+    api = Recorder(app_client)
+    await exercise(api)
+
+    missing = sorted(f"{m} {p}" for (m, p) in routes if (m, p) not in api.observed and (m, p) not in STREAMING)
+    assert not missing, f"routes not exercised: {missing}"
+    for (method, path), count in api.observed.items():
+        budget = routes.get((method, path))
+        if budget is not None:
+            assert count <= budget.statements, f"{method} {path}: {count} statements > budget {budget.statements}"
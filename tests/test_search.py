@@ -0,0 +1,35 @@
+"""全文检索的应用侧分词（app/search.py）：tsvector / tsquery 字面量与摘要高亮。"""
+from __future__ import annotations
+
+from app.search import MAX_POSITIONS, query_terms, snippet, tsquery_literal, vector_literal
+
+
+def test_vector_literal_bigrams_weights_and_field_gap():
+    assert vector_literal([("悬疑剧本 ABC", "A"), ("it's 悬", "B")]) == (
+        "'悬疑':1A '疑剧':2A '剧本':3A '本':4A 'abc':5A 'it':7B 's':8B '悬':9B"
+    )
+
+
+def test_vector_literal_quotes_and_caps_positions():
+    assert vector_literal([("a\\b", "A")]) == "'a':1A 'b':2A"
+    literal = vector_literal([("词 " * (MAX_POSITIONS + 10), "B")])
+    assert literal.count("B") == MAX_POSITIONS
+    assert vector_literal([(None, "A")]) == ""
+
+
+def test_tsquery_literal():
+    assert tsquery_literal(query_terms("悬疑剧本 Foo 悬")) == "('悬疑' <-> '疑剧' <-> '剧本') & 'foo' & '悬':*"
+    assert tsquery_literal(query_terms("O'Brien")) == "'o' & 'brien'"
+    assert tsquery_literal(query_terms("  ，。 ")) is None
+
+
+def test_snippet_highlights_and_escapes():
+    text = "<p>" + "x" * 100 + "悬疑剧本评估"
+    assert snippet(text, ["悬疑", "剧本"], 40) == "…xxxxxxxxxx<b>悬疑</b><b>剧本</b>评估"
+    assert snippet("Foo <i>bar</i>", ["FOO"]) == "<b>Foo</b> &lt;i&gt;bar&lt;/i&gt;"
+    assert snippet("a<b" + "c" * 100, [], 5) == "a&lt;bcc"
+    assert snippet(None, ["悬疑"]) == ""
+
+
+def test_snippet_prefers_longest_term():
+    assert snippet("悬疑剧本", ["悬疑", "悬疑剧本"]) == "<b>悬疑剧本</b>"
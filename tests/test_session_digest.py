@@ -0,0 +1,119 @@
+"""收件箱摘要（GET /v1/sessions/digest）：各消息写入路径推进参与方的最后活动，按最近活动分页（pg）。"""
+from __future__ import annotations
+
+import secrets
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytestmark = [pytest.mark.pg, pytest.mark.anyio]
+
+
+async def _register(client, name: str) -> tuple[str, dict]:
+    r = await client.post("/v1/agents/register", json={"name": f"digest-{name}-{secrets.token_hex(3)}"})
+    d = r.json()
+    return d["id"], {"X-API-Key": d["api_key"]}
+
+
+async def _digest(client, headers, limit=50) -> list[dict]:
+    items, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        r = await client.get("/v1/sessions/digest", headers=headers, params=params)
+        assert r.status_code == 200, r.text
+        page = r.json()
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+async def _create(client, headers, other: str, text=None) -> str:
+    body = {"party_ids": [other], **({"initial_message": {"text": text}} if text else {})}
+    r = await client.post("/v1/sessions", headers=headers, json=body)
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+async def _rest_send(client, headers, session_id: str, text: str) -> str:
+    r = await client.post(f"/v1/sessions/{session_id}/messages", headers=headers, json={"payload": {"text": text}})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+async def _a2a_send(client, headers, session_id: str, text: str) -> str:
+    r = await client.post("/a2a/v1", headers=headers, json={
+        "jsonrpc": "2.0", "id": 1, "method": "message/send", "params": {"session_id": session_id, "payload": {"text": text}},
+    })
+    assert r.status_code == 200 and "result" in r.json(), r.text
+    return r.json()["result"]["message_id"]
+
+
+def _order(items) -> list[str]:
+    return [i["id"] for i in items]
+
+
+async def test_activity_follows_every_write_path(app_client):
+    from app.group_commit import message_writer
+
+    client = app_client
+    buyer, bh = await _register(client, "buyer")
+    others = [await _register(client, f"s{i}") for i in range(3)]
+    s1 = await _create(client, bh, others[0][0], "开场")
+    s2 = await _create(client, bh, others[1][0])
+    s3 = await _create(client, bh, others[2][0])
+
+    items = await _digest(client, bh)
+    assert _order(items) == [s3, s2, s1]
+    assert items[2]["last_message"]["payload"] == {"text": "开场"}
+    assert items[2]["last_activity_at"] == items[2]["last_message"]["created_at"]
+    assert items[0]["last_message"] is None and items[0]["last_activity_at"] == items[0]["created_at"]
+
+    m1 = await _rest_send(client, others[0][1], s1, "REST")
+    m2 = await _a2a_send(client, bh, s2, "A2A")
+    items = await _digest(client, bh)
+    assert _order(items) == [s2, s1, s3]
+    assert [i["last_message"]["id"] for i in items[:2]] == [m2, m1]
+    assert [i["unread_count"] for i in items] == [0, 1, 0]
+
+    # 组提交：REST 与 A2A 的消息经写入队列批量提交
+    started = not message_writer.running
+    if started:
+        message_writer.start()
+    try:
+        m3 = await _rest_send(client, others[2][1], s3, "组提交 REST")
+        m4 = await _a2a_send(client, bh, s1, "组提交 A2A")
+    finally:
+        if started:
+            await message_writer.stop()
+    items = await _digest(client, bh, limit=1)
+    assert _order(items) == [s1, s3, s2]
+    assert [i["last_message"]["id"] for i in items[:2]] == [m4, m3]
+    assert [i["message_count"] for i in items] == [3, 1, 1]
+
+    # 另一方的收件箱同样推进
+    assert [i["last_message"]["id"] for i in await _digest(client, others[0][1])] == [m4]
+
+
+async def test_activity_never_moves_backwards(app_client, db):
+    from sqlalchemy import select
+
+    from app.models import SessionParticipant
+    from app.session_participants import record_activity
+
+    buyer, bh = await _register(app_client, "buyer")
+    other, _ = await _register(app_client, "other")
+    session_id = await _create(app_client, bh, other, "最新")
+    before = (await db.execute(
+        select(SessionParticipant.last_activity_at, SessionParticipant.last_message_id)
+        .where(SessionParticipant.session_id == session_id)
+    )).all()
+
+    older = SimpleNamespace(session_id=session_id, id="msg_zzz", created_at=datetime(2020, 1, 1, tzinfo=timezone.utc))
+    await record_activity(db, [older])
+    after = (await db.execute(
+        select(SessionParticipant.last_activity_at, SessionParticipant.last_message_id)
+        .where(SessionParticipant.session_id == session_id)
+    )).all()
+    assert after == before and len(after) == 2